@@ -0,0 +1,118 @@
+"""
+Incremental markdown normalization of the blog archive, either the
+per-post store (post_store.PostStore) or a single blogPosts.json file.
+
+A manifest records, per post id, the hash of the content as it was last
+normalized and the FORMATTER_VERSION that did it. A run only reprocesses
+posts that are new, were edited since, or were formatted by an older
+version. Large batches go to a process pool. Files are only rewritten
+(atomically) when their content actually changed: in a store that is just
+the affected post files.
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic_files import write_json_atomic
+from markdown_normalizer import FORMATTER_VERSION, normalize_markdown
+
+# Below this many stale posts a process pool costs more than it saves
+PARALLEL_THRESHOLD = 200
+PARALLEL_CHUNKSIZE = 32
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """{post_id: content hash}; empty if missing, unreadable or written by another formatter version."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("formatter_version") != FORMATTER_VERSION:
+        return {}
+    return dict(data.get("posts") or {})
+
+
+def _post_key(post: dict, position: int) -> str:
+    return str(post.get("id", f"#{position}"))
+
+
+def normalize_contents(contents: list, workers: int = None, parallel_threshold: int = PARALLEL_THRESHOLD) -> list:
+    """normalize_markdown over `contents`, in a process pool once the batch is large enough."""
+    if len(contents) < parallel_threshold or workers == 1:
+        return [normalize_markdown(c) for c in contents]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(normalize_markdown, contents, chunksize=PARALLEL_CHUNKSIZE))
+
+
+def reformat_posts(posts: list, manifest: dict, full: bool = False, workers: int = None,
+                   parallel_threshold: int = PARALLEL_THRESHOLD) -> tuple:
+    """
+    Normalize the content of stale posts in place. Returns (new_manifest,
+    stats) where stats counts "posts", "stale" (reprocessed) and "changed"
+    (content actually rewritten), and lists the positions of the changed
+    posts under "changed_at".
+    """
+    stale = [i for i, post in enumerate(posts)
+             if full or manifest.get(_post_key(post, i)) != content_hash(post.get("content", ""))]
+    normalized = normalize_contents([posts[i].get("content", "") for i in stale], workers, parallel_threshold)
+
+    changed_at = []
+    for i, content in zip(stale, normalized):
+        if content != posts[i].get("content", ""):
+            posts[i]["content"] = content
+            changed_at.append(i)
+
+    new_manifest = {_post_key(post, i): content_hash(post.get("content", "")) for i, post in enumerate(posts)}
+    return new_manifest, {"posts": len(posts), "stale": len(stale), "changed": len(changed_at),
+                          "changed_at": changed_at}
+
+
+def reformat_archive(posts_path: str, manifest_path: str, full: bool = False, workers: int = None,
+                     parallel_threshold: int = PARALLEL_THRESHOLD) -> dict:
+    """
+    Reformat blogPosts.json incrementally. Writes the posts file only if a
+    post changed and the manifest only if it changed. Returns the stats from
+    reformat_posts plus "written" (whether the posts file was rewritten).
+    """
+    with open(posts_path) as f:
+        posts = json.load(f)
+    manifest = load_manifest(manifest_path)
+
+    new_manifest, stats = reformat_posts(posts, manifest, full, workers, parallel_threshold)
+    stats["written"] = stats["changed"] > 0
+    if stats["written"]:
+        # Same serialization as publish_agent, so unchanged posts produce no diff
+        write_json_atomic(posts_path, posts, indent=2)
+    _save_manifest(manifest_path, manifest, new_manifest)
+    return stats
+
+
+def reformat_store(store, manifest_path: str, full: bool = False, workers: int = None,
+                   parallel_threshold: int = PARALLEL_THRESHOLD) -> dict:
+    """
+    Same as reformat_archive for a PostStore: only the files of posts whose
+    content changed are rewritten; the index holds no content and is left alone.
+    Their ids are listed under "changed_ids".
+    """
+    posts = list(store.iter_posts())
+    manifest = load_manifest(manifest_path)
+
+    new_manifest, stats = reformat_posts(posts, manifest, full, workers, parallel_threshold)
+    for i in stats["changed_at"]:
+        store.save_post(posts[i])
+    stats["changed_ids"] = [posts[i]["id"] for i in stats["changed_at"]]
+    stats["written"] = stats["changed"] > 0
+    _save_manifest(manifest_path, manifest, new_manifest)
+    return stats
+
+
+def _save_manifest(path: str, old: dict, new: dict) -> None:
+    if new != old or not os.path.exists(path):
+        write_json_atomic(path, {"formatter_version": FORMATTER_VERSION, "posts": new}, indent=2, sort_keys=True)
@@ -0,0 +1,32 @@
+"""
+Atomic file writes shared by the agents' caches, indexes and post files.
+
+Data is written to a temp file in the target's directory and renamed over
+the target, so readers (and a crashed run) never see a partial file.
+"""
+
+import os
+import json
+import tempfile
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    """Write `text` to a temp file in the same directory, then rename it over `path`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data, **dump_kwargs) -> None:
+    """write_text_atomic for json.dumps(data, **dump_kwargs)."""
+    write_text_atomic(path, json.dumps(data, **dump_kwargs))
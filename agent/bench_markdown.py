@@ -0,0 +1,65 @@
+"""
+Benchmark for the markdown normalizer.
+
+Normalizes every post in the post store (src/data/posts/), then the same archive
+repeated N times as one batch and as one very long post, and prints the
+throughput for each. Constant throughput across sizes shows that
+normalization stays linear.
+
+Run with: python agent/bench_markdown.py --copies 1 4 16 64
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from markdown_normalizer import normalize_markdown
+from post_store import DEFAULT_DATA_DIR, PostStore
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench(contents: list, copies: int) -> str:
+    batch = contents * copies
+    chars = sum(len(c) for c in batch)
+    _, batch_time = _timed(lambda: [normalize_markdown(c) for c in batch])
+    _, joined_time = _timed(normalize_markdown, "\n\n".join(batch))
+    return (f"{copies:>4}x | {len(batch):>6} posts | {chars / 1e6:7.2f} MB | "
+            f"batch {batch_time:7.3f}s ({chars / batch_time / 1e6:6.2f} MB/s) | "
+            f"one post {joined_time:7.3f}s ({chars / joined_time / 1e6:6.2f} MB/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown normalization over the blog archive")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--posts-file", default=None, help="Single-file archive to read instead of the post store")
+    args = parser.parse_args()
+
+    if args.posts_file:
+        source = args.posts_file
+        with open(source) as f:
+            posts = json.load(f)
+    else:
+        store = PostStore(args.data_dir)
+        if not store.exists():
+            parser.error(f"no post store in {args.data_dir}")
+        source = store.posts_dir
+        posts = list(store.iter_posts())
+    contents = [post.get("content", "") for post in posts]
+
+    print(f"{len(contents)} posts in {source}")
+    for copies in args.copies:
+        print(bench(contents, copies))
+
+
+if __name__ == "__main__":
+    main()
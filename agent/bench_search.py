@@ -0,0 +1,71 @@
+"""
+Offline benchmark for the search stage.
+
+Generates a local corpus of each requested size and times relevance
+filtering + source scoring + domain dedup over every candidate, ranking,
+and a full search_news_node run against the local backend.
+
+Run with: python agent/bench_search.py --sizes 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import news_agent
+from search_backends import LocalCorpusBackend
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench(size: int, keyword_density: float, seed: int) -> str:
+    backend, build_time = _timed(lambda: LocalCorpusBackend(
+        size=size,
+        trusted_domains=list(news_agent.SOURCE_QUALITY_TIERS),
+        excluded_domains=news_agent.EXCLUDED_DOMAINS,
+        keywords=news_agent.AI_KEYWORDS,
+        keyword_density=keyword_density,
+        seed=seed,
+    ))
+    candidates = news_agent.normalize_search_results(backend.corpus, "url", "Bench")
+
+    qualified, filter_time = _timed(news_agent.qualify_results, candidates, set())
+    ranked, rank_time = _timed(news_agent.rank_news_items_by_source_quality, candidates)
+
+    news_agent.set_search_backend(backend)
+    state = {"news_items": [], "generated_post": None, "issue_url": None, "error": None}
+    _, node_time = _timed(news_agent.search_news_node, state)
+    news_agent.close_search_backend()
+
+    rate = size / filter_time if filter_time else float("inf")
+    return (f"{size:>9,} | build {build_time:7.2f}s | filter {filter_time:7.3f}s ({rate:,.0f}/s, "
+          f"{len(qualified)} kept) | rank {rank_time:7.3f}s | search node {node_time:6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search stage on a generated corpus")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--keyword-density", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        # Keep the pipeline's per-item logging from drowning out the results
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                line = bench(size, args.keyword_density, args.seed)
+            finally:
+                sys.stdout = stdout
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Small on-disk JSON cache used by the agents.
+
+Each entry is one JSON file named by the SHA-256 of its key parts, so lookups
+never scan the directory. Entries expire after a TTL, and the oldest entries
+(by last access) are evicted once the cache grows past max_entries.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from atomic_files import write_json_atomic
+
+
+class DiskCache:
+    """Persistent key -> JSON value cache with TTL and size-bounded eviction."""
+
+    def __init__(self, directory: str, ttl: float = None, max_entries: int = 500, enabled: bool = True):
+        self.directory = directory
+        self.ttl = ttl  # seconds, None = never expires
+        self.max_entries = max_entries
+        self.enabled = enabled  # False = bypass reads (fresh results are still stored)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Hash the key parts into a stable file-safe key."""
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, *parts):
+        """Return the cached value for the key parts, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(self.make_key(*parts))
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            self._count("misses")
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("stored_at", 0) > self.ttl:
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        # Touch the file so eviction keeps recently used entries
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return entry.get("value")
+
+    def set(self, value, *parts) -> None:
+        """Store a JSON-serializable value under the key parts."""
+        entry = {"stored_at": time.time(), "key": parts, "value": value}
+        # Readers never see a partial entry
+        write_json_atomic(self._path(self.make_key(*parts)), entry, default=str)
+
+        self._count("writes")
+        self._evict()
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for path in self._entries():
+            self._remove(path)
+
+    def _entries(self) -> list:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, n) for n in names if n.endswith(".json")]
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until we are within max_entries."""
+        if not self.max_entries:
+            return
+
+        entries = self._entries()
+        overflow = len(entries) - self.max_entries
+        if overflow <= 0:
+            return
+
+        def _mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        for path in sorted(entries, key=_mtime)[:overflow]:
+            self._remove(path)
+            self._count("evictions")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
@@ -0,0 +1,34 @@
+"""
+Deferred imports for the agents' heavy dependencies.
+
+langgraph, langchain, groq, ddgs and requests together take most of a
+second to import. Modules declare them with lazy_importer instead, so they
+are only loaded by the code paths that actually call them.
+"""
+
+import importlib
+
+
+def lazy_importer(namespace: dict, table: dict) -> tuple:
+    """
+    table maps a name to (module, attribute), or to (module, None) for the
+    module itself. Returns (module_getattr, resolve): assign module_getattr to
+    the module's __getattr__ (PEP 562) so `module.name` works from outside,
+    and use resolve(name) inside the module. Both import on first use and
+    cache the result in `namespace`, so test patches on the name are honoured.
+    """
+
+    def module_getattr(name):
+        if name not in table:
+            raise AttributeError(f"module {namespace.get('__name__')!r} has no attribute {name!r}")
+        module, attr = table[name]
+        value = importlib.import_module(module)
+        if attr is not None:
+            value = getattr(value, attr)
+        namespace[name] = value
+        return value
+
+    def resolve(name):
+        return namespace[name] if name in namespace else module_getattr(name)
+
+    return module_getattr, resolve
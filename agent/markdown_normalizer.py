@@ -0,0 +1,150 @@
+"""
+Markdown normalizer for digest posts.
+
+Used by news_agent.format_newsletter_content on fresh LLM output and by
+fix_json_formatting.py on the published archive, so both produce the same
+layout:
+
+- "## " headings on their own line, with a blank line before and after
+  (a heading run into a paragraph, or followed by text after two spaces,
+  is split off)
+- "**Key Takeaways:**" and "**Why It Matters:**" labels on their own line,
+  with a blank line after ("**Key Takeaways**:" is accepted too)
+- run-on bullets ("- one - two") split into one bullet per line, plus a
+  blank line after each list
+- no horizontal rules (a "### " heading right after one becomes "## ")
+- single blank lines between blocks, none at the start or end
+
+Each line is tokenized once with non-backtracking patterns and the tokens
+are emitted in order, so the time is linear in the length of the post.
+Fenced code blocks pass through untouched.
+"""
+
+import re
+
+# Bump whenever the layout rules change, so archive_formatter reprocesses every post
+FORMATTER_VERSION = 1
+
+KEY_TAKEAWAYS = "**Key Takeaways:**"
+WHY_IT_MATTERS = "**Why It Matters:**"
+_LABELS = {"Key Takeaways": KEY_TAKEAWAYS, "Why It Matters": WHY_IT_MATTERS}
+
+# A label anywhere in a line, or a "## "/"### " heading at the start of a line or after whitespace
+_MARKER = re.compile(r"\*\*(?P<label>Key Takeaways|Why It Matters)(?::\*\*|\*\*:?)|(?<!\S)(?P<heading>#{2,3}) ")
+_HORIZONTAL_RULE = re.compile(r"\s*(?:-{3,}|\*{3,}|_{3,})\s*")
+_RUN_ON_BULLET = re.compile(r"\s+-\s+")
+_HEADING_TEXT_GAP = re.compile(r" {2,}")
+
+# Token kinds
+BLANK, RULE, HEADING, LABEL, BULLET, TEXT, CODE = "blank", "rule", "heading", "label", "bullet", "text", "code"
+
+
+def _bullets(text: str) -> list:
+    """Split a run-on bullet line ("- one - two") into one bullet token per item."""
+    text = text.strip()[2:]
+    return [(BULLET, "- " + part.strip()) for part in _RUN_ON_BULLET.split(text) if part.strip()]
+
+
+def _fragment(text: str) -> list:
+    """Tokens for the stretch of a line between markers."""
+    stripped = text.strip()
+    if not stripped:
+        return []
+    if stripped.startswith("- "):
+        return _bullets(stripped)
+    return [(TEXT, stripped)]
+
+
+def tokenize(content: str):
+    """Yield (kind, text) tokens for every block element of `content`, in order."""
+    in_code = False
+    for line in content.split("\n"):
+        line = line.rstrip()
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+            yield CODE, line
+            continue
+        if in_code:
+            yield CODE, line
+            continue
+        if not line.strip():
+            yield BLANK, ""
+            continue
+        if _HORIZONTAL_RULE.fullmatch(line):
+            yield RULE, ""
+            continue
+
+        markers = list(_MARKER.finditer(line))
+        if not markers:
+            if line.lstrip().startswith("- "):
+                yield from _bullets(line)
+            else:
+                yield TEXT, line
+            continue
+
+        position = 0
+        for i, marker in enumerate(markers):
+            yield from _fragment(line[position:marker.start()])
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(line)
+            if marker.group("label"):
+                yield LABEL, _LABELS[marker.group("label")]
+                position = marker.end()
+            else:
+                # Heading text runs to the next marker, or to a gap of two or more spaces
+                rest = line[marker.end():end]
+                gap = _HEADING_TEXT_GAP.search(rest)
+                title = rest[:gap.start()] if gap else rest
+                yield HEADING, f"{marker.group('heading')} {title.strip()}"
+                position = marker.end() + (gap.start() if gap else len(rest))
+        yield from _fragment(line[position:])
+
+
+def normalize_markdown(content: str) -> str:
+    """Rewrite `content` into the canonical digest layout described in the module docstring."""
+    if not content:
+        return content
+
+    out = []
+    previous = None  # kind of the last non-blank token emitted
+    after_rule = False
+
+    def blank():
+        if out and out[-1] != "":
+            out.append("")
+
+    for kind, text in tokenize(content):
+        if kind == CODE:
+            out.append(text)
+            previous = CODE
+            continue
+        if kind == BLANK:
+            blank()
+            continue
+        if kind == RULE:
+            after_rule = True
+            blank()
+            continue
+
+        if kind == HEADING:
+            if after_rule and text.startswith("### "):
+                text = text[1:]
+            blank()
+            out.append(text)
+            out.append("")
+        elif kind == LABEL:
+            blank()
+            out.append(text)
+            out.append("")
+        elif kind == BULLET:
+            out.append(text)
+        else:
+            # A paragraph straight after a list would render as part of the last bullet
+            if previous == BULLET:
+                blank()
+            out.append(text)
+        previous = kind
+        after_rule = False
+
+    while out and out[-1] == "":
+        out.pop()
+    return "\n".join(out)
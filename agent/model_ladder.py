@@ -0,0 +1,190 @@
+"""
+Model fallback ladder for the summarize step.
+
+ModelLadder exposes the parts of the chat-model interface that
+summarize_node uses (invoke, with_structured_output, stream). Each call
+tries the models in order, giving each attempt a latency budget. Once an
+attempt is over budget or fails, the call moves to the next, usually
+smaller and faster, model. With hedging on, the next model is also started
+once the current one runs past its p95 latency, and the first answer wins.
+Every attempt runs on its own thread and its budget starts when the call
+actually begins, so an abandoned attempt cannot delay the next model.
+An optional call_attempt hook wraps each attempt, hedges and fallbacks
+included, so rate limiting and retries apply per model request.
+Streams only use the top model, under the same latency budget.
+Latencies and the model that served each call are recorded.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Latency samples needed before the p95 replaces the configured hedge delay
+MIN_LATENCY_SAMPLES = 5
+MAX_LATENCY_SAMPLES = 50
+
+
+class LadderExhaustedError(RuntimeError):
+    """Raised when every model in the ladder failed or ran out of time."""
+
+
+def p95(samples: list) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class _LadderRunnable:
+    """What with_structured_output returns: invoke() runs through the ladder."""
+
+    def __init__(self, ladder, bind):
+        self._ladder = ladder
+        self._bind = bind
+
+    def invoke(self, messages, **kwargs):
+        return self._ladder.run(lambda client: self._bind(client).invoke(messages, **kwargs))
+
+
+class ModelLadder:
+    """
+    models: model names, best first. make_client(model) builds a chat model.
+    attempt_timeout: seconds one attempt may take before the ladder moves on.
+    hedge_after: seconds before a hedged request to the next model is fired
+    (None = no hedging); replaced by the model's p95 latency once enough
+    samples are in `latencies` (model -> list of seconds).
+    call_attempt(call, client) runs one attempt (default: call(client)).
+    """
+
+    def __init__(self, models: list, make_client, attempt_timeout: float = 60.0,
+                 hedge_after: float = None, latencies: dict = None, call_attempt=None):
+        if not models:
+            raise ValueError("ModelLadder needs at least one model")
+        self.models = list(models)
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after
+        self.latencies = latencies if latencies is not None else {}
+        self.served = []  # (model, seconds) for every successful call; seconds is None for cache hits
+        self._make_client = make_client
+        self._call_attempt = call_attempt or (lambda call, client: call(client))
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def client(self, model: str):
+        with self._lock:
+            if model not in self._clients:
+                self._clients[model] = self._make_client(model)
+            return self._clients[model]
+
+    def hedge_delay(self, model: str):
+        """p95 latency of `model` once there are enough samples, else the configured delay."""
+        if self.hedge_after is None:
+            return None
+        samples = self.latencies.get(model, [])
+        return p95(samples) if len(samples) >= MIN_LATENCY_SAMPLES else self.hedge_after
+
+    @property
+    def last_model(self):
+        """The model that answered this thread's most recent run(), or None if it failed."""
+        return getattr(self._local, "model", None)
+
+    def record_cached(self, model: str) -> None:
+        """Count an answer `model` gave earlier and that was served from a response cache."""
+        with self._lock:
+            self.served.append((model, None))
+
+    def _record(self, model: str, seconds: float) -> None:
+        self._local.model = model
+        with self._lock:
+            self.served.append((model, seconds))
+            samples = self.latencies.setdefault(model, [])
+            samples.append(round(seconds, 3))
+            del samples[:-MAX_LATENCY_SAMPLES]
+
+    def invoke(self, messages, **kwargs):
+        return self.run(lambda client: client.invoke(messages, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs):
+        return _LadderRunnable(self, lambda client: client.with_structured_output(schema, **kwargs))
+
+    def stream(self, messages, **kwargs):
+        """
+        Stream from the top model; a partially consumed stream cannot be handed
+        to another model, so callers fall back to invoke() if this raises.
+        Raises TimeoutError once the whole stream runs past attempt_timeout.
+        A fully consumed stream is recorded like any other answer.
+        """
+        model = self.models[0]
+        self._local.model = None
+        started = time.monotonic()
+        for chunk in self.client(model).stream(messages, **kwargs):
+            if time.monotonic() - started > self.attempt_timeout:
+                raise TimeoutError(f"{model}: stream ran past {self.attempt_timeout:g}s")
+            yield chunk
+        self._record(model, time.monotonic() - started)
+
+    def run(self, call):
+        """
+        Run call(client) down the ladder and return the first successful
+        result. Raises LadderExhaustedError if every attempt fails or times out.
+        """
+        # One thread per model, so an attempt that overruns its budget (and keeps
+        # its thread until the client gives up) never queues the next model
+        pool = ThreadPoolExecutor(max_workers=len(self.models))
+        self._local.model = None
+        errors = []
+        pending = {}  # future -> (model, [time the call started])
+        next_model = 0
+
+        def attempt(client, started):
+            started.append(time.monotonic())
+            return self._call_attempt(call, client)
+
+        def started_at(started):
+            # An attempt's budget clock runs from when its call begins, not from submission
+            return started[0] if started else time.monotonic()
+
+        def launch():
+            nonlocal next_model
+            model = self.models[next_model]
+            next_model += 1
+            started = []
+            pending[pool.submit(attempt, self.client(model), started)] = (model, started)
+
+        try:
+            launch()
+            while pending:
+                now = time.monotonic()
+                wake_at = min(started_at(started) + self.attempt_timeout for _, started in pending.values())
+                hedge_at = None
+                if len(pending) == 1 and next_model < len(self.models):
+                    model, started = next(iter(pending.values()))
+                    delay = self.hedge_delay(model)
+                    if delay is not None:
+                        hedge_at = started_at(started) + delay
+                        wake_at = min(wake_at, hedge_at)
+
+                done, _ = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    model, started = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(f"{model}: {e}")
+                        continue
+                    self._record(model, time.monotonic() - started_at(started))
+                    return result
+
+                now = time.monotonic()
+                for future, (model, started) in list(pending.items()):
+                    if now - started_at(started) >= self.attempt_timeout:
+                        pending.pop(future)
+                        errors.append(f"{model}: no answer within {self.attempt_timeout:g}s")
+                if hedge_at is not None and now >= hedge_at and pending:
+                    launch()
+                if not pending and next_model < len(self.models):
+                    launch()
+        finally:
+            # Abandoned attempts finish in the background; their answers are ignored
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        raise LadderExhaustedError("All models failed: " + "; ".join(errors))
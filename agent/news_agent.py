@@ -8,10 +8,17 @@ This agent:
 """
 
 import os
+import re
 import json
+import atexit
+import random
+import hashlib
+import operator
 import datetime
-import requests
-from typing import TypedDict, List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, TypedDict, List, Optional
 
 # Load .env file for local testing
 try:
@@ -22,9 +29,31 @@ try:
 except ImportError:
     pass  # dotenv not installed, use system env vars
 
-from langgraph.graph import StateGraph, END
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage
+from disk_cache import DiskCache
+from published_index import PublishedIndex
+from post_store import PostStore
+from prompt_budget import count_tokens, counts_are_estimates, fit_snippets, strip_repeated_boilerplate, truncate_to_tokens
+from stream_validator import IncrementalJSONValidator, MalformedStreamError
+from post_schema import POST_SCHEMA, field_schema, invalid_fields, recover_json, repair_json
+from model_ladder import ModelLadder
+from post_linter import PostLinter, describe, join_sections
+from markdown_normalizer import normalize_markdown
+from rate_limit import outbound, CircuitOpenError
+from search_backends import SearchBackend, DDGSBackend, LocalCorpusBackend
+from lazy_imports import lazy_importer
+
+# Loaded on first use so scoring helpers, --help and the unit tests start fast
+__getattr__, _lazy = lazy_importer(globals(), {
+    "StateGraph": ("langgraph.graph", "StateGraph"),
+    "END": ("langgraph.graph", "END"),
+    "ChatGroq": ("langchain_groq", "ChatGroq"),
+    "HumanMessage": ("langchain_core.messages", "HumanMessage"),
+    "requests": ("requests", None),
+    "numpy": ("numpy", None),
+})
+
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
 
 # Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -32,6 +61,97 @@ SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_REPO = os.getenv("GITHUB_REPOSITORY", "ssinghai6/personal_website_portfolio")
 
+# Search fan-out: max category queries in flight (1 = serial) and per-query deadline in seconds
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "5"))
+SEARCH_QUERY_TIMEOUT = float(os.getenv("SEARCH_QUERY_TIMEOUT", "20"))
+
+# Search paging: results per request, how deep a sparse category may go, and how many
+# quality candidates a category needs before we stop pulling pages
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "3"))
+SEARCH_FALLBACK_MAX_PAGES = int(os.getenv("SEARCH_FALLBACK_MAX_PAGES", "3"))
+SEARCH_CATEGORY_QUOTA = int(os.getenv("SEARCH_CATEGORY_QUOTA", "3"))
+
+# On-disk cache for DuckDuckGo results so reruns don't re-query (and get rate-limited)
+CACHE_DIR = os.getenv("AGENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "200"))
+SEARCH_CACHE_BYPASS = os.getenv("SEARCH_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+# LLM used by summarize_node; responses are cached on disk keyed by (model, temperature, prompt)
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+# Fallback ladder: after LLM_MODEL, try these (comma-separated) when an attempt fails or takes
+# longer than LLM_ATTEMPT_TIMEOUT seconds. LLM_HEDGE_AFTER (seconds, off by default) also fires the
+# next model once the current one is slower than that, or than its recorded p95 latency
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "llama-3.1-8b-instant").split(",") if m.strip()]
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "90"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER")) if os.getenv("LLM_HEDGE_AFTER") else None
+# OpenAI-compatible endpoint override (e.g. a local stand-in server); defaults to Groq
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50"))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+# Stream the completion and validate it as it arrives, aborting bad output early
+LLM_STREAMING = os.getenv("LLM_STREAMING", "").lower() in ("1", "true", "yes")
+# Ask for the post through the model's structured-output mode (tool calling by default) and
+# re-request only the fields that come back missing or invalid, up to STRUCTURED_REPAIR_ROUNDS times
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes")
+STRUCTURED_OUTPUT_METHOD = os.getenv("STRUCTURED_OUTPUT_METHOD", "function_calling")
+STRUCTURED_REPAIR_ROUNDS = int(os.getenv("STRUCTURED_REPAIR_ROUNDS", "2"))
+# "single" writes the whole digest in one call; "map-reduce" writes each story section in
+# parallel (at most SUMMARY_MAP_CONCURRENCY calls in flight) and then assembles the post
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "single")
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "5"))
+# Max input tokens for the summarize prompt; snippets are trimmed to fit
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+
+# Local quality gate on the finished post: sections that break the rules are
+# re-requested on their own, up to POST_REGEN_ROUNDS times
+POST_MAX_WORDS = int(os.getenv("POST_MAX_WORDS", "1200"))
+POST_MIN_SOURCES = int(os.getenv("POST_MIN_SOURCES", "4"))
+POST_REGEN_ROUNDS = int(os.getenv("POST_REGEN_ROUNDS", "2"))
+
+# Search backend: "ddgs" (live DuckDuckGo) or "local" (generated offline corpus of LOCAL_CORPUS_SIZE stories)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "ddgs")
+LOCAL_CORPUS_SIZE = int(os.getenv("LOCAL_CORPUS_SIZE", "2000"))
+
+# Index of stories already on the blog, so overlapping weekly windows don't resurface them
+_REPO_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "data")
+PUBLISHED_INDEX_PATH = os.getenv("PUBLISHED_INDEX_PATH", os.path.join(_REPO_DATA_DIR, "publishedIndex.json"))
+BLOG_POSTS_PATH = os.getenv("BLOG_POSTS_PATH", os.path.join(_REPO_DATA_DIR, "blogPosts.json"))
+
+# Stories whose token sets overlap at least this much (Jaccard) count as the same story
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.6"))
+
+# Candidate ranking: weight of each score column, overridable as
+# RANKING_WEIGHTS="authority=0.5,relevance=0.2,freshness=0.15,category=0.15"
+RANKING_COLUMNS = ("authority", "relevance", "freshness", "category")
+
+
+def parse_ranking_weights(spec: str) -> dict:
+    """
+    Default column weights overridden by a "name=value,..." spec. Raises
+    ValueError naming RANKING_WEIGHTS and the offending entry, so a typo
+    fails at startup instead of in the middle of a search.
+    """
+    weights = {"authority": 0.5, "relevance": 0.2, "freshness": 0.15, "category": 0.15}
+    for pair in filter(None, (p.strip() for p in spec.split(","))):
+        name, sep, value = (part.strip() for part in pair.partition("="))
+        if not sep:
+            raise ValueError(f"RANKING_WEIGHTS entry {pair!r} is not name=value")
+        if name not in RANKING_COLUMNS:
+            raise ValueError(f"RANKING_WEIGHTS has unknown column {name!r} (expected one of {', '.join(RANKING_COLUMNS)})")
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise ValueError(f"RANKING_WEIGHTS value for {name!r} is not a number: {value!r}") from None
+    return weights
+
+
+RANKING_WEIGHTS = parse_ranking_weights(os.getenv("RANKING_WEIGHTS", ""))
+# A story loses half its freshness score every this many days
+RANKING_FRESHNESS_HALF_LIFE_DAYS = float(os.getenv("RANKING_FRESHNESS_HALF_LIFE_DAYS", "3"))
+
 # AI/ML keywords for filtering relevant news
 AI_KEYWORDS = [
     'ai', 'artificial intelligence', 'machine learning', 'ml', 'llm', 
@@ -39,6 +159,10 @@ AI_KEYWORDS = [
     'anthropic', 'model', 'transformer', 'chatbot', 'nlp', 'computer vision',
     'generative', 'diffusion', 'robotics', 'automation', 'data science'
 ]
+# Brand names that usually appear in compounds ("ChatGPT", "GPT-4o", "GenAI", "LLMs",
+# "Copilot+"). Regexes over lowercased text, each anchored at a word start so "llm" never
+# matches inside "enrollment" or "installments"
+AI_BRAND_PATTERNS = [r'\b\w*gpt[\w-]*', r'\bllms?\b', r'\bgen-?ai\b', r'\bcopilot\+?']
 
 # ============================================================================
 # SOURCE QUALITY RANKING SYSTEM
@@ -191,46 +315,108 @@ EXCLUDED_PATTERNS = [
 ]
 
 
+# Hard exclusions checked before any tier match (only truly bad sources)
+QUALITY_EXCLUDED_DOMAINS = ["motleyfool.com", "yahoo.com", "msn.com", "scoop.co.nz"]
+
+DEFAULT_SOURCE_SCORE = (500, "Other", "Other - Unknown Source")  # Medium priority, not excluded
+EXCLUDED_SOURCE_SCORE = (999, "Excluded", "Excluded - Low Quality")
+
+
+def _split_url(url: str) -> tuple[str, str]:
+    """Split a URL (or bare 'domain/path' key) into (host, path), both lowercased."""
+    from urllib.parse import urlsplit
+
+    url = url.strip().lower()
+    if "://" not in url:
+        url = "//" + url
+    try:
+        parts = urlsplit(url)
+        return (parts.hostname or "", parts.path.rstrip("/"))
+    except ValueError:
+        return ("", "")
+
+
+def build_source_index(tiers: dict, excluded: list) -> tuple[dict, set]:
+    """
+    Compile SOURCE_QUALITY_TIERS into a host-suffix hash map.
+    Returns ({host: [(path_prefix, score), ...]}, excluded_hosts). Keys with a
+    path (e.g. "wsj.com/ai") only match URLs under that path.
+    """
+    index = {}
+    for key, info in tiers.items():
+        host, path = _split_url(key)
+        score = ((info["tier"] * 100) - info["priority"], f"Tier {info['tier']}", info["name"])
+        index.setdefault(host, []).append((path, score))
+
+    # Best score first so the first matching prefix per host wins
+    for entries in index.values():
+        entries.sort(key=lambda e: e[1][0])
+
+    return index, {_split_url(d)[0] for d in excluded}
+
+
+_SOURCE_INDEX, _QUALITY_EXCLUDED_HOSTS = build_source_index(SOURCE_QUALITY_TIERS, QUALITY_EXCLUDED_DOMAINS)
+
+
+def rebuild_source_index() -> None:
+    """Recompile the lookup index after editing SOURCE_QUALITY_TIERS at runtime."""
+    global _SOURCE_INDEX, _QUALITY_EXCLUDED_HOSTS
+    _SOURCE_INDEX, _QUALITY_EXCLUDED_HOSTS = build_source_index(SOURCE_QUALITY_TIERS, QUALITY_EXCLUDED_DOMAINS)
+
+
 def get_source_quality_score(url: str) -> tuple[int, str, str]:
     """
     Get the quality score for a URL.
     Returns: (priority_score, tier_name, source_name)
     Lower score = better quality (priority 1 = best)
+
+    Matches on the parsed host and its parent domains (news.mit.edu -> mit.edu),
+    so cost is proportional to the number of host labels, not the registry size.
     """
     if not url:
         return (500, "Unknown", "Unknown - No URL")
-    
-    url_lower = url.lower()
-    
-    # Check exclusions first (only truly bad sources)
-    for excluded in ["motleyfool.com", "yahoo.com", "msn.com", "scoop.co.nz"]:
-        if excluded in url_lower:
-            return (999, "Excluded", "Excluded - Low Quality")
-    
-    # Find best matching source
-    best_match = (500, "Other", "Other - Unknown Source")  # Default to medium priority, not excluded
-    
-    for domain, info in SOURCE_QUALITY_TIERS.items():
-        if domain in url_lower:
-            # Calculate effective priority (lower is better)
-            # tier * 100 + offset within tier
-            effective_priority = (info["tier"] * 100) - info["priority"]
-            if effective_priority < best_match[0]:
-                best_match = (effective_priority, f"Tier {info['tier']}", info["name"])
-    
+
+    host, path = _split_url(url)
+    labels = host.split(".")
+    best_match = DEFAULT_SOURCE_SCORE
+
+    for i in range(len(labels)):
+        suffix = ".".join(labels[i:])
+        if suffix in _QUALITY_EXCLUDED_HOSTS:
+            return EXCLUDED_SOURCE_SCORE
+        for prefix, score in _SOURCE_INDEX.get(suffix, ()):
+            if not prefix or path == prefix or path.startswith(prefix + "/"):
+                if score[0] < best_match[0]:
+                    best_match = score
+                break
+
     return best_match
 
 
+def score_source_urls(urls: list) -> tuple[list, list, list]:
+    """
+    Score many URLs in one call.
+    Returns parallel lists (priorities, tiers, source_names) in input order.
+    """
+    priorities, tiers, names = [], [], []
+    for url in urls:
+        priority, tier, name = get_source_quality_score(url)
+        priorities.append(priority)
+        tiers.append(tier)
+        names.append(name)
+    return priorities, tiers, names
+
+
 def rank_news_items_by_source_quality(news_items: list) -> list:
     """
-    Sort news items by source quality, prioritizing authoritative sources.
+    Attach source quality metadata and order news items best first, with
+    source authority as the heaviest of the ranking columns.
     """
     scored_items = []
+    urls = [item.get("link", "") for item in news_items]
+    priorities, tiers, names = score_source_urls(urls)
     
-    for item in news_items:
-        url = item.get("link", "")
-        priority, tier, source_name = get_source_quality_score(url)
-        
+    for item, url, priority, tier, source_name in zip(news_items, urls, priorities, tiers, names):
         scored_items.append({
             **item,
             "_source_priority": priority,
@@ -239,10 +425,8 @@ def rank_news_items_by_source_quality(news_items: list) -> list:
             "_source_domain": extract_domain(url)
         })
     
-    # Sort by priority (lower = better)
-    scored_items.sort(key=lambda x: x.get("_source_priority", 999))
-    
-    return scored_items
+    # Best first by the combined ranking (authority, relevance, freshness, category fit)
+    return rank_candidates(scored_items)
 
 
 def extract_domain(url: str) -> str:
@@ -317,13 +501,12 @@ def validate_sources(sources: list) -> list:
     Returns sorted list of valid sources with quality metadata.
     """
     validated = []
+    priorities, tiers, names = score_source_urls([source.get("url", "") for source in sources])
     
-    for source in sources:
+    for source, priority, tier, source_name in zip(sources, priorities, tiers, names):
         url = source.get("url", "")
         title = source.get("title", "")
         
-        priority, tier, source_name = get_source_quality_score(url)
-        
         # Skip completely excluded sources
         if priority >= 999:
             print(f"⚠️  Excluding low-quality source: {title} ({url})")
@@ -344,61 +527,12 @@ def validate_sources(sources: list) -> list:
 
 
 def format_newsletter_content(content: str) -> str:
-    """Post-process newsletter content to fix formatting issues - match exact output format."""
-    if not content:
-        return content
-    
-    import re
-    
-    # Step 1: Fix headings with content on same line (e.g., "## Heading  Some content")
-    # Split "## " heading from its content with double newline
-    content = re.sub(r'(## [^\n]+?)( {2,})([^\n])', r'\1\n\n\3', content)
-    
-    # Step 2: Fix "**Key Takeaways:**" followed by content on same line or run-on bullets
-    # Pattern: "**Key Takeaways:** - item1 - item2" -> split properly
-    content = re.sub(r'\*\*Key Takeaways:\*\*(\s*)- ', r'**Key Takeaways:**\n\n- ', content)
-    content = re.sub(r'(-\s+[^\n]+?)\s+-\s+', r'\1\n- ', content)
-    
-    # Step 3: Fix "**Why It Matters:**" followed by content on same line
-    content = re.sub(r'\*\*Why It Matters:\*\*(\s+)', r'**Why It Matters:**\n\n', content)
-    
-    # Step 4: Split by lines and ensure proper spacing
-    lines = content.split('\n')
-    formatted_lines = []
-    skip_next = False
-    
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        
-        # Skip empty lines that might cause double spacing
-        if stripped == '':
-            # Add single blank line if previous wasn't blank
-            if formatted_lines and formatted_lines[-1] != '':
-                formatted_lines.append('')
-            continue
-        
-        # Fix headings - ensure content is on new line after heading
-        if stripped.startswith('## '):
-            # Add blank line before heading if needed
-            if formatted_lines and formatted_lines[-1].strip() != '' and formatted_lines[-1].strip() != '':
-                formatted_lines.append('')
-            formatted_lines.append(stripped)
-            formatted_lines.append('')
-        # Ensure blank line after **Key Takeaways:** and **Why It Matters:**
-        elif stripped == '**Key Takeaways:**':
-            formatted_lines.append(stripped)
-            formatted_lines.append('')
-        elif stripped == '**Why It Matters:**':
-            formatted_lines.append(stripped)
-            formatted_lines.append('')
-        else:
-            formatted_lines.append(line)
-    
-    # Final cleanup: remove multiple consecutive blank lines
-    result = '\n'.join(formatted_lines)
-    result = re.sub(r'\n{3,}', '\n\n', result)
-    
-    return result
+    """
+    Post-process newsletter content into the digest's markdown layout. Shares
+    markdown_normalizer with fix_json_formatting.py, so fresh posts and the
+    repaired archive come out identical.
+    """
+    return normalize_markdown(content)
 
 
 def validate_and_enhance_sources(generated_post: dict, news_items: list) -> dict:
@@ -505,27 +639,54 @@ def validate_and_enhance_sources(generated_post: dict, news_items: list) -> dict
 TRUSTED_DOMAINS = list(SOURCE_QUALITY_TIERS.keys())
 
 
+def build_relevance_matcher(keywords: list, brand_patterns: list = ()) -> "re.Pattern":
+    """
+    Compile the AI keywords and brand patterns into one alternation regex.
+    Keywords must match whole words, with an optional plural "s", so "ai" no
+    longer matches inside "said" but "models" still counts; brand patterns
+    are used as given (see AI_BRAND_PATTERNS).
+    """
+    words = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+    keyword_alts = [r"[\s-]+".join(re.escape(part) for part in word.split()) for word in words]
+    return re.compile("|".join([r"\b(?:" + "|".join(keyword_alts) + r")s?\b", *brand_patterns]))
+
+
+def build_exclusion_matcher(excluded_domains: list, excluded_patterns: list) -> "re.Pattern":
+    """Compile the exclusion lists into one regex; they keep substring semantics and only apply to links."""
+    excluded = sorted({p.lower() for p in excluded_domains + excluded_patterns}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(e) for e in excluded))
+
+
+_RELEVANCE_MATCHER = build_relevance_matcher(AI_KEYWORDS, AI_BRAND_PATTERNS)
+_EXCLUSION_MATCHER = build_exclusion_matcher(EXCLUDED_DOMAINS, EXCLUDED_PATTERNS)
+
+
+def rebuild_relevance_matcher() -> None:
+    """Recompile the matchers after editing AI_KEYWORDS, AI_BRAND_PATTERNS or the exclusion lists at runtime."""
+    global _RELEVANCE_MATCHER, _EXCLUSION_MATCHER
+    _RELEVANCE_MATCHER = build_relevance_matcher(AI_KEYWORDS, AI_BRAND_PATTERNS)
+    _EXCLUSION_MATCHER = build_exclusion_matcher(EXCLUDED_DOMAINS, EXCLUDED_PATTERNS)
+
+
 def is_ai_relevant(title: str, snippet: str, link: str) -> bool:
-    """Check if a news item is AI/ML relevant based on keywords and source quality."""
-    text = (title + " " + snippet).lower()
-    link_lower = link.lower()
-    
-    # Check for excluded patterns in URL
-    for pattern in EXCLUDED_PATTERNS:
-        if pattern in link_lower:
-            return False
-    
-    # Check if source is in excluded domains list (low quality)
-    for excluded in EXCLUDED_DOMAINS:
-        if excluded in link_lower:
-            return False
-    
-    # Check for AI keywords in title or snippet
-    for keyword in AI_KEYWORDS:
-        if keyword in text:
-            return True
-    
-    return False
+    """
+    Check if a news item is AI/ML relevant based on keywords and source quality.
+
+    The link is scanned with the exclusions alone (an exclusion hit rejects the
+    item), so no keyword or brand match can hide an excluded domain; the
+    title/snippet text is then accepted on its first keyword hit.
+    """
+    if _EXCLUSION_MATCHER.search((link or "").lower()):
+        return False
+    return _RELEVANCE_MATCHER.search(f"{title or ''} {snippet or ''}".lower()) is not None
+
+
+def ai_relevance_mask(news_items: list) -> list:
+    """Batch version of is_ai_relevant: one bool per item, in order."""
+    return [
+        is_ai_relevant(item.get("title", ""), item.get("snippet", ""), item.get("link", ""))
+        for item in news_items
+    ]
 
 
 def get_best_link(news_items: list, preferred_tiers: list = None) -> str:
@@ -554,11 +715,10 @@ def get_best_link(news_items: list, preferred_tiers: list = None) -> str:
             return link
     
     # Fallback: try to find any trusted domain
-    for item in news_items:
-        link = item.get('link', '')
-        for domain in TRUSTED_DOMAINS:
-            if domain in link.lower():
-                return link
+    links = [item.get('link', '') for item in news_items]
+    for link, priority in zip(links, score_source_urls(links)[0]):
+        if priority < 500:
+            return link
     
     # Last resort fallback
     if news_items and news_items[0].get('link'):
@@ -586,39 +746,662 @@ class AgentState(TypedDict):
 # ============================================================================
 
 
-from ddgs import DDGS
-
 # ============================================================================
 # SEARCH CATEGORIES - Multi-query approach for topic diversity
 # ============================================================================
 SEARCH_CATEGORIES = [
     {
         "name": "Model Releases & AI Products",
+        "category": "Model Releases",
         "query": "new AI model release OR LLM launch OR AI product announcement this week",
         "description": "New model launches, product updates from OpenAI, Anthropic, Google, Meta, etc."
     },
     {
         "name": "AI Research & Breakthroughs",
+        "category": "Research",
         "query": "AI research breakthrough OR machine learning paper OR AI benchmark this week",
         "description": "Academic papers, research milestones, new techniques"
     },
     {
         "name": "AI Business & Industry Impact",
+        "category": "Business",
         "query": "AI business impact OR AI startup funding OR AI enterprise adoption this week",
         "description": "Funding rounds, partnerships, enterprise deployments, market shifts"
     },
     {
         "name": "AI Policy & Safety",
+        "category": "Policy",
         "query": "AI regulation OR AI safety OR AI policy OR AI ethics this week",
         "description": "Government regulation, safety research, ethical debates"
     },
     {
         "name": "AI Tools & Developer Updates",
+        "category": "Developer Tools",
         "query": "AI developer tools OR AI API update OR Claude OR ChatGPT features this week",
         "description": "New features, API updates, developer tools, open source releases"
     }
 ]
 
+search_cache = DiskCache(
+    os.path.join(CACHE_DIR, "search"),
+    ttl=SEARCH_CACHE_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    enabled=not SEARCH_CACHE_BYPASS,
+)
+
+# Content-addressed: an identical prompt to the same model always maps to the same entry,
+# so there is no TTL, only LRU eviction
+llm_cache = DiskCache(
+    os.path.join(CACHE_DIR, "llm"),
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    enabled=not LLM_CACHE_BYPASS,
+)
+
+# Recent per-model latencies, used as the hedging threshold (p95) across runs
+llm_latency_cache = DiskCache(os.path.join(CACHE_DIR, "llm-latency"), max_entries=5)
+
+# Enough Groq burst for every map-reduce section plus the assembly call, so sections start together
+outbound.set_burst("api.groq.com", SUMMARY_MAP_CONCURRENCY + 1)
+
+# Only read when the index file is missing; the store is the source of truth once it exists
+_post_store = PostStore(_REPO_DATA_DIR)
+published_index = PublishedIndex.load(PUBLISHED_INDEX_PATH, posts_path=BLOG_POSTS_PATH,
+                                      posts=_post_store.iter_posts if _post_store.exists() else None)
+
+
+def make_search_backend(name: str = None) -> SearchBackend:
+    """Build the search backend named by SEARCH_BACKEND ("ddgs" or "local")."""
+    name = SEARCH_BACKEND if name is None else name
+    if name == "ddgs":
+        return DDGSBackend(timeout=SEARCH_QUERY_TIMEOUT)
+    if name == "local":
+        return LocalCorpusBackend(
+            size=LOCAL_CORPUS_SIZE,
+            trusted_domains=list(SOURCE_QUALITY_TIERS),
+            excluded_domains=EXCLUDED_DOMAINS,
+            keywords=AI_KEYWORDS,
+        )
+    raise ValueError(f"Unknown search backend: {name!r} (expected 'ddgs' or 'local')")
+
+
+_search_backend = None
+_search_backend_lock = threading.Lock()
+
+
+def get_search_backend() -> SearchBackend:
+    """Return the run's shared search backend, creating it on first use."""
+    global _search_backend
+    with _search_backend_lock:
+        if _search_backend is None:
+            _search_backend = make_search_backend()
+        return _search_backend
+
+
+def set_search_backend(backend: SearchBackend) -> None:
+    """Install a specific backend for the current run (tests, benchmarks)."""
+    global _search_backend
+    close_search_backend()
+    with _search_backend_lock:
+        _search_backend = backend
+
+
+def close_search_backend() -> None:
+    """Close the shared search backend; the next search opens a fresh one."""
+    global _search_backend
+    with _search_backend_lock:
+        backend, _search_backend = _search_backend, None
+    if backend is not None:
+        backend.close()
+        print(f"🔌 Closed {backend.name} search backend after {backend.requests} queries")
+
+
+# Safety net for runs that raise before the graph's cleanup node
+atexit.register(close_search_backend)
+
+
+def cached_search(method: str, query: str, timelimit: str = None, max_results: int = 15, page: int = 1) -> list:
+    """
+    Run a news / text search on the active backend through the on-disk search cache.
+    Keyed by (backend, method, query, timelimit, max_results, page); only
+    non-empty result lists are stored so a throttled run never poisons later reruns.
+    """
+    backend = get_search_backend()
+    key = (backend.name, method, query, timelimit, max_results, page)
+    if backend.cacheable:
+        cached = search_cache.get(*key)
+        if cached is not None:
+            print(f"  💾 Cache hit for {method} '{query[:40]}' page {page} ({len(cached)} results)")
+            return cached
+
+    kwargs = {"max_results": max_results}
+    if timelimit:
+        kwargs["timelimit"] = timelimit
+    if page > 1:
+        kwargs["page"] = page
+    results = backend.search(method, query, **kwargs)
+
+    if results and backend.cacheable:
+        search_cache.set(results, *key)
+    return results
+
+
+def iter_search_pages(method: str, query: str, timelimit: str = None, page_size: int = None,
+                      max_pages: int = None, deadline: float = None):
+    """
+    Lazily yield pages of raw DDGS results. A page is only requested when the
+    consumer asks for it, so callers that stop early never pay for deeper pages.
+    Errors on the first page propagate (so callers can fall back); errors on
+    later pages just end the stream.
+    """
+    page_size = SEARCH_PAGE_SIZE if page_size is None else page_size
+    max_pages = SEARCH_MAX_PAGES if max_pages is None else max_pages
+    deadline = time.monotonic() + SEARCH_QUERY_TIMEOUT if deadline is None else deadline
+
+    for page in range(1, max_pages + 1):
+        remaining = deadline - time.monotonic()
+        if remaining < 1:
+            print(f"  ⏱️ Deadline reached before page {page} of '{query[:40]}'")
+            return
+        try:
+            results = cached_search(method, query, timelimit=timelimit, max_results=page_size, page=page)
+        except Exception as e:
+            if page == 1:
+                raise
+            print(f"  ⚠️ Stopping after page {page - 1} of '{query[:40]}': {e}")
+            return
+        if not results:
+            return
+        yield results
+
+
+def normalize_search_results(raw_results: list, link_key: str, category: str) -> list:
+    """Map raw DDGS dicts (news: 'url', text: 'href') onto our news item shape; only news results carry a date."""
+    return [{
+        "title": item.get("title", ""),
+        "snippet": item.get("body", ""),
+        "link": item.get(link_key, ""),
+        "date": item.get("date", ""),
+        "_search_category": category,
+    } for item in raw_results]
+
+
+def qualify_results(results: list, seen_domains: set) -> list:
+    """
+    Keep AI-relevant results from known-quality sources whose domain has not
+    been seen yet, attaching source quality metadata. Updates seen_domains.
+    Stories that were already published are dropped before any scoring.
+    """
+    fresh = []
+    for item in results:
+        if published_index.contains(item.get("link", ""), item.get("title", "")):
+            print(f"  ♻️ Skipping already published: {item.get('title', '')[:40]}...")
+            continue
+        fresh.append(item)
+    results = fresh
+
+    qualified = []
+    relevant = ai_relevance_mask(results)
+    scores = zip(*score_source_urls([item.get("link", "") for item in results]))
+    for item, is_relevant, (priority, tier, source_name) in zip(results, relevant, scores):
+        link = item.get("link", "")
+
+        # Check AI relevance
+        if not is_relevant:
+            continue
+
+        # Early source quality filter: skip unknown/untrusted sources (priority >= 500)
+        if priority >= 500:
+            print(f"  ⛔ Skipping unknown source: {extract_domain(link)} - {item.get('title', '')[:40]}...")
+            continue
+
+        # Deduplicate by domain
+        domain = extract_domain(link)
+        if domain in seen_domains:
+            continue
+        seen_domains.add(domain)
+
+        # Attach quality metadata
+        item["_source_priority"] = priority
+        item["_source_tier"] = tier
+        item["_source_name"] = source_name
+        item["_source_domain"] = domain
+        qualified.append(item)
+
+    return qualified
+
+
+# ============================================================================
+# NEAR-DUPLICATE STORY CLUSTERING
+# ============================================================================
+# The same announcement often comes back from several outlets. MinHash
+# signatures over title + snippet tokens, bucketed with LSH bands, find
+# near-duplicates in roughly linear time; only the best-tier copy is kept.
+
+_DEDUP_TOKEN = re.compile(r"[a-z0-9]+")
+_DEDUP_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "its", "is", "at",
+    "by", "as", "from", "that", "this", "it", "new", "has", "have", "be", "will", "said", "says",
+}
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of stories. Two stories are near-duplicates when the
+    estimated Jaccard similarity of their token sets is >= threshold.
+    The num_perm hash values are split into `bands`; only stories sharing a
+    band are compared, so each lookup touches a handful of candidates.
+    """
+
+    def __init__(self, threshold: float = None, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        self.threshold = DEDUP_SIMILARITY if threshold is None else threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        # XOR with a random 64-bit mask stands in for each hash permutation
+        self._masks = [rng.getrandbits(64) for _ in range(num_perm)]
+        self._buckets = {}  # (band, band values) -> entry ids
+        self._entries = []  # (signature, item)
+
+    @staticmethod
+    def tokens(item: dict) -> set:
+        text = f"{item.get('title', '')} {item.get('snippet', '')}".lower()
+        return {t for t in _DEDUP_TOKEN.findall(text) if t not in _DEDUP_STOPWORDS}
+
+    def signature(self, item: dict) -> tuple:
+        # blake2b rather than hash() so signatures are stable across processes
+        hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big")
+                  for t in self.tokens(item)] or [0]
+        return tuple(min(map(mask.__xor__, hashes)) for mask in self._masks)
+
+    def _band_keys(self, signature: tuple) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def find(self, signature: tuple):
+        """Return an indexed item whose signature is similar enough, or None."""
+        checked = set()
+        for key in self._band_keys(signature):
+            for entry_id in self._buckets.get(key, ()):
+                if entry_id in checked:
+                    continue
+                checked.add(entry_id)
+                other, item = self._entries[entry_id]
+                agreement = sum(map(operator.eq, signature, other)) / len(signature)
+                if agreement >= self.threshold:
+                    return item
+        return None
+
+    def add(self, item: dict):
+        """
+        Index `item`, unless it near-duplicates a story already indexed; then
+        that existing story is returned and the index is left unchanged.
+        """
+        signature = self.signature(item)
+        existing = self.find(signature)
+        if existing is not None:
+            return existing
+        entry_id = len(self._entries)
+        self._entries.append((signature, item))
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(entry_id)
+        return None
+
+
+def collapse_near_duplicates(items: list, index: NearDuplicateIndex = None) -> list:
+    """
+    Drop near-duplicate stories, keeping the best source-quality member of
+    each cluster (earliest wins ties). Survivors keep their original order and
+    list the domains of the copies they absorbed in "_duplicate_sources".
+    """
+    index = NearDuplicateIndex() if index is None else index
+    order = sorted(range(len(items)), key=lambda i: (items[i].get("_source_priority", 999), i))
+
+    kept = set()
+    for i in order:
+        existing = index.add(items[i])
+        if existing is None:
+            kept.add(i)
+        else:
+            existing.setdefault("_duplicate_sources", []).append(items[i].get("_source_domain", ""))
+
+    return [item for i, item in enumerate(items) if i in kept]
+
+
+# ============================================================================
+# STORY CATEGORY CLASSIFIER
+# ============================================================================
+# Weighted keywords per category. A trailing "*" matches any word starting with
+# the stem ("regulat*" -> regulation, regulators). Generic words like "model"
+# get a low weight so they only decide a story when nothing more specific matches.
+CATEGORY_KEYWORDS = {
+    "Model Releases": {
+        "launch*": 1.0, "releas*": 1.0, "unveil*": 1.0, "model": 0.3, "models": 0.3, "gpt": 1.0,
+        "claude": 1.0, "gemini": 1.0, "llama": 1.0, "open-source": 0.6, "open-weight": 1.2,
+        "weights": 1.0, "parameter*": 0.8, "multimodal": 0.8, "checkpoint*": 0.8,
+    },
+    "Research": {
+        "paper*": 1.5, "research*": 1.2, "study": 1.0, "studies": 1.0, "benchmark*": 1.0,
+        "arxiv": 1.5, "breakthrough*": 1.0, "dataset*": 1.0, "scientist*": 1.0, "peer-reviewed": 1.2,
+    },
+    "Business": {
+        "funding": 1.5, "raise*": 1.2, "startup*": 1.2, "acqui*": 1.5, "revenue": 1.2,
+        "valuation": 1.5, "invest*": 1.2, "enterprise*": 1.0, "partnership*": 1.0, "deal*": 1.0,
+        "market*": 0.8, "earnings": 1.2, "customers": 0.8, "adoption": 1.0, "business*": 0.8,
+    },
+    "Policy": {
+        "regulat*": 1.5, "policy": 1.2, "policies": 1.2, "law": 1.2, "laws": 1.2, "ban": 1.0,
+        "bans": 1.0, "banned": 1.0, "govern*": 1.0,
+        "eu": 1.0, "congress": 1.2, "safety": 1.0, "executive order": 1.5, "lawmakers": 1.5,
+        "ethic*": 1.0, "copyright": 1.2, "lawsuit*": 1.2, "senate": 1.2,
+    },
+    "Developer Tools": {
+        "sdk*": 1.5, "api*": 1.2, "framework*": 1.0, "tool": 1.0, "tools": 1.0, "developer*": 1.2,
+        "library": 1.0, "libraries": 1.0, "plugin*": 1.0, "open source": 0.8, "platform*": 0.6,
+        "github": 1.0, "ide": 1.2, "coding": 1.0, "agents": 0.6, "features": 0.6,
+    },
+}
+# Used when no keyword matches at all
+DEFAULT_STORY_CATEGORY = "Business"
+
+
+class KeywordCategoryClassifier:
+    """
+    Scores items against every category at once: one regex pass per item
+    counts vocabulary hits into a (items x keywords) matrix, and a single
+    matrix product with the (keywords x categories) weights gives the
+    per-category scores.
+    """
+
+    def __init__(self, category_keywords: dict, default: str = DEFAULT_STORY_CATEGORY):
+        self.categories = list(category_keywords)
+        self.default = default
+        self.vocabulary = sorted({kw for keywords in category_keywords.values() for kw in keywords})
+        self._column = {kw: i for i, kw in enumerate(self.vocabulary)}
+        self._category_keywords = category_keywords
+        self._weights = None
+
+        # One named group per keyword so a match maps straight to its column
+        parts = []
+        for i, kw in enumerate(self.vocabulary):
+            stem = kw.rstrip("*")
+            body = r"[\s-]+".join(re.escape(w) for w in re.split(r"[\s-]+", stem))
+            tail = r"\w*" if kw.endswith("*") else ""
+            parts.append(f"(?P<k{i}>{body}{tail})")
+        # Word boundaries outside the alternation, so only word starts try the keywords
+        self._pattern = re.compile(r"\b(?:" + "|".join(parts) + r")\b", re.IGNORECASE)
+
+    @property
+    def weights(self):
+        """(keywords x categories) weight matrix, built on first use."""
+        if self._weights is None:
+            np = _lazy("numpy")
+            weights = np.zeros((len(self.vocabulary), len(self.categories)))
+            for j, category in enumerate(self.categories):
+                for kw, weight in self._category_keywords[category].items():
+                    weights[self._column[kw], j] = weight
+            self._weights = weights
+        return self._weights
+
+    def scores(self, items: list):
+        """(items x categories) array of keyword scores over title + snippet."""
+        np = _lazy("numpy")
+        counts = np.zeros((len(items), len(self.vocabulary)))
+        for row, item in enumerate(items):
+            text = f"{item.get('title', '')} {item.get('snippet', '')}"
+            for match in self._pattern.finditer(text):
+                counts[row, int(match.lastgroup[1:])] += 1
+        return counts @ self.weights
+
+    def classify(self, items: list) -> list:
+        """Best category per item (DEFAULT_STORY_CATEGORY when nothing matches)."""
+        if not items:
+            return []
+        scores = self.scores(items)
+        best = scores.argmax(axis=1)
+        return [self.categories[j] if scores[row, j] > 0 else self.default for row, j in enumerate(best)]
+
+
+category_classifier = KeywordCategoryClassifier(CATEGORY_KEYWORDS)
+
+
+def tag_categories(items: list) -> list:
+    """Attach "_category" to each item (in place) and return the labels."""
+    labels = category_classifier.classify(items)
+    for item, label in zip(items, labels):
+        item["_category"] = label
+    return labels
+
+
+# ============================================================================
+# CANDIDATE RANKING
+# ============================================================================
+# Every candidate gets one row of scores in [0, 1]; the weighted sum of the
+# columns (RANKING_WEIGHTS) orders them. Only the per-item regex scans are
+# Python loops, everything else is computed over the whole batch at once.
+# Keyword hits at which relevance reaches 0.5
+RELEVANCE_HALF_HITS = 2
+# Score for a column with nothing to go on (no date, no search category)
+NEUTRAL_SCORE = 0.5
+
+# Which story category each search query is looking for
+SEARCH_CATEGORY_TARGETS = {cat["name"]: cat["category"] for cat in SEARCH_CATEGORIES}
+
+
+def _published_timestamp(value: str) -> float:
+    """POSIX time of a DDGS ISO date, or NaN when it is missing or unparseable."""
+    try:
+        published = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return float("nan")
+    if published.tzinfo is None:
+        published = published.replace(tzinfo=datetime.timezone.utc)
+    return published.timestamp()
+
+
+def candidate_score_matrix(items: list, now: float = None):
+    """
+    (items x RANKING_COLUMNS) array:
+    - authority: source quality, 1.0 for the best tier down to 0.0 for unknown sources
+    - relevance: AI keyword hits in title + snippet, saturating at 1.0
+    - freshness: halves every RANKING_FRESHNESS_HALF_LIFE_DAYS from the item's date
+    - category: share of the item's category keyword score that matches what its
+      search query was looking for
+    """
+    np = _lazy("numpy")
+    now = time.time() if now is None else now
+
+    priorities = np.array([item.get("_source_priority", DEFAULT_SOURCE_SCORE[0]) for item in items], dtype=float)
+    authority = 1.0 - np.clip(priorities, 0, DEFAULT_SOURCE_SCORE[0]) / DEFAULT_SOURCE_SCORE[0]
+
+    hits = np.array([
+        sum(1 for _ in _RELEVANCE_MATCHER.finditer(f"{item.get('title', '')} {item.get('snippet', '')}".lower()))
+        for item in items
+    ], dtype=float)
+    relevance = hits / (hits + RELEVANCE_HALF_HITS)
+
+    published = np.array([_published_timestamp(item.get("date")) for item in items], dtype=float)
+    age_days = np.clip((now - published) / 86400.0, 0, None)
+    freshness = np.where(np.isnan(published), NEUTRAL_SCORE,
+                         0.5 ** (age_days / RANKING_FRESHNESS_HALF_LIFE_DAYS))
+
+    category_scores = category_classifier.scores(items)
+    columns = {c: j for j, c in enumerate(category_classifier.categories)}
+    target = np.array([columns.get(SEARCH_CATEGORY_TARGETS.get(item.get("_search_category")), -1)
+                       for item in items])
+    totals = category_scores.sum(axis=1)
+    matched = category_scores[np.arange(len(items)), np.clip(target, 0, None)]
+    fit = np.divide(matched, totals, out=np.zeros(len(items)), where=totals > 0)
+    fit = np.where(target < 0, NEUTRAL_SCORE, fit)
+
+    return np.column_stack([authority, relevance, freshness, fit])
+
+
+def rank_candidates(items: list, weights: dict = None, now: float = None) -> list:
+    """
+    Score every item with candidate_score_matrix and return them best first
+    (ties keep their input order). Each item gets its combined "_rank_score".
+    """
+    if not items:
+        return []
+    weights = RANKING_WEIGHTS if weights is None else weights
+    unknown = set(weights) - set(RANKING_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown ranking columns: {sorted(unknown)} (expected {RANKING_COLUMNS})")
+
+    np = _lazy("numpy")
+    scores = candidate_score_matrix(items, now) @ np.array([weights.get(c, 0.0) for c in RANKING_COLUMNS])
+    for item, score in zip(items, scores):
+        item["_rank_score"] = round(float(score), 4)
+    return [items[i] for i in np.argsort(-scores, kind="stable")]
+
+
+def claim_domains(items: list, claimed_domains: set) -> list:
+    """
+    Keep the items whose source domain no earlier category has claimed yet
+    and claim those domains. Only called from the thread that owns
+    `claimed_domains` (see settle_domain_claims).
+    """
+    kept = []
+    for item in items:
+        domain = item.get("_source_domain")
+        if domain in claimed_domains:
+            continue
+        claimed_domains.add(domain)
+        kept.append(item)
+    return kept
+
+
+def fetch_category_results(cat: dict, timeout: float = None, quota: int = None,
+                           claimed_domains: set = None) -> list:
+    """
+    Stream one category query through relevance, quality and per-category
+    domain filtering, and stop pulling pages once `quota` candidates are in
+    hand. Deeper pages are only requested for categories that come up short.
+
+    When `claimed_domains` is shared across categories, a domain already taken
+    by an earlier category does not count towards the quota, so the category
+    keeps paging until it has `quota` domains that are new across the whole run.
+
+    Uses DuckDuckGo News, falling back to a text search if the news backend
+    fails outright. The fallback is only attempted while the per-query
+    deadline has not passed.
+    """
+    cat_name = cat["name"]
+    cat_query = cat["query"]
+    timeout = SEARCH_QUERY_TIMEOUT if timeout is None else timeout
+    quota = SEARCH_CATEGORY_QUOTA if quota is None else quota
+    deadline = time.monotonic() + timeout
+    print(f"👉 Querying DuckDuckGo [{cat_name}]: '{cat_query}'")
+
+    candidates = []
+    seen_domains = set()
+    pulled = 0
+
+    def _consume(pages, link_key):
+        nonlocal pulled
+        for page in pages:
+            pulled += len(page)
+            fresh = qualify_results(normalize_search_results(page, link_key, cat_name), seen_domains)
+            if claimed_domains is not None:
+                fresh = claim_domains(fresh, claimed_domains)
+            candidates.extend(fresh)
+            if len(candidates) >= quota:
+                return
+
+    try:
+        _consume(iter_search_pages("news", cat_query, timelimit='w', deadline=deadline), "url")
+    except CircuitOpenError:
+        print(f"  🔌 News backend circuit open, using text search for [{cat_name}]")
+        fallback = True
+    except Exception as e:
+        print(f"  ⚠️ DuckDuckGo news search failed for [{cat_name}]: {e}")
+        fallback = True
+    else:
+        fallback = False
+
+    if fallback:
+        if deadline - time.monotonic() < 1:
+            print(f"  ⏱️ No time left for text fallback in [{cat_name}]")
+        else:
+            try:
+                _consume(iter_search_pages("text", cat_query, deadline=deadline), "href")
+            except Exception as e2:
+                print(f"  ⚠️ Text search also failed for [{cat_name}]: {e2}")
+
+    print(f"  📥 [{cat_name}] Pulled {pulled} raw results, kept {len(candidates)} quality candidates")
+    return candidates
+
+
+def run_category_searches(queries_to_run: list, concurrency: int = None, timeout: float = None,
+                          claimed_domains: set = None) -> dict:
+    """
+    Run all category queries (and their text fallbacks) and return
+    {category_name: quality_candidates} in the same order as queries_to_run.
+    Pass a `claimed_domains` set to deduplicate domains across categories
+    while each one is still filling its quota; earlier categories win.
+
+    With concurrency > 1 the queries fan out over a bounded thread pool, so
+    wall-clock time is roughly the slowest query instead of the sum of all of
+    them. A category that misses its deadline contributes no results. Workers
+    never see `claimed_domains`: claims are settled afterwards in
+    queries_to_run order, so the selection is the same as a serial run's
+    whatever order the queries return in.
+    """
+    concurrency = SEARCH_CONCURRENCY if concurrency is None else concurrency
+    timeout = SEARCH_QUERY_TIMEOUT if timeout is None else timeout
+
+    if concurrency <= 1 or len(queries_to_run) <= 1:
+        return {cat["name"]: fetch_category_results(cat, timeout, claimed_domains=claimed_domains)
+                for cat in queries_to_run}
+
+    workers = min(concurrency, len(queries_to_run))
+    # Queued queries only start once a worker frees up, so allow one deadline per wave
+    waves = -(-len(queries_to_run) // workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+    try:
+        futures = [pool.submit(fetch_category_results, cat, timeout) for cat in queries_to_run]
+        wait(futures, timeout=timeout * waves + 1)
+
+        category_results = {}
+        for cat, future in zip(queries_to_run, futures):
+            if not future.done():
+                print(f"  ⏱️ [{cat['name']}] Query exceeded {timeout:.0f}s deadline, skipping")
+                category_results[cat["name"]] = []
+                continue
+            try:
+                category_results[cat["name"]] = future.result()
+            except Exception as e:
+                print(f"  ⚠️ Search worker failed for [{cat['name']}]: {e}")
+                category_results[cat["name"]] = []
+    finally:
+        # Don't block on stragglers that blew their deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if claimed_domains is not None:
+        settle_domain_claims(queries_to_run, category_results, claimed_domains, timeout)
+    return category_results
+
+
+def settle_domain_claims(queries_to_run: list, category_results: dict, claimed_domains: set,
+                         timeout: float) -> None:
+    """
+    Deduplicate domains across concurrently fetched categories in
+    queries_to_run order. A category keeps its results unless an earlier
+    category claimed one of its domains and it drops below its quota; then it
+    is fetched again against the earlier claims (its pages mostly come from
+    the search cache) and pages deeper, exactly as it would in a serial run.
+    """
+    for cat in queries_to_run:
+        results = category_results[cat["name"]]
+        kept = [item for item in results if item.get("_source_domain") not in claimed_domains]
+        if len(kept) < len(results) and len(kept) < SEARCH_CATEGORY_QUOTA:
+            print(f"  🔁 [{cat['name']}] {len(results) - len(kept)} domain(s) taken by earlier categories, "
+                  f"paging deeper")
+            kept = fetch_category_results(cat, timeout, claimed_domains=claimed_domains)
+        else:
+            claimed_domains.update(item.get("_source_domain") for item in kept)
+        category_results[cat["name"]] = kept
+
+
 def search_news_node(state: AgentState) -> AgentState:
     """
     Node 1: Search for AI/ML news using DuckDuckGo.
@@ -630,9 +1413,6 @@ def search_news_node(state: AgentState) -> AgentState:
     custom_query = state.get("query")
 
     try:
-        # Collect raw results per category
-        category_results = {}  # category_name -> list of results
-
         if custom_query:
             # Single custom query mode
             queries_to_run = [{"name": "Custom", "query": custom_query}]
@@ -640,78 +1420,31 @@ def search_news_node(state: AgentState) -> AgentState:
             # Multi-query category-based search for diversity
             queries_to_run = SEARCH_CATEGORIES
 
-        for cat in queries_to_run:
-            cat_name = cat["name"]
-            cat_query = cat["query"]
-            print(f"👉 Querying DuckDuckGo [{cat_name}]: '{cat_query}'")
-
-            cat_results = []
-            try:
-                with DDGS() as ddgs:
-                    ddg_gen = ddgs.news(cat_query, max_results=15, timelimit='w')
-                    for item in ddg_gen:
-                        cat_results.append({
-                            "title": item.get("title", ""),
-                            "snippet": item.get("body", ""),
-                            "link": item.get("url", ""),
-                            "_search_category": cat_name,
-                        })
-            except Exception as e:
-                print(f"  ⚠️ DuckDuckGo news search failed for [{cat_name}]: {e}")
-                try:
-                    with DDGS() as ddgs:
-                        ddg_gen = ddgs.text(cat_query, max_results=15)
-                        for item in ddg_gen:
-                            cat_results.append({
-                                "title": item.get("title", ""),
-                                "snippet": item.get("body", ""),
-                                "link": item.get("href", ""),
-                                "_search_category": cat_name,
-                            })
-                except Exception as e2:
-                    print(f"  ⚠️ Text search also failed for [{cat_name}]: {e2}")
-
-            print(f"  📥 [{cat_name}] Retrieved {len(cat_results)} raw results")
-            category_results[cat_name] = cat_results
-
-        # Filter all results for AI relevance AND source quality early
-        filtered_by_category = {}  # category_name -> list of quality-filtered results
+        # Candidates arrive relevance/quality filtered, each from a domain no
+        # other category claimed, so every category fills its quota with new domains
         seen_domains_global = set()
+        filtered_by_category = run_category_searches(queries_to_run, claimed_domains=seen_domains_global)
+        for cat_name, filtered in filtered_by_category.items():
+            print(f"  ✅ [{cat_name}] {len(filtered)} quality-filtered results")
 
-        for cat_name, results in category_results.items():
-            filtered = []
-            for item in results:
-                link = item.get("link", "")
-                title = item.get("title", "")
-                snippet = item.get("snippet", "")
+        # Collapse near-duplicate stories across categories, keeping the best-tier copy
+        dedup_index = NearDuplicateIndex()
+        all_candidates = [item for candidates in filtered_by_category.values() for item in candidates]
+        unique_ids = {id(item) for item in collapse_near_duplicates(all_candidates, dedup_index)}
+        if len(unique_ids) < len(all_candidates):
+            print(f"  🧬 Collapsed {len(all_candidates) - len(unique_ids)} near-duplicate stories")
+            for cat_name, candidates in filtered_by_category.items():
+                filtered_by_category[cat_name] = [item for item in candidates if id(item) in unique_ids]
 
-                # Check AI relevance
-                if not is_ai_relevant(title, snippet, link):
-                    continue
+        # Tag every candidate with its story category so backfill can balance topics
+        all_candidates = [item for candidates in filtered_by_category.values() for item in candidates]
+        tag_categories(all_candidates)
 
-                # Early source quality filter: skip unknown/untrusted sources (priority >= 500)
-                priority, tier, source_name = get_source_quality_score(link)
-                if priority >= 500:
-                    print(f"  ⛔ Skipping unknown source: {extract_domain(link)} - {title[:40]}...")
-                    continue
-
-                # Deduplicate by domain across all categories
-                domain = extract_domain(link)
-                if domain in seen_domains_global:
-                    continue
-                seen_domains_global.add(domain)
-
-                # Attach quality metadata
-                item["_source_priority"] = priority
-                item["_source_tier"] = tier
-                item["_source_name"] = source_name
-                item["_source_domain"] = domain
-                filtered.append(item)
-
-            # Sort within category by source quality (best first)
-            filtered.sort(key=lambda x: x.get("_source_priority", 999))
-            filtered_by_category[cat_name] = filtered
-            print(f"  ✅ [{cat_name}] {len(filtered)} quality-filtered results")
+        # Score all candidates in one batch; each category's list keeps the ranked order (best first)
+        for cat_name in filtered_by_category:
+            filtered_by_category[cat_name] = []
+        for item in rank_candidates(all_candidates):
+            filtered_by_category[item["_search_category"]].append(item)
 
         # Pick best result from each category first (ensures diversity)
         selected = []
@@ -730,59 +1463,47 @@ def search_news_node(state: AgentState) -> AgentState:
                 for item in candidates:
                     if item.get("_source_domain") not in selected_domains:
                         all_remaining.append(item)
-            # Sort remaining by quality
-            all_remaining.sort(key=lambda x: x.get("_source_priority", 999))
-            for item in all_remaining:
-                if len(selected) >= 5:
-                    break
+            # Prefer story categories not yet covered, then the ranking score
+            covered = {item.get("_category") for item in selected}
+            while all_remaining and len(selected) < 5:
+                item = min(all_remaining, key=lambda x: (x.get("_category") in covered, -x.get("_rank_score", 0.0)))
+                all_remaining.remove(item)
                 selected.append(item)
                 selected_domains.add(item.get("_source_domain"))
-                print(f"  ➕ Backfill: [{item.get('_source_tier', '?')}] {item.get('_source_name', '?')} - {item.get('title', '')[:50]}...")
+                covered.add(item.get("_category"))
+                print(f"  ➕ Backfill: [{item.get('_source_tier', '?')}] [{item.get('_category')}] {item.get('_source_name', '?')} - {item.get('title', '')[:50]}...")
 
         # Fallback: if category-based search yielded fewer than 5, try broad query
         if len(selected) < 5 and not custom_query:
             print("🔄 Category search yielded < 5 results, falling back to broad query...")
             fallback_query = 'artificial intelligence OR LLM OR GPT OR AI news this week'
-            try:
-                with DDGS() as ddgs:
-                    ddg_gen = ddgs.news(fallback_query, max_results=30, timelimit='w')
-                    for item in ddg_gen:
-                        link = item.get("url", "")
-                        title = item.get("title", "")
-                        snippet = item.get("body", "")
-
-                        if not is_ai_relevant(title, snippet, link):
-                            continue
-
-                        priority, tier, source_name = get_source_quality_score(link)
-                        if priority >= 500:
-                            continue
 
-                        domain = extract_domain(link)
-                        if domain in seen_domains_global:
+            def _fill_from(pages, link_key):
+                for page in pages:
+                    page_items = normalize_search_results(page, link_key, "Fallback")
+                    fresh = qualify_results(page_items, seen_domains_global)
+                    tag_categories(fresh)
+                    for item in fresh:
+                        if dedup_index.add(item) is not None:
                             continue
-                        seen_domains_global.add(domain)
-
-                        selected.append({
-                            "title": title,
-                            "snippet": snippet,
-                            "link": link,
-                            "_search_category": "Fallback",
-                            "_source_priority": priority,
-                            "_source_tier": tier,
-                            "_source_name": source_name,
-                            "_source_domain": domain,
-                        })
-                        print(f"  ➕ Fallback: [{tier}] {source_name} - {title[:50]}...")
-
+                        selected.append(item)
+                        print(f"  ➕ Fallback: [{item['_source_tier']}] {item['_source_name']} - {item['title'][:50]}...")
                         if len(selected) >= 5:
-                            break
+                            return
+
+            try:
+                try:
+                    _fill_from(iter_search_pages("news", fallback_query, timelimit='w',
+                                                 max_pages=SEARCH_FALLBACK_MAX_PAGES), "url")
+                except CircuitOpenError:
+                    print("  🔌 News backend circuit open, using text search for the fallback query")
+                    _fill_from(iter_search_pages("text", fallback_query,
+                                                 max_pages=SEARCH_FALLBACK_MAX_PAGES), "href")
             except Exception as fb_err:
                 print(f"  ⚠️ Fallback search failed: {fb_err}")
 
-        # Final sort by quality and trim to 5
-        selected.sort(key=lambda x: x.get("_source_priority", 999))
-        state["news_items"] = selected[:5]
+        # Final order by the combined ranking (fallback stories are scored here) and trim to 5
+        state["news_items"] = rank_candidates(selected)[:5]
 
         # Show final selected items
         if state["news_items"]:
@@ -809,6 +1530,394 @@ def search_news_node(state: AgentState) -> AgentState:
     return state
 
 
+def groq_retryable_errors() -> tuple:
+    """Groq client errors worth retrying: throttling, timeouts and 5xx."""
+    from groq import RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def make_llm() -> ModelLadder:
+    """The summarize model: LLM_MODEL followed by the LLM_FALLBACK_MODELS ladder."""
+    models = [LLM_MODEL] + [m for m in LLM_FALLBACK_MODELS if m != LLM_MODEL]
+
+    def _client(model):
+        # Retries are handled by the shared rate limiter, not the client
+        return _lazy("ChatGroq")(
+            api_key=GROQ_API_KEY,
+            model_name=model,
+            temperature=LLM_TEMPERATURE,
+            max_retries=0,
+            timeout=LLM_ATTEMPT_TIMEOUT,
+            base_url=LLM_BASE_URL,
+        )
+
+    def _attempt(call, client):
+        # Every attempt, hedged or fallback, takes a Groq token and retries throttling itself
+        return outbound.call("api.groq.com", call, client, retry_on=groq_retryable_errors(), breaker="groq")
+
+    return ModelLadder(models, _client, attempt_timeout=LLM_ATTEMPT_TIMEOUT, hedge_after=LLM_HEDGE_AFTER,
+                       latencies=llm_latency_cache.get("latencies") or {}, call_attempt=_attempt)
+
+
+def call_llm(llm, fn, *args):
+    """
+    Run fn(*args) for `llm` under the api.groq.com rate limit and retry
+    policy. A ModelLadder already applies both to each of its attempts, so
+    its calls are not wrapped a second time.
+    """
+    if isinstance(llm, ModelLadder):
+        return fn(*args)
+    return outbound.call("api.groq.com", fn, *args, retry_on=groq_retryable_errors(), breaker="groq")
+
+
+def stream_completion(llm, messages: list) -> tuple:
+    """
+    Consume llm.stream(messages) through an IncrementalJSONValidator, stopping
+    generation as soon as the output cannot be a valid post.
+    Returns (text, seconds to first token, total seconds).
+    """
+    validator = IncrementalJSONValidator()
+    parts = []
+    first_token = None
+    started = time.perf_counter()
+    for chunk in llm.stream(messages):
+        text = chunk.content
+        if not text:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+        parts.append(text)
+        validator.feed(text)
+    validator.close()
+    return "".join(parts), first_token, time.perf_counter() - started
+
+
+# Shared by the single-call prompt and the per-story prompts of map-reduce mode
+STORY_TEMPLATE = """## [Specific Story Headline]
+
+[Paragraph 1: What happened. Lead with the most newsworthy detail. WHO, WHAT, WHEN. 2-3 sentences max.]
+
+[Paragraph 2: Technical context or competitive landscape. How does this compare? What is technically different? 2-3 sentences max.]
+
+**Key Takeaways:**
+
+- [Specific fact or number, not an opinion]
+- [Specific fact or number, not an opinion]
+- [Specific fact or number, not an opinion]
+
+**Why It Matters:** [ONE paragraph max. State a concrete implication or prediction. Name a specific company, product, or metric that will be affected. No vague "this could change everything" language.]"""
+
+BANNED_PHRASES = """   "As AI continues to evolve", "significant implications", "remains to be seen",
+   "potential to revolutionize", "raising important questions", "significant developments",
+   "notable achievements", "rapidly evolving landscape", "underscores the importance",
+   "it is essential to consider", "the potential implications\""""
+
+
+def parse_llm_json(content: str) -> dict:
+    """
+    Parse an LLM response as JSON with the repair parser, which keeps raw
+    newlines inside strings (escaping them) and copes with code fences,
+    invalid escapes and trailing commas. Output cut off mid-object is still
+    recovered, but logged and marked with "_truncated" so it is not cached
+    and the reviewer is warned.
+    """
+    data, truncated = recover_json(content)
+    if truncated:
+        print("⚠️  LLM output was truncated; recovered a partial JSON object")
+        if isinstance(data, dict):
+            data["_truncated"] = True
+    return data
+
+
+def answered_by_primary(llm) -> bool:
+    """
+    Whether this thread's last ladder call was answered by LLM_MODEL. Cache
+    entries are keyed on LLM_MODEL, so fallback answers are never stored
+    under its name.
+    """
+    return not isinstance(llm, ModelLadder) or llm.last_model == LLM_MODEL
+
+
+def note_cache_hit(llm) -> None:
+    """Record a cached LLM_MODEL answer as served, so the post's _served_by covers cache hits."""
+    if isinstance(llm, ModelLadder):
+        llm.record_cached(LLM_MODEL)
+
+
+def invoke_llm(llm, prompt: str, parse=None):
+    """
+    One cached, rate-limited LLM call. Returns the response text, or
+    parse(text) when a parser is given; a response is only cached once it
+    parses and only if the primary model wrote it, so a bad generation or a
+    fallback answer is regenerated on the next run.
+    """
+    cache_key = (LLM_MODEL, LLM_TEMPERATURE, prompt)
+    text = llm_cache.get(*cache_key)
+    from_cache = text is not None
+    if from_cache:
+        note_cache_hit(llm)
+    else:
+        response = call_llm(llm, llm.invoke, [_lazy("HumanMessage")(content=prompt)])
+        text = response.content.strip()
+
+    result = parse(text) if parse else text
+    # A truncated answer still parses; regenerate it next run rather than cache it
+    if (not from_cache and text and answered_by_primary(llm)
+            and not (isinstance(result, dict) and result.get("_truncated"))):
+        llm_cache.set(text, *cache_key)
+    return result
+
+
+def _structured_call(llm, schema: dict, prompt: str) -> dict:
+    """One structured-output call; falls back to repairing the raw message if the parse failed."""
+    runnable = llm.with_structured_output(schema, method=STRUCTURED_OUTPUT_METHOD, include_raw=True)
+    result = call_llm(llm, runnable.invoke, [_lazy("HumanMessage")(content=prompt)])
+    if isinstance(result.get("parsed"), dict):
+        return result["parsed"]
+
+    raw = result.get("raw")
+    tool_calls = getattr(raw, "tool_calls", None) or []
+    if tool_calls and isinstance(tool_calls[0].get("args"), dict):
+        return tool_calls[0]["args"]
+    invalid = getattr(raw, "invalid_tool_calls", None) or []
+    text = invalid[0].get("args") if invalid else getattr(raw, "content", "")
+    try:
+        return repair_json(text or "")
+    except json.JSONDecodeError:
+        return {}
+
+
+def structured_summarize(llm, prompt: str) -> dict:
+    """
+    Generate the post through structured output against POST_SCHEMA, then
+    re-request only the fields that are missing or invalid instead of
+    regenerating the whole post.
+    """
+    cache_key = (LLM_MODEL, LLM_TEMPERATURE, "structured", prompt)
+    cached = llm_cache.get(*cache_key)
+    if isinstance(cached, dict):
+        print("💾 Using cached LLM response")
+        note_cache_hit(llm)
+        return cached
+
+    data = _structured_call(llm, POST_SCHEMA, prompt)
+    primary_only = answered_by_primary(llm)
+    bad = invalid_fields(data)
+    rounds = 0
+    while bad and rounds < STRUCTURED_REPAIR_ROUNDS:
+        rounds += 1
+        print(f"🧩 Re-requesting invalid fields: {bad}")
+        draft = {k: v for k, v in data.items() if k in POST_SCHEMA["properties"] and k not in bad}
+        if "content" in draft:
+            draft["content"] = truncate_to_tokens(draft["content"], 800)
+        repair_prompt = (f"{prompt}\n\nYou already wrote this draft (content may be shortened):\n"
+                         f"{json.dumps(draft, indent=2)}\n\n"
+                         f"These fields are missing or invalid: {', '.join(bad)}. "
+                         f"Return ONLY these fields, consistent with the draft.")
+        fixes = _structured_call(llm, field_schema(bad), repair_prompt)
+        primary_only = primary_only and answered_by_primary(llm)
+        data.update({k: v for k, v in fixes.items() if k in bad})
+        bad = invalid_fields(data)
+
+    print(f"🧩 Structured output: {rounds} repair round(s){f', still invalid: {bad}' if bad else ''}")
+    if not bad and primary_only:
+        llm_cache.set(data, *cache_key)
+    return data
+
+
+def build_section_prompt(item: dict, category: str) -> str:
+    """Prompt for one story's section of the digest (map step)."""
+    return f"""You are a senior AI engineer briefing your team on this week's most important developments. Write with technical depth but keep it accessible. Be opinionated but fair. Lead with the most surprising or impactful detail, not background context.
+
+Write ONE story section of a weekly AI digest about this news item ({category}):
+
+[{item.get('_source_tier', 'Unknown')} - {item.get('_source_name', 'Unknown')}] {item.get('title', '')}: {item.get('snippet', '')} ({item.get('link', '')})
+
+RULES:
+1. Every sentence must add NEW information. Replace generic statements with a specific fact, number, or concrete prediction.
+2. BANNED PHRASES — do NOT use these or close variants:
+{BANNED_PHRASES}
+3. 150-200 words MAX, excluding Key Takeaways and Why It Matters.
+4. Use DOUBLE NEWLINES between paragraphs and elements. No ### sub-headings, no horizontal rules.
+
+Use this EXACT format:
+
+{STORY_TEMPLATE}
+
+Respond ONLY with the markdown section."""
+
+
+def build_assembly_prompt(sections: list, context_str: str) -> str:
+    """Prompt that frames the finished story sections (reduce step)."""
+    headlines = "\n".join(
+        f"- {section.splitlines()[0].lstrip('# ').strip()}: {' '.join(section.split()[:40])}"
+        for section in sections
+    )
+    return f"""You are a senior AI engineer finishing a weekly AI digest for the {context_str}. The story sections are already written; here are their headlines and openings:
+
+{headlines}
+
+Write the framing for the post. Be specific: name the week's theme and the top stories, no filler.
+BANNED PHRASES — do NOT use these or close variants:
+{BANNED_PHRASES}
+
+Return a JSON object with these exact keys:
+- "title": Specific headline naming the key topics (not generic like "AI News This Week")
+- "summary": 2-3 sentences mentioning all covered stories with specifics
+- "overview": 2-3 sentences for the "Weekly Overview" section
+- "looking_ahead": 2-3 sentences with a specific prediction or upcoming event
+- "tags": Array of 3-5 AI-related tags
+
+Respond ONLY with the JSON object, no markdown code blocks."""
+
+
+def map_reduce_summarize(llm, items: list, categories: list, context_str: str) -> dict:
+    """
+    Write each story's section in parallel, then make one short call for the
+    title, summary, tags, Weekly Overview and Looking Ahead. Returns a post
+    with the same keys as the single-call mode. Stories whose section fails
+    are left out.
+    """
+    started = time.perf_counter()
+    prompts = [build_section_prompt(item, category) for item, category in zip(items, categories)]
+    sections = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(SUMMARY_MAP_CONCURRENCY, len(items)))) as pool:
+        futures = {pool.submit(invoke_llm, llm, prompt): i for i, prompt in enumerate(prompts)}
+        for future, i in futures.items():
+            try:
+                sections[i] = future.result() or None
+            except Exception as e:
+                print(f"  ⚠️ Section for '{items[i].get('title', '')[:40]}' failed: {e}")
+    print(f"⏱️  Wrote {sum(1 for s in sections if s)} sections in {time.perf_counter() - started:.2f}s")
+
+    written = [(item, section) for item, section in zip(items, sections) if section]
+    if not written:
+        raise RuntimeError("No story sections could be generated")
+
+    frame = invoke_llm(llm, build_assembly_prompt([s for _, s in written], context_str), parse=parse_llm_json)
+    print(f"⏱️  Map-reduce generation took {time.perf_counter() - started:.2f}s")
+
+    content = "\n\n".join(
+        [f"## Weekly Overview\n\n{frame.get('overview', '')}"]
+        + [section for _, section in written]
+        + [f"## Looking Ahead\n\n{frame.get('looking_ahead', '')}"]
+    )
+    return {
+        "title": frame.get("title"),
+        "summary": frame.get("summary"),
+        "content": content,
+        "tags": frame.get("tags") or ["AI", "News"],
+        "sources": [{"title": item.get("title", ""), "url": item.get("link", "")} for item, _ in written],
+        **({"_truncated": True} if frame.get("_truncated") else {}),
+    }
+
+
+post_linter = PostLinter(re.findall(r'"([^"]+)"', BANNED_PHRASES),
+                         max_words=POST_MAX_WORDS, min_sources=POST_MIN_SOURCES)
+
+
+def build_section_fix_prompt(section: str, problems: list) -> str:
+    """Prompt that rewrites one section of a finished post to fix lint problems."""
+    issues = "\n".join(f"- {describe(p)}" for p in problems)
+    return f"""You are a senior AI engineer editing one section of a weekly AI digest. Rewrite the section below to fix these problems:
+
+{issues}
+
+Keep its facts, its ## heading and its format. Every sentence must add NEW information.
+BANNED PHRASES — do NOT use these or close variants:
+{BANNED_PHRASES}
+
+SECTION:
+
+{section}
+
+Respond ONLY with the rewritten markdown section."""
+
+
+def build_missing_section_prompt(name: str, sections: list) -> str:
+    """Prompt that writes a required section the post left out (e.g. the Weekly Overview)."""
+    headlines = "\n".join(f"- {heading}" for heading, _ in sections if heading)
+    return f"""You are a senior AI engineer finishing a weekly AI digest. The post covers these sections:
+
+{headlines}
+
+Write its "## {name}" section: 2-3 sentences ONLY. Name the week's theme and the top stories. No filler.
+BANNED PHRASES — do NOT use these or close variants:
+{BANNED_PHRASES}
+
+Respond ONLY with the markdown section, starting with "## {name}"."""
+
+
+def lint_and_regenerate(llm, data: dict) -> dict:
+    """
+    Lint the formatted post and re-request only the sections that break the
+    rules, for up to POST_REGEN_ROUNDS rounds. Problems a rewrite cannot fix
+    (too few sources) are only reported. Records {"rounds", "seconds",
+    "problems"} under data["_lint"].
+    """
+    report = post_linter.lint(data)
+    lint_seconds = report["seconds"]
+    rounds = 0
+    while rounds < POST_REGEN_ROUNDS:
+        fixable = [p for p in report["problems"] if p["section"] is not None or p["index"] is not None]
+        if not fixable:
+            break
+        rounds += 1
+        by_index = {}
+        missing = []
+        for problem in fixable:
+            if problem["index"] is None:
+                missing.append(problem["section"])
+            else:
+                by_index.setdefault(problem["index"], []).append(problem)
+        print(f"🔁 Regeneration round {rounds}: rewriting {len(by_index)} section(s)"
+              f"{f', adding {missing}' if missing else ''}")
+
+        sections = list(report["sections"])
+        prompts = {i: build_section_fix_prompt(sections[i][1], problems) for i, problems in by_index.items()}
+        prompts.update({name: build_missing_section_prompt(name, sections) for name in missing})
+        started = time.perf_counter()
+        rewrites = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(SUMMARY_MAP_CONCURRENCY, len(prompts)))) as pool:
+            futures = {pool.submit(invoke_llm, llm, prompt): key for key, prompt in prompts.items()}
+            for future, key in futures.items():
+                try:
+                    rewrites[key] = future.result().strip()
+                except Exception as e:
+                    print(f"  ⚠️ Rewrite of section {key} failed: {e}")
+        print(f"⏱️  Regenerated {len(rewrites)} section(s) in {time.perf_counter() - started:.2f}s")
+        if not rewrites:
+            break
+
+        for key, text in rewrites.items():
+            if isinstance(key, int):
+                heading = sections[key][0]
+                if heading is not None and not text.startswith("## "):
+                    text = f"## {heading}\n\n{text}"
+                sections[key] = (heading, text)
+        # Missing sections (the Weekly Overview) open the post, after any untitled intro
+        lead = 1 if sections and sections[0][0] is None else 0
+        sections[lead:lead] = [(name, text if text.startswith("## ") else f"## {name}\n\n{text}")
+                               for name, text in rewrites.items() if not isinstance(name, int)]
+        data["content"] = format_newsletter_content(join_sections(sections))
+
+        report = post_linter.lint(data)
+        lint_seconds += report["seconds"]
+
+    remaining = [describe(p) for p in report["problems"]]
+    print(f"🔎 Quality gate: {len(remaining)} problem(s) left after {rounds} regeneration round(s), "
+          f"linting took {lint_seconds * 1000:.1f}ms")
+    for line in remaining:
+        print(f"   - {line}")
+    data["_lint"] = {"rounds": rounds, "seconds": round(lint_seconds, 4), "problems": remaining}
+    return data
+
+
+def _post_text(data: dict) -> str:
+    """The generated fields of a post, as the model wrote them, for local token counts."""
+    return json.dumps({key: data.get(key) for key in POST_SCHEMA["properties"] if key in data})
+
+
 def summarize_node(state: AgentState) -> AgentState:
     """
     Node 2: Use Groq (Llama 3) to summarize news into a detailed blog post.
@@ -841,31 +1950,12 @@ def summarize_node(state: AgentState) -> AgentState:
         }
         return state
 
-    # Initialize Groq LLM
-    llm = ChatGroq(
-        api_key=GROQ_API_KEY,
-        model_name="llama-3.3-70b-versatile",
-        temperature=0.7
-    )
+    # Initialize Groq LLM (with its fallback ladder)
+    llm = make_llm()
     
-    # Assign category tags to news items based on title/snippet keywords
-    def _categorize(item):
-        text = (item.get("title", "") + " " + item.get("snippet", "")).lower()
-        if any(w in text for w in ["launch", "release", "model", "gpt", "claude", "gemini", "llama", "open-source", "parameter", "weights"]):
-            return "Model Releases"
-        if any(w in text for w in ["paper", "research", "study", "benchmark", "arxiv", "breakthrough", "dataset"]):
-            return "Research"
-        if any(w in text for w in ["regulation", "policy", "law", "ban", "govern", "eu", "congress", "safety", "executive order"]):
-            return "Policy"
-        if any(w in text for w in ["sdk", "api", "framework", "tool", "developer", "library", "plugin", "open source", "platform"]):
-            return "Developer Tools"
-        return "Business"
-
-    # Format news items for the prompt - include source quality and category info
-    news_text = "\\n".join([
-        f"- [{item.get('_source_tier', 'Unknown')} - {item.get('_source_name', 'Unknown')}] [Category: {_categorize(item)}] {item['title']}: {item.get('snippet', '')} ({item.get('link', '')})"
-        for item in state["news_items"]
-    ])
+    # Category tags normally come from search_news_node; classify anything untagged
+    items = state["news_items"]
+    tag_categories([item for item in items if not item.get("_category")])
 
     context_str = "past week"
     if state.get("query"):
@@ -880,7 +1970,8 @@ SOURCE QUALITY (must be from PREVIOUS WEEK):
 - AVOID: Aggregators (Yahoo, MSN), opinion sites, regional news, articles older than 2 weeks
 """
 
-    prompt = f"""You are a senior AI engineer briefing your team on this week's most important developments. Write with technical depth but keep it accessible. Be opinionated but fair. Lead every story with the most surprising or impactful detail, not background context.
+    def _build_prompt(news_text):
+        return f"""You are a senior AI engineer briefing your team on this week's most important developments. Write with technical depth but keep it accessible. Be opinionated but fair. Lead every story with the most surprising or impactful detail, not background context.
 
 Here are the top news stories from the {context_str}, with source quality tiers and category tags:
 
@@ -895,10 +1986,7 @@ WRITING RULES — CRITICAL, FOLLOW ALL:
 2. NEVER repeat the same idea across different sections of the post.
 3. Each "Why It Matters" MUST be unique and specific to THAT story — no generic AI platitudes.
 4. BANNED PHRASES — do NOT use these or close variants:
-   "As AI continues to evolve", "significant implications", "remains to be seen",
-   "potential to revolutionize", "raising important questions", "significant developments",
-   "notable achievements", "rapidly evolving landscape", "underscores the importance",
-   "it is essential to consider", "the potential implications"
+{BANNED_PHRASES}
 5. When you catch yourself writing a generic statement, replace it with a specific fact, number, or concrete prediction.
 6. ONLY AI/ML topics. No economics or politics unless directly about AI.
 
@@ -906,19 +1994,7 @@ WORD BUDGET: Each story section = 150-200 words MAX (excluding Key Takeaways and
 
 STORY STRUCTURE — each of the 4-5 stories MUST use this EXACT format:
 
-## [Specific Story Headline]
-
-[Paragraph 1: What happened. Lead with the most newsworthy detail. WHO, WHAT, WHEN. 2-3 sentences max.]
-
-[Paragraph 2: Technical context or competitive landscape. How does this compare? What is technically different? 2-3 sentences max.]
-
-**Key Takeaways:**
-
-- [Specific fact or number, not an opinion]
-- [Specific fact or number, not an opinion]
-- [Specific fact or number, not an opinion]
-
-**Why It Matters:** [ONE paragraph max. State a concrete implication or prediction. Name a specific company, product, or metric that will be affected. No vague "this could change everything" language.]
+{STORY_TEMPLATE}
 
 FORMATTING RULES:
 1. Use DOUBLE NEWLINES (\\n\\n) between ALL sections, paragraphs, and elements.
@@ -942,32 +2018,102 @@ OUTPUT FORMAT — return a JSON object with these exact keys:
 
 Respond ONLY with the JSON object, no markdown code blocks."""
 
+    # Format news items for the prompt - include source quality and category info.
+    # Snippets share whatever the instructions and item headers leave of the token budget.
+    def _item_line(item, snippet):
+        return f"- [{item.get('_source_tier', 'Unknown')} - {item.get('_source_name', 'Unknown')}] [Category: {item['_category']}] {item['title']}: {snippet} ({item.get('link', '')})"
+
+    snippets = strip_repeated_boilerplate([item.get('snippet', '') for item in items])
+    fixed_tokens = count_tokens(_build_prompt("")) + sum(count_tokens(_item_line(item, "")) + 1 for item in items)
+    fitted = fit_snippets(snippets, PROMPT_TOKEN_BUDGET - fixed_tokens)
+    news_text = "\\n".join(_item_line(item, snippet) for item, snippet in zip(items, fitted))
+    prompt = _build_prompt(news_text)
+
+    prompt_tokens = count_tokens(prompt)
+    trimmed = sum(1 for before, after in zip(snippets, fitted) if before != after)
+    # Without tiktoken every local count is a chars/4 guess; say so wherever one is printed
+    approx = "~" if counts_are_estimates() else ""
+    print(f"🧮 Prompt: {approx}{prompt_tokens} tokens for {len(items)} stories "
+          f"(budget {PROMPT_TOKEN_BUDGET}, {trimmed} snippets trimmed)"
+          f"{' [estimated: tiktoken unavailable]' if approx else ''}")
+    if prompt_tokens > PROMPT_TOKEN_BUDGET:
+        # Snippets never shrink below MIN_SNIPPET_TOKENS, so long instructions can push the prompt over
+        print(f"⚠️  Prompt is over budget: instructions and story headers alone take {approx}{fixed_tokens} "
+              f"of {PROMPT_TOKEN_BUDGET} tokens; raise PROMPT_TOKEN_BUDGET or pass fewer stories")
+
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        content = response.content.strip()
-        
-        # Log raw content for debugging
-        print(f"📝 Raw LLM Response:\n{content}\n" + "-"*30)
-        
-        # Parse JSON from response
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:]
-        
-        content = content.strip()
-        import re
-        content = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', content)
-        # Fix common JSON errors from LLMs
-        content = content.replace("\\'", "'")  # Replace \' with ' (invalid in JSON)
-        
-        try:
-            data = json.loads(content)
-        except json.JSONDecodeError as je:
-            print(f"❌ JSON Decode Error: {je}")
-            state["error"] = f"Failed to parse JSON: {je}. Raw content: {content[:100]}..."
-            state["generated_post"] = None
-            return state
+        if SUMMARY_MODE == "map-reduce":
+            print(f"🗺️  Map-reduce mode: {len(items)} sections, up to {SUMMARY_MAP_CONCURRENCY} in parallel")
+            data = map_reduce_summarize(llm, items, [item["_category"] for item in items], context_str)
+            raw_content = None
+            print(f"🧮 Tokens: {approx}{count_tokens(_post_text(data))} completion "
+                  f"(counted locally over all sections and the framing)")
+        elif LLM_STRUCTURED_OUTPUT:
+            data = structured_summarize(llm, prompt)
+            raw_content = None
+            print(f"🧮 Tokens: {approx}{count_tokens(_post_text(data))} completion "
+                  f"(counted locally from the structured post)")
+        else:
+            # Reruns with the same stories (e.g. after a failed issue creation) reuse the last good response
+            cache_key = (LLM_MODEL, LLM_TEMPERATURE, prompt)
+            content = llm_cache.get(*cache_key)
+            from_cache = content is not None
+            # Streams always come from the top model; ladder calls may have fallen back
+            cacheable = True
+            response = None
+            if from_cache:
+                print("💾 Using cached LLM response")
+                note_cache_hit(llm)
+            elif LLM_STREAMING:
+                try:
+                    content, first_token, total = outbound.call(
+                        "api.groq.com",
+                        stream_completion,
+                        llm,
+                        [_lazy("HumanMessage")(content=prompt)],
+                        retry_on=groq_retryable_errors(),
+                        breaker="groq",
+                        # Bad JSON from a healthy service must not open the breaker for every Groq caller
+                        passthrough=(MalformedStreamError,),
+                    )
+                except MalformedStreamError as se:
+                    print(f"❌ Aborted streamed generation: {se}")
+                    state["error"] = f"Malformed LLM output: {se}"
+                    state["generated_post"] = None
+                    return state
+                except Exception as se:
+                    # Over LLM_ATTEMPT_TIMEOUT or a transport failure: let the ladder fall back
+                    print(f"⚠️  Streamed generation failed ({se}), falling back to the model ladder")
+                else:
+                    content = content.strip()
+                    print(f"⏱️  First token after {first_token or 0:.2f}s, generation took {total:.2f}s")
+            if content is None:
+                started = time.perf_counter()
+                response = call_llm(llm, llm.invoke, [_lazy("HumanMessage")(content=prompt)])
+                content = response.content.strip()
+                cacheable = answered_by_primary(llm)
+                print(f"⏱️  Generation took {time.perf_counter() - started:.2f}s")
+            # Only cached once it parses (below); None means nothing new to cache
+            raw_content = None if from_cache or not cacheable else content
+
+            # Prefer the provider's usage numbers; fall back to local counts
+            usage = None if from_cache else getattr(response, "usage_metadata", None)
+            if not isinstance(usage, dict):
+                usage = {}
+            print(f"🧮 Tokens: {usage.get('input_tokens') or f'{approx}{prompt_tokens}'} prompt, "
+                  f"{usage.get('output_tokens') or f'{approx}{count_tokens(content)}'} completion"
+                  f"{' (cached, none spent)' if from_cache else ''}")
+
+            # Log raw content for debugging
+            print(f"📝 Raw LLM Response:\n{content}\n" + "-"*30)
+
+            try:
+                data = parse_llm_json(content)
+            except json.JSONDecodeError as je:
+                print(f"❌ JSON Decode Error: {je}")
+                state["error"] = f"Failed to parse JSON: {je}. Raw content: {content[:100]}..."
+                state["generated_post"] = None
+                return state
 
         # Validate required fields
         required_fields = ["title", "summary", "content"]
@@ -979,6 +2125,10 @@ Respond ONLY with the JSON object, no markdown code blocks."""
             state["error"] = error_msg
             state["generated_post"] = None
             return state
+
+        # Only cache responses that parsed whole, so a bad generation is retried next run
+        if raw_content and not data.get("_truncated"):
+            llm_cache.set(raw_content, *cache_key)
         
         # Validate and enhance sources with quality metadata
         data = validate_and_enhance_sources(data, state["news_items"])
@@ -989,7 +2139,16 @@ Respond ONLY with the JSON object, no markdown code blocks."""
                 data["content"] = format_newsletter_content(data["content"])
             except Exception as fmt_err:
                 print(f"⚠️  Content formatting warning: {fmt_err}")
+            data = lint_and_regenerate(llm, data)
         
+        # Record which model(s) answered, including answers served from the cache
+        served = list(dict.fromkeys(model for model, _ in llm.served))
+        if served:
+            data["_served_by"] = served
+            llm_latency_cache.set(llm.latencies, "latencies")
+            print(f"🧠 Served by: "
+                  f"{', '.join(f'{m} (cached)' if t is None else f'{m} ({t:.1f}s)' for m, t in llm.served)}")
+
         state["generated_post"] = data
         print(f"✅ Generated detailed digest: {state['generated_post']['title']}")
         
@@ -1031,6 +2190,13 @@ def create_issue_node(state: AgentState) -> AgentState:
     issue_title = f"🤖 AI Digest: {post['title']}"
     # Format sources list
     sources_list = "\n".join([f"- [{s.get('title', 'Link')}]({s.get('url', '#')})" for s in post.get('sources', [])])
+    # Anything the quality gate could not fix is flagged for the reviewer
+    lint_problems = list((post.get("_lint") or {}).get("problems") or [])
+    if post.get("_truncated"):
+        lint_problems.insert(0, "The model's output was cut off; this post was recovered from a partial response")
+    quality_notes = ""
+    if lint_problems:
+        quality_notes = "### ⚠️ Quality Checks\n" + "\n".join(f"- {p}" for p in lint_problems) + "\n\n---\n\n"
     
     issue_body = f"""## 📰 AI News Agent - Weekly Digest
     
@@ -1049,7 +2215,7 @@ def create_issue_node(state: AgentState) -> AgentState:
 
 ---
 
-### 📧 How to Approve
+{quality_notes}### 📧 How to Approve
 
 **Reply to this email with `APPROVE` to publish this digest to your blog.**
 
@@ -1083,7 +2249,7 @@ Or comment `APPROVE` directly on this issue.
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = outbound.request("POST", url, headers=headers, json=data, timeout=10)
         if response.status_code == 201:
             issue_data = response.json()
             state["issue_url"] = issue_data["html_url"]
@@ -1098,25 +2264,37 @@ Or comment `APPROVE` directly on this issue.
     return state
 
 
+def cleanup_node(state: AgentState) -> AgentState:
+    """
+    Node 4: Release per-run resources (the shared search backend) and report
+    outbound call health.
+    """
+    close_search_backend()
+    print(f"📡 Outbound calls:\n{outbound.report()}")
+    return state
+
+
 # ============================================================================
 # Graph Construction
 # ============================================================================
 
-def build_graph() -> StateGraph:
+def build_graph() -> "StateGraph":
     """Build the LangGraph workflow."""
     
-    workflow = StateGraph(AgentState)
+    workflow = _lazy("StateGraph")(AgentState)
     
     # Add nodes
     workflow.add_node("search", search_news_node)
     workflow.add_node("summarize", summarize_node)
     workflow.add_node("create_issue", create_issue_node)
+    workflow.add_node("cleanup", cleanup_node)
     
     # Define edges (linear flow)
     workflow.set_entry_point("search")
     workflow.add_edge("search", "summarize")
     workflow.add_edge("summarize", "create_issue")
-    workflow.add_edge("create_issue", END)
+    workflow.add_edge("create_issue", "cleanup")
+    workflow.add_edge("cleanup", _lazy("END"))
     
     return workflow.compile()
 
@@ -1131,8 +2309,28 @@ def main():
     
     parser = argparse.ArgumentParser(description="AI News Agent")
     parser.add_argument("--query", type=str, help="Custom search query (e.g. specific date range). Overrides default 'last week' search.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass cached search results and query DuckDuckGo fresh.")
+    parser.add_argument("--summary-mode", choices=["single", "map-reduce"], help="Write the digest in one call, or one call per story plus an assembly call (default: SUMMARY_MODE or 'single').")
+    parser.add_argument("--structured", action="store_true", help="Request the post via structured output and re-request only invalid fields.")
+    parser.add_argument("--stream", action="store_true", help="Stream the LLM response and abort as soon as it is malformed.")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Bypass cached LLM responses and call Groq fresh.")
+    parser.add_argument("--search-backend", choices=["ddgs", "local"], help="Search provider (default: SEARCH_BACKEND or 'ddgs'). 'local' serves a generated offline corpus.")
     args = parser.parse_args()
 
+    if args.no_cache:
+        search_cache.enabled = False
+    if args.no_llm_cache:
+        llm_cache.enabled = False
+    global LLM_STREAMING, LLM_STRUCTURED_OUTPUT, SUMMARY_MODE
+    if args.structured:
+        LLM_STRUCTURED_OUTPUT = True
+    if args.stream:
+        LLM_STREAMING = True
+    if args.summary_mode:
+        SUMMARY_MODE = args.summary_mode
+    if args.search_backend:
+        set_search_backend(make_search_backend(args.search_backend))
+
     print("=" * 50)
     print("🚀 Starting AI News Agent (LangGraph + Groq)")
     if args.query:
@@ -1153,6 +2351,11 @@ def main():
     
     # Execute the workflow
     final_state = graph.invoke(initial_state)
+
+    stats = search_cache.stats
+    print(f"💾 Search cache: {stats['hits']} hits, {stats['misses']} misses, {stats['writes']} writes")
+    stats = llm_cache.stats
+    print(f"💾 LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['writes']} writes, {stats['evictions']} evictions")
     
     print("\\n" + "=" * 50)
     if final_state.get("error"):
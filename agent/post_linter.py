@@ -0,0 +1,102 @@
+"""
+Local quality gate for the generated digest.
+
+PostLinter checks a formatted post against the rules the prompt already
+states: no banned phrases, the word budget, enough unique sources and a
+"## Weekly Overview" section. It does this in one pass over the content
+lines. Problems are tied to the section that caused them, so summarize_node
+can re-ask the model for just those sections instead of rerunning the
+whole digest.
+"""
+
+import re
+import time
+
+_WORD = re.compile(r"\w+(?:['’.-]\w+)*")
+
+
+def join_sections(sections: list) -> str:
+    """Reassemble the (heading, text) pairs from a lint report into markdown."""
+    return "\n\n".join(text for _, text in sections if text)
+
+
+class PostLinter:
+    """
+    banned_phrases: phrases to reject (case and whitespace insensitive).
+    max_words: word budget for the whole content. min_sources: unique source
+    URLs required. required_sections: "## " headings that must be present.
+    """
+
+    def __init__(self, banned_phrases: list, max_words: int = 1200, min_sources: int = 4,
+                 required_sections: tuple = ("Weekly Overview",)):
+        self.max_words = max_words
+        self.min_sources = min_sources
+        self.required_sections = tuple(required_sections)
+        phrases = sorted({p.strip() for p in banned_phrases if p.strip()}, key=len, reverse=True)
+        self._banned = re.compile(
+            "|".join(r"\s+".join(map(re.escape, p.split())) for p in phrases), re.IGNORECASE
+        ) if phrases else None
+
+    def lint(self, post: dict) -> dict:
+        """
+        Returns {"problems", "sections", "words", "seconds"}. Each problem is
+        a dict with "rule", "detail", "section" (heading, or None for the
+        whole post) and "index" (into "sections", or None if the section is
+        missing or the problem is post-wide).
+        """
+        started = time.perf_counter()
+        problems = []
+        sections = []
+        section_words = []
+        heading, lines, words, banned = None, [], 0, []
+
+        def close_section():
+            if heading is None and not any(l.strip() for l in lines):
+                return
+            index = len(sections)
+            sections.append((heading, "\n".join(lines).strip()))
+            section_words.append(words)
+            for phrase in dict.fromkeys(banned):
+                problems.append({"rule": "banned-phrase", "section": heading, "index": index,
+                                 "detail": f'uses the banned phrase "{phrase}"'})
+
+        for line in (post.get("content") or "").split("\n"):
+            if line.startswith("## "):
+                close_section()
+                heading, lines, words, banned = line[3:].strip(), [], 0, []
+            lines.append(line)
+            words += len(_WORD.findall(line))
+            if self._banned is not None:
+                banned.extend(m.group(0).lower() for m in self._banned.finditer(line))
+        close_section()
+
+        total_words = sum(section_words)
+        if total_words > self.max_words and sections:
+            # Ask the sections above an even share of the budget to shrink
+            share = self.max_words // len(sections)
+            for index, ((name, _), count) in enumerate(zip(sections, section_words)):
+                if count > share:
+                    problems.append({"rule": "word-budget", "section": name, "index": index,
+                                     "detail": f"has {count} words; the post is {total_words} words "
+                                               f"(limit {self.max_words}), cut this section to at most {share}"})
+
+        present = {name for name, _ in sections}
+        for name in self.required_sections:
+            if name not in present:
+                problems.append({"rule": "missing-section", "section": name, "index": None,
+                                 "detail": f'is missing (the post must have a "## {name}" section)'})
+
+        urls = {s.get("url") for s in post.get("sources") or []
+                if isinstance(s, dict) and s.get("url") and s.get("url") != "#"}
+        if len(urls) < self.min_sources:
+            problems.append({"rule": "sources", "section": None, "index": None,
+                             "detail": f"only {len(urls)} unique source URLs (need {self.min_sources})"})
+
+        return {"problems": problems, "sections": sections, "words": total_words,
+                "seconds": time.perf_counter() - started}
+
+
+def describe(problem: dict) -> str:
+    """One-line human-readable form of a lint problem."""
+    where = f'Section "{problem["section"]}"' if problem["section"] else "Post"
+    return f"{where} {problem['detail']}"
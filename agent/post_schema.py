@@ -0,0 +1,143 @@
+"""
+Schema for the generated digest post, plus tolerant parsing.
+
+POST_SCHEMA is handed to the model's structured-output (tool calling / JSON
+schema) mode. repair_json recovers the common ways LLM JSON goes wrong in a
+single pass, and invalid_fields names the fields that still need to be
+re-requested instead of regenerating the whole post.
+"""
+
+import json
+
+POST_SCHEMA = {
+    "title": "WeeklyDigestPost",
+    "description": "A weekly AI/ML digest blog post.",
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "Specific headline naming the key topics"},
+        "summary": {"type": "string", "description": "2-3 sentences mentioning all covered stories"},
+        "content": {"type": "string", "description": "Full markdown content of the post"},
+        "tags": {"type": "array", "items": {"type": "string"}, "description": "3-5 AI-related tags"},
+        "sources": {
+            "type": "array",
+            "description": "One source per story, at least 4 unique URLs",
+            "items": {
+                "type": "object",
+                "properties": {"title": {"type": "string"}, "url": {"type": "string"}},
+                "required": ["title", "url"],
+            },
+        },
+    },
+    "required": ["title", "summary", "content", "tags", "sources"],
+}
+
+# Raw control characters that are legal in text but must be escaped inside JSON strings
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_VALID_ESCAPES = set('"\\/bfnrtu')
+
+
+def field_schema(fields: list) -> dict:
+    """POST_SCHEMA narrowed to `fields`, for re-requesting just those."""
+    return {
+        **POST_SCHEMA,
+        "properties": {name: POST_SCHEMA["properties"][name] for name in fields},
+        "required": list(fields),
+    }
+
+
+def _close_value(out: list) -> None:
+    """Drop a dangling comma, or give a dangling key a null value, before closing a container."""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+    elif out and out[-1] == ":":
+        out.append("null")
+
+
+def repair_json(text: str) -> dict:
+    """
+    Parse the first JSON object in `text`, repairing in one pass: prose and
+    code fences around the object, raw newlines/tabs inside strings, invalid
+    escapes such as \\', trailing commas, and output truncated mid-object.
+    Raises json.JSONDecodeError if no object can be recovered.
+    """
+    return recover_json(text)[0]
+
+
+def recover_json(text: str) -> tuple:
+    """repair_json that also reports whether the object had to be closed because the output was cut off."""
+    start = text.find("{")
+    if start < 0:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+
+    out = []
+    closers = []
+    in_string = False
+    escape = False
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+                # Keep valid escapes; drop the backslash from invalid ones like \'
+                out.append("\\" + ch if ch in _VALID_ESCAPES else ch)
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[ch])
+            elif ord(ch) < 0x20:
+                out.append(" ")
+            else:
+                out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not closers or closers[-1] != ch:
+                raise json.JSONDecodeError(f"Mismatched '{ch}'", text, start + len(out))
+            _close_value(out)
+            closers.pop()
+            out.append(ch)
+            if not closers:
+                break
+            continue
+        out.append(ch)
+    else:
+        # Truncated output: close whatever is still open
+        if in_string:
+            out.append('"')
+        while closers:
+            _close_value(out)
+            out.append(closers.pop())
+        return json.loads("".join(out)), True
+
+    return json.loads("".join(out)), False
+
+
+def invalid_fields(data: dict) -> list:
+    """Names of POST_SCHEMA fields that are missing or have the wrong shape, in schema order."""
+    if not isinstance(data, dict):
+        return list(POST_SCHEMA["required"])
+
+    invalid = []
+    for name in ("title", "summary", "content"):
+        value = data.get(name)
+        if not isinstance(value, str) or not value.strip():
+            invalid.append(name)
+
+    tags = data.get("tags")
+    if not isinstance(tags, list) or not tags or not all(isinstance(t, str) and t.strip() for t in tags):
+        invalid.append("tags")
+
+    sources = data.get("sources")
+    if (not isinstance(sources, list) or not sources
+            or not all(isinstance(s, dict) and isinstance(s.get("url"), str) and s["url"] for s in sources)):
+        invalid.append("sources")
+
+    return invalid
@@ -0,0 +1,204 @@
+"""
+Sharded storage for published blog posts.
+
+Each post lives in its own file (posts/<id>.json) and a compact index
+(postIndex.json) lists id, date, title, tags and summary for every post,
+newest first, together with the next free id. Publishing writes one new
+post file and the index, whose entries are one line each, so the cost
+and the commit diff do not grow with the archive. A batch of posts is
+added with a single index write, and publishers hold the store's lock
+file while they write. Posts published from a review issue carry its
+number, and the index maps each such issue to its post, so an issue is
+never published twice.
+
+blogPosts.json, the original single-file layout, can be migrated into a
+store and exported back from it for anything that still reads it.
+
+Run with: python agent/post_store.py migrate|export [--data-dir src/data]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from contextlib import contextmanager
+
+from atomic_files import write_text_atomic
+
+INDEX_VERSION = 1
+INDEX_FIELDS = ("id", "date", "title", "tags", "summary")
+# A lock older than this was left behind by a crashed publisher
+LOCK_STALE_SECONDS = 600
+LOCK_POLL_SECONDS = 0.1
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "data")
+
+
+def index_entry(post: dict) -> dict:
+    return {field: post.get(field) for field in INDEX_FIELDS}
+
+
+class PostStore:
+    """
+    data_dir holds postIndex.json and the posts/ directory. The index is
+    read lazily and cached; every write goes through a temp file + rename.
+    """
+
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR):
+        self.data_dir = data_dir
+        self.index_path = os.path.join(data_dir, "postIndex.json")
+        self.posts_dir = os.path.join(data_dir, "posts")
+        self.lock_path = os.path.join(data_dir, ".publish.lock")
+        self._index = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def post_path(self, post_id) -> str:
+        return os.path.join(self.posts_dir, f"{post_id}.json")
+
+    @property
+    def index(self) -> dict:
+        """{"version", "next_id", "issues": {issue number: post id}, "posts": [index entries, newest first]}."""
+        if self._index is None:
+            try:
+                with open(self.index_path) as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {"version": INDEX_VERSION, "next_id": 1, "posts": []}
+        return self._index
+
+    def get_post(self, post_id) -> dict:
+        with open(self.post_path(post_id)) as f:
+            return json.load(f)
+
+    def iter_posts(self):
+        """Full posts in index order (newest first)."""
+        for entry in self.index["posts"]:
+            yield self.get_post(entry["id"])
+
+    def save_post(self, post: dict) -> None:
+        """Write one post's file (e.g. after reformatting its content); the index is not touched."""
+        write_text_atomic(self.post_path(post["id"]), json.dumps(post, indent=2) + "\n")
+
+    def save_index(self) -> None:
+        # One line per post, so adding a post is a one-line diff
+        index = self.index
+        entries = ",\n".join(f"    {json.dumps(entry)}" for entry in index["posts"])
+        posts = f"[\n{entries}\n  ]" if entries else "[]"
+        write_text_atomic(self.index_path,
+                          f'{{\n  "version": {json.dumps(index.get("version", INDEX_VERSION))},\n'
+                          f'  "next_id": {json.dumps(index["next_id"])},\n'
+                          + (f'  "issues": {json.dumps(index["issues"])},\n' if index.get("issues") else "")
+                          + f'  "posts": {posts}\n}}\n')
+
+    def published_issues(self) -> dict:
+        """{issue number (str): post id} for every post published from a review issue."""
+        return self.index.get("issues") or {}
+
+    def add_post(self, post: dict) -> dict:
+        """
+        Give `post` the next id, write its file and prepend it to the index.
+        Touches two files regardless of archive size. Returns the stored post.
+        """
+        return self.add_posts([post])[0]
+
+    def add_posts(self, posts: list) -> list:
+        """
+        add_post for a batch, oldest first: one file per post and a single
+        index write. A post's "issue" number is recorded in the index, in the
+        same write. Returns the stored posts.
+        """
+        index = self.index
+        stored = []
+        for post in posts:
+            post = {"id": index["next_id"], **{k: v for k, v in post.items() if k != "id"}}
+            self.save_post(post)
+            index["posts"].insert(0, index_entry(post))
+            index["next_id"] = post["id"] + 1
+            if post.get("issue") is not None:
+                index.setdefault("issues", {})[str(post["issue"])] = post["id"]
+            stored.append(post)
+        if stored:
+            self.save_index()
+        return stored
+
+    @contextmanager
+    def lock(self, timeout: float = 60):
+        """
+        Hold the store's lock file (created exclusively) for the duration of
+        the block, so concurrent publishers cannot interleave index writes.
+        Breaks a lock older than LOCK_STALE_SECONDS; raises TimeoutError if
+        the lock is still held after `timeout` seconds.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(self.lock_path).st_mtime > LOCK_STALE_SECONDS:
+                        os.remove(self.lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"{self.lock_path} is held by another publisher")
+                time.sleep(LOCK_POLL_SECONDS)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            # Another publisher may have written the index while we waited
+            self._index = None
+            yield self
+        finally:
+            try:
+                os.remove(self.lock_path)
+            except FileNotFoundError:
+                pass
+
+    def export(self, path: str) -> None:
+        """Write every post to `path` in the single-file blogPosts.json layout."""
+        write_text_atomic(path, json.dumps(list(self.iter_posts()), indent=2))
+
+    @classmethod
+    def migrate(cls, posts_path: str, data_dir: str = DEFAULT_DATA_DIR) -> "PostStore":
+        """Build a store in `data_dir` from a blogPosts.json file (kept in its newest-first order)."""
+        with open(posts_path) as f:
+            posts = json.load(f)
+        store = cls(data_dir)
+        for post in posts:
+            store.save_post(post)
+        store._index = {
+            "version": INDEX_VERSION,
+            "next_id": max((p["id"] for p in posts), default=0) + 1,
+            "posts": [index_entry(p) for p in posts],
+        }
+        store.save_index()
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate blogPosts.json into sharded storage, or export it back")
+    parser.add_argument("command", choices=["migrate", "export"])
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--posts-file", default=None, help="Single-file archive (default: <data-dir>/blogPosts.json)")
+    args = parser.parse_args()
+    posts_file = args.posts_file or os.path.join(args.data_dir, "blogPosts.json")
+
+    if args.command == "migrate":
+        if PostStore(args.data_dir).exists():
+            sys.exit(f"❌ {args.data_dir} already has a post index; refusing to overwrite it")
+        store = PostStore.migrate(posts_file, args.data_dir)
+        print(f"✅ Migrated {len(store.index['posts'])} posts into {store.posts_dir} (next id {store.index['next_id']})")
+    else:
+        store = PostStore(args.data_dir)
+        store.export(posts_file)
+        print(f"✅ Exported {len(store.index['posts'])} posts to {posts_file}")
+
+
+if __name__ == "__main__":
+    main()
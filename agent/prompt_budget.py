@@ -0,0 +1,111 @@
+"""
+Token budgeting for the summarize prompt.
+
+Counts tokens locally (tiktoken, loaded on first use; a ~4 characters per
+token estimate only when it is unavailable, which counts_are_estimates()
+reports so callers can say so), strips boilerplate that repeats across
+news snippets, and shares the remaining input budget between snippets so
+the prompt stays under PROMPT_TOKEN_BUDGET no matter how many stories are
+passed in.
+"""
+
+import re
+
+_ENCODING = None
+_ENCODING_LOADED = False
+
+CHARS_PER_TOKEN = 4
+# Snippets are never cut below this, even when the budget is very tight
+MIN_SNIPPET_TOKENS = 24
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_TRAILING_NOISE = re.compile(r"\s*(?:\[\+?\d+ chars\]|\.\.\.|…)\s*$")
+
+
+def _encoding():
+    """The tiktoken encoding, loaded once on first use; None when it is unavailable."""
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        _ENCODING_LOADED = True
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # ImportError, or the encoding could not be loaded offline
+            _ENCODING = None
+    return _ENCODING
+
+
+def counts_are_estimates() -> bool:
+    """True when count_tokens falls back to the chars/token estimate."""
+    return _encoding() is None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text` (estimated when tiktoken is unavailable)."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens`, on a word boundary, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text)[:max(max_tokens - 1, 0)])
+    else:
+        cut = text[:max(max_tokens - 1, 0) * CHARS_PER_TOKEN]
+    # Back off to the last whole word
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:-") + "…"
+
+
+def strip_repeated_boilerplate(snippets: list) -> list:
+    """
+    Drop sentences that appear in more than one snippet (newsletter plugs,
+    "Read more" footers, site taglines) plus trailing truncation markers.
+    """
+    sentences = [[s for s in _SENTENCE_SPLIT.split(_TRAILING_NOISE.sub("", snippet or "")) if s]
+                 for snippet in snippets]
+
+    seen_in = {}
+    for i, parts in enumerate(sentences):
+        for sentence in parts:
+            seen_in.setdefault(sentence.strip().lower(), set()).add(i)
+    repeated = {s for s, owners in seen_in.items() if len(owners) > 1}
+
+    return [" ".join(s for s in parts if s.strip().lower() not in repeated) for parts in sentences]
+
+
+def fit_snippets(snippets: list, budget: int) -> list:
+    """
+    Share `budget` tokens between snippets. Short snippets keep their full
+    text and their unused share is redistributed to the longer ones.
+    """
+    if not snippets:
+        return []
+    costs = [count_tokens(s) for s in snippets]
+    if sum(costs) <= budget:
+        return list(snippets)
+
+    caps = [0] * len(snippets)
+    remaining = max(budget, 0)
+    pending = sorted(range(len(snippets)), key=lambda i: costs[i])
+    while pending:
+        share = remaining // len(pending)
+        i = pending[0]
+        if costs[i] <= share:
+            caps[i] = costs[i]
+            remaining -= costs[i]
+            pending.pop(0)
+            continue
+        for i in pending:
+            caps[i] = max(share, MIN_SNIPPET_TOKENS)
+        break
+
+    return [truncate_to_tokens(s, cap) for s, cap in zip(snippets, caps)]
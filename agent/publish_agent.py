@@ -3,15 +3,23 @@ Publish Agent - Triggered when user approves a news post.
 
 This agent:
 1. Reads the pending post from the GitHub Issue
-2. Updates blogPosts.json with the new post
+2. Stores the new post (one file per post plus a compact index), adds it
+   to the site's paginated manifest (blogPosts.json is only re-exported
+   when BLOG_COMPAT_EXPORT is set)
 3. Closes the Issue with a success message
+
+With --bulk it instead publishes every open ai-news-pending issue that has
+an APPROVE comment in one pass (one index and page write for the whole
+batch); --close-published then closes them once the commit has been
+pushed. Each post records the issue it came from in the post store, so an
+issue that is still open (e.g. because closing it failed) is never
+published twice.
 """
 
 import os
 import json
 import re
 import datetime
-import requests
 
 # Load .env file for local testing
 try:
@@ -22,11 +30,34 @@ try:
 except ImportError:
     pass  # dotenv not installed, use system env vars
 
+from rate_limit import outbound
+from published_index import PublishedIndex
+from post_store import PostStore
+from site_manifest import add_posts_to_site
+
 # Configuration
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_REPO = os.getenv("GITHUB_REPOSITORY", "ssinghai6/personal_website_portfolio")
 ISSUE_NUMBER = os.getenv("ISSUE_NUMBER")
+BLOG_DATA_DIR = "src/data"
 BLOG_DATA_PATH = "src/data/blogPosts.json"
+# Paginated summaries and per-post bodies the site fetches on demand
+SITE_DATA_DIR = "public/data/blog"
+# Regenerate the single-file blogPosts.json for readers of the old layout. Off by
+# default: the site reads public/data/blog, and the export rewrites every post
+BLOG_COMPAT_EXPORT = os.getenv("BLOG_COMPAT_EXPORT", "0").lower() in ("1", "true", "yes")
+PUBLISHED_INDEX_PATH = "src/data/publishedIndex.json"
+PENDING_LABEL = "ai-news-pending"
+# Same commenters the approve workflow accepts
+APPROVER_ASSOCIATIONS = ("OWNER", "MEMBER", "COLLABORATOR")
+APPROVAL_PATTERN = re.compile(r"\s*approve\b", re.IGNORECASE)
+
+
+def _github_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {GITHUB_TOKEN}",
+        "Accept": "application/vnd.github.v3+json"
+    }
 
 
 def get_issue_content() -> dict:
@@ -35,18 +66,56 @@ def get_issue_content() -> dict:
         raise ValueError("GITHUB_TOKEN and ISSUE_NUMBER are required")
     
     url = f"https://api.github.com/repos/{GITHUB_REPO}/issues/{ISSUE_NUMBER}"
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    response = requests.get(url, headers=headers, timeout=10)
+    response = outbound.request("GET", url, headers=_github_headers(), timeout=10)
     if response.status_code != 200:
         raise Exception(f"Failed to fetch issue: {response.status_code}")
     
     return response.json()
 
 
+def _get_all_pages(url: str, params: dict = None) -> list:
+    """GET a paginated GitHub list endpoint, 100 items per page."""
+    items, page = [], 1
+    while True:
+        response = outbound.request("GET", url, headers=_github_headers(),
+                                    params={**(params or {}), "per_page": 100, "page": page}, timeout=10)
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch {url}: {response.status_code}")
+        batch = response.json()
+        items.extend(batch)
+        if len(batch) < 100:
+            return items
+        page += 1
+
+
+def is_approval(comment: dict) -> bool:
+    """
+    A comment that starts with APPROVE (any case) from someone with write
+    access. Only a leading token counts, so "disapprove" or "I don't
+    approve this" anywhere in an issue's history never publishes it.
+    """
+    return (APPROVAL_PATTERN.match(comment.get("body") or "") is not None
+            and comment.get("author_association") in APPROVER_ASSOCIATIONS)
+
+
+def list_pending_issues() -> list:
+    """Open ai-news-pending issues (not pull requests), oldest first."""
+    if not GITHUB_TOKEN:
+        raise ValueError("GITHUB_TOKEN is required")
+
+    issues = _get_all_pages(f"https://api.github.com/repos/{GITHUB_REPO}/issues",
+                            {"labels": PENDING_LABEL, "state": "open", "direction": "asc"})
+    return sorted((issue for issue in issues if "pull_request" not in issue), key=lambda issue: issue["number"])
+
+
+def list_approved_issues() -> list:
+    """Open ai-news-pending issues with at least one approval, oldest first."""
+    base = f"https://api.github.com/repos/{GITHUB_REPO}/issues"
+    return [issue for issue in list_pending_issues()
+            if issue.get("comments")
+            and any(is_approval(c) for c in _get_all_pages(f"{base}/{issue['number']}/comments"))]
+
+
 def extract_post_data(issue_body: str) -> dict:
     """Extract the JSON post data from the Issue body."""
     # Look for the JSON block in the issue body
@@ -69,19 +138,20 @@ def extract_post_data(issue_body: str) -> dict:
     }
 
 
-def update_blog_data(post_data: dict) -> None:
-    """Add the new post to blogPosts.json."""
-    try:
-        with open(BLOG_DATA_PATH, 'r') as f:
-            posts = json.load(f)
-    except FileNotFoundError:
-        posts = []
-    
-    # Generate new ID
-    new_id = max([p['id'] for p in posts], default=0) + 1
-    
+def update_blog_data(post_data: dict) -> dict:
+    """
+    Publish a single post (see publish_posts). Returns the stored post, or
+    the one already published from the same issue.
+    """
+    entries = publish_posts([post_data])
+    if entries:
+        return entries[0]
+    store = PostStore(BLOG_DATA_DIR)
+    return store.get_post(store.published_issues()[str(post_data["issue"])])
+
+
+def _post_entry(post_data: dict) -> dict:
     entry = {
-        "id": new_id,
         "title": post_data.get("title") or f"AI Update {datetime.date.today()}",
         "date": str(datetime.date.today()),
         "summary": post_data.get("summary") or "",
@@ -90,30 +160,135 @@ def update_blog_data(post_data: dict) -> None:
         "sources": post_data.get("sources") or [],
         "link": post_data.get("link") or "#"
     }
-    
-    # Prepend the new post (most recent first)
-    posts.insert(0, entry)
-    
-    with open(BLOG_DATA_PATH, 'w') as f:
-        json.dump(posts, f, indent=2)
-    
-    print(f"✅ Added new post: {entry['title']}")
+    if post_data.get("issue") is not None:
+        entry["issue"] = post_data["issue"]
     return entry
 
 
+def publish_posts(posts_data: list) -> list:
+    """
+    Add new posts, oldest first, to the sharded post store and the site's
+    paginated data while holding the store's lock. Posts whose "issue" was
+    already published are skipped. Only the posts' own files, the index,
+    the newest page(s) and the site manifest are written, each once per
+    batch; the next id comes from the index. Returns the stored posts.
+    """
+    store = PostStore(BLOG_DATA_DIR)
+    with store.lock():
+        if not store.exists() and os.path.exists(BLOG_DATA_PATH):
+            print("📦 Migrating blogPosts.json into per-post storage...")
+            store = PostStore.migrate(BLOG_DATA_PATH, BLOG_DATA_DIR)
+
+        published = store.published_issues()
+        fresh = []
+        for post_data in posts_data:
+            issue = post_data.get("issue")
+            if issue is not None and str(issue) in published:
+                print(f"⏭️  Issue #{issue} was already published as post #{published[str(issue)]}")
+            else:
+                fresh.append(post_data)
+        if not fresh:
+            return []
+
+        entries = store.add_posts([_post_entry(post_data) for post_data in fresh])
+
+        written = add_posts_to_site(entries, store, SITE_DATA_DIR)
+        print(f"🌐 Updated {len(written)} site data file(s)")
+
+        if BLOG_COMPAT_EXPORT:
+            store.export(BLOG_DATA_PATH)
+
+        # Record the posts' sources so future searches skip these stories
+        index = PublishedIndex.load(PUBLISHED_INDEX_PATH, posts=store.iter_posts)
+        for entry in entries:
+            index.add_post(entry)
+        index.save(PUBLISHED_INDEX_PATH)
+
+    for entry in entries:
+        print(f"✅ Added new post #{entry['id']}: {entry['title']}")
+    return entries
+
+
+def bulk_publish() -> list:
+    """
+    Publish every approved pending issue that is not in the store yet, in
+    one batch. Returns the stored posts.
+    """
+    published = PostStore(BLOG_DATA_DIR).published_issues()
+    issues = [issue for issue in list_approved_issues() if str(issue["number"]) not in published]
+    if not issues:
+        print("📭 No approved issues waiting")
+        return []
+
+    batch = []
+    for issue in issues:
+        try:
+            batch.append({**extract_post_data(issue.get("body") or ""), "issue": issue["number"]})
+        except ValueError as e:
+            print(f"⚠️  Skipping Issue #{issue['number']}: could not read post data ({e})")
+    if not batch:
+        return []
+
+    numbers = ", ".join(f"#{post_data['issue']}" for post_data in batch)
+    print(f"📝 Storing {len(batch)} post(s) from issues {numbers}...")
+    return publish_posts(batch)
+
+
+def close_published() -> list:
+    """
+    Close every open pending issue whose post is in the store; run once the
+    publish commit is pushed. An issue that fails to close stays open, is
+    skipped by the next --bulk (its number is in the store) and is retried
+    here next time. Returns the closed issue numbers.
+    """
+    store = PostStore(BLOG_DATA_DIR)
+    published = store.published_issues()
+    titles = {entry["id"]: entry["title"] for entry in store.index["posts"]}
+
+    closed, failed = [], []
+    for issue in list_pending_issues():
+        post_id = published.get(str(issue["number"]))
+        if post_id is None:
+            continue
+        try:
+            close_issue_with_success(str(issue["number"]), titles.get(post_id) or issue.get("title", ""))
+            closed.append(issue["number"])
+        except Exception as e:
+            print(f"❌ Could not close Issue #{issue['number']}: {e}")
+            failed.append(issue["number"])
+
+    if failed:
+        raise Exception(f"Issues left open: {', '.join(f'#{n}' for n in failed)}")
+    if not closed:
+        print("📭 No published issues to close")
+    return closed
+
+
 def close_issue_with_success(issue_number: str, post_title: str) -> None:
-    """Close the Issue and add a success comment."""
+    """
+    Close the Issue, drop its pending label and add a success comment.
+    Raises if GitHub refuses to close it or to remove the label.
+    """
     if not GITHUB_TOKEN:
         print("⚠️  No GITHUB_TOKEN, skipping issue close")
         return
     
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    headers = _github_headers()
+    issue_url = f"https://api.github.com/repos/{GITHUB_REPO}/issues/{issue_number}"
+    
+    # Close the issue first, so a failure here never leaves a duplicate comment behind
+    response = outbound.request("PATCH", issue_url, headers=headers,
+                                json={"state": "closed", "state_reason": "completed"}, timeout=10)
+    if response.status_code != 200:
+        raise Exception(f"Failed to close issue #{issue_number}: {response.status_code}")
+    
+    # 404: the label was already removed
+    response = outbound.request("DELETE", f"{issue_url}/labels/{PENDING_LABEL}", headers=headers, timeout=10)
+    if response.status_code not in (200, 404):
+        raise Exception(f"Failed to remove the {PENDING_LABEL} label from issue #{issue_number}: "
+                        f"{response.status_code}")
     
     # Add success comment
-    comment_url = f"https://api.github.com/repos/{GITHUB_REPO}/issues/{issue_number}/comments"
     comment_data = {
         "body": f"""## ✅ Post Published Successfully!
 
@@ -122,15 +297,12 @@ def close_issue_with_success(issue_number: str, post_title: str) -> None:
 The blog post has been added to the website. Changes will be live after the site rebuilds.
 
 ---
-*This issue will now be closed automatically.*
+*This issue has been closed automatically.*
 """
     }
-    requests.post(comment_url, headers=headers, json=comment_data, timeout=10)
-    
-    # Close the issue
-    issue_url = f"https://api.github.com/repos/{GITHUB_REPO}/issues/{issue_number}"
-    close_data = {"state": "closed"}
-    requests.patch(issue_url, headers=headers, json=close_data, timeout=10)
+    response = outbound.request("POST", f"{issue_url}/comments", headers=headers, json=comment_data, timeout=10)
+    if response.status_code != 201:
+        print(f"⚠️  Issue #{issue_number} closed, but the success comment failed: {response.status_code}")
     
     print(f"✅ Issue #{issue_number} closed")
 
@@ -145,22 +317,22 @@ def test_mode():
     sample_post = {
         "title": "TEST: AI Weekly Update - Publish Agent Test",
         "summary": "This is a test post to verify the publish agent is working correctly.",
-        "content": "## Overview\n\nThis is a test post generated by running `python3 agent/publish_agent.py --test`.\n\n## Key Points\n\n• **Test Verification**: This confirms the publish agent can update blogPosts.json correctly.\n• **Safe to Delete**: You can remove this post from blogPosts.json after testing.",
+        "content": "## Overview\n\nThis is a test post generated by running `python3 agent/publish_agent.py --test`.\n\n## Key Points\n\n• **Test Verification**: This confirms the publish agent can store posts correctly.\n• **Safe to Delete**: You can remove this post from the post store after testing.",
         "tags": ["Test", "Agent"],
         "sources": [{"title": "Test Source", "url": "https://example.com"}],
         "link": "https://example.com"
     }
     
     print(f"📋 Sample post: {sample_post['title']}")
-    print("📝 Updating blogPosts.json...")
+    print("📝 Storing post...")
     
     entry = update_blog_data(sample_post)
     
     print("\n" + "=" * 50)
-    print("✅ TEST PASSED - Post added to blogPosts.json")
+    print("✅ TEST PASSED - Post added to the post store")
     print(f"📄 Post ID: {entry['id']}")
     print("=" * 50)
-    print("\n⚠️  Remember to remove the test post from blogPosts.json!")
+    print("\n⚠️  Remember to remove the test post (src/data/posts, postIndex.json) and rebuild the site data!")
 
 
 def main():
@@ -171,6 +343,18 @@ def main():
     if "--test" in sys.argv:
         test_mode()
         return
+
+    if "--bulk" in sys.argv or "--close-published" in sys.argv:
+        try:
+            if "--bulk" in sys.argv:
+                print("📤 Publishing all approved issues")
+                bulk_publish()
+            else:
+                print("🔒 Closing published issues")
+                close_published()
+        finally:
+            print(f"📡 Outbound calls:\n{outbound.report()}")
+        return
     
     print("=" * 50)
     print("📤 Starting Publish Agent")
@@ -183,11 +367,11 @@ def main():
         
         # 2. Extract post data
         print("📋 Extracting post data...")
-        post_data = extract_post_data(issue["body"])
+        post_data = {**extract_post_data(issue["body"]), "issue": int(ISSUE_NUMBER)}
         print(f"   Title: {post_data.get('title')}")
         
         # 3. Update blog data
-        print("📝 Updating blogPosts.json...")
+        print("📝 Storing post...")
         entry = update_blog_data(post_data)
         
         # 4. Close the issue
@@ -201,6 +385,8 @@ def main():
     except Exception as e:
         print(f"\n❌ Error: {e}")
         raise
+    finally:
+        print(f"📡 Outbound calls:\n{outbound.report()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+Index of stories that have already been published on the blog.
+
+Weekly search windows overlap, so a story covered last week can easily come
+back this week. The index keeps a hashed set of every published source URL
+and title fingerprint, so the search stage can drop repeats with an O(1)
+lookup per candidate. publish_agent updates it incrementally on every
+publish; if the file is missing it is rebuilt from the post store (or
+blogPosts.json when there is no store).
+
+Stored as src/data/publishedIndex.json:
+    {"version": 1, "urls": ["<hash>", ...], "titles": ["<hash>", ...]}
+"""
+
+import re
+import json
+import hashlib
+from urllib.parse import urlsplit
+
+from atomic_files import write_text_atomic
+
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "at", "by", "as"}
+# Titles shorter than this are too generic to identify a story
+MIN_TITLE_TOKENS = 3
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """Drop scheme, www., query, fragment and trailing slash so variants of a link compare equal."""
+    if not url or url == "#":
+        return ""
+    parts = urlsplit(url.strip() if "://" in url else f"//{url.strip()}")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}" if host else ""
+
+
+def title_fingerprint(title: str) -> str:
+    """Hash of the title's sorted content words, or "" when the title is too short to trust."""
+    tokens = sorted({t for t in _TOKEN.findall((title or "").lower()) if t not in _STOPWORDS})
+    if len(tokens) < MIN_TITLE_TOKENS:
+        return ""
+    return _digest(" ".join(tokens))
+
+
+class PublishedIndex:
+    """Hashed sets of published URLs and title fingerprints."""
+
+    def __init__(self, urls=(), titles=()):
+        self.urls = set(urls)
+        self.titles = set(titles)
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    @classmethod
+    def from_posts(cls, posts: list) -> "PublishedIndex":
+        index = cls()
+        for post in posts:
+            index.add_post(post)
+        return index
+
+    @classmethod
+    def load(cls, path: str, posts_path: str = None, posts=None) -> "PublishedIndex":
+        """
+        Load the index from `path`. If it is missing or stale, rebuild it from
+        posts() (e.g. PostStore.iter_posts) when given, else from the posts file.
+        """
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return cls(data.get("urls", []), data.get("titles", []))
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            pass
+
+        if posts is not None:
+            return cls.from_posts(posts())
+        if posts_path:
+            try:
+                with open(posts_path, "r") as f:
+                    return cls.from_posts(json.load(f))
+            except (FileNotFoundError, json.JSONDecodeError, OSError):
+                pass
+        return cls()
+
+    def add(self, url: str = "", title: str = "") -> None:
+        normalized = normalize_url(url)
+        if normalized:
+            self.urls.add(_digest(normalized))
+        fingerprint = title_fingerprint(title)
+        if fingerprint:
+            self.titles.add(fingerprint)
+
+    def add_post(self, post: dict) -> None:
+        """Index the post's link and every source it cites."""
+        self.add(post.get("link", ""))
+        for source in post.get("sources") or []:
+            self.add(source.get("url", ""), source.get("title", ""))
+
+    def contains(self, url: str = "", title: str = "") -> bool:
+        """True if the URL or the title fingerprint has already been published."""
+        normalized = normalize_url(url)
+        if normalized and _digest(normalized) in self.urls:
+            return True
+        fingerprint = title_fingerprint(title)
+        return bool(fingerprint) and fingerprint in self.titles
+
+    def save(self, path: str) -> None:
+        """Write the index atomically (temp file + rename)."""
+        data = {"version": INDEX_VERSION, "urls": sorted(self.urls), "titles": sorted(self.titles)}
+        write_text_atomic(path, json.dumps(data, indent=2) + "\n")
@@ -0,0 +1,271 @@
+"""
+Shared outbound-call coordination for the agents.
+
+Every call to DuckDuckGo, Groq or the GitHub API goes through one
+HostRateLimiter, which gives each host:
+1. A token bucket, so bursts (e.g. the concurrent search fan-out) are paced
+2. Retries with exponential backoff and full jitter for transient failures
+3. Named circuit breakers that fail fast once a backend keeps failing
+
+Failure counts and total backoff time are kept per host for the run report.
+"""
+
+import os
+import time
+import random
+import threading
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from lazy_imports import lazy_importer
+
+# requests is only needed for HTTP calls, not for pacing SDK calls
+__getattr__, _lazy = lazy_importer(globals(), {"requests": ("requests", None)})
+
+if TYPE_CHECKING:
+    import requests
+
+# (tokens per second, burst size) per host. Groq stays at its free-tier 30
+# requests/minute; news_agent sizes its burst to the map-reduce fan-out (set_burst)
+HOST_LIMITS = {
+    "duckduckgo.com": (1.0, 5),
+    "api.groq.com": (0.5, 1),
+    "api.github.com": (5.0, 10),
+}
+DEFAULT_HOST_LIMIT = (2.0, 4)
+
+MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("OUTBOUND_BACKOFF_MAX", "30.0"))
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "3"))
+CIRCUIT_BREAKER_RESET = float(os.getenv("CIRCUIT_BREAKER_RESET", "300"))
+
+# HTTP statuses worth retrying (throttling and transient server errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Statuses where the server definitely did not act on a non-idempotent request
+REJECTED_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS", "PATCH"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and stays open for
+    `reset_after` seconds, after which one trial call is let through.
+    """
+
+    def __init__(self, threshold: int = None, reset_after: float = None, clock=time.monotonic):
+        self.threshold = CIRCUIT_BREAKER_THRESHOLD if threshold is None else threshold
+        self.reset_after = CIRCUIT_BREAKER_RESET if reset_after is None else reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if self._clock() - self.opened_at >= self.reset_after:
+                # Half-open: allow a trial call; one more failure re-opens it
+                self.opened_at = None
+                self.failures = self.threshold - 1
+                return False
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = self._clock()
+
+
+class HostRateLimiter:
+    """Per-host token buckets, retry/backoff and circuit breakers with stats."""
+
+    def __init__(self, limits: dict = None, default_limit: tuple = DEFAULT_HOST_LIMIT,
+                 max_retries: int = None, backoff_base: float = None, backoff_max: float = None,
+                 sleep=time.sleep):
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = BACKOFF_MAX if backoff_max is None else backoff_max
+        self._sleep = sleep
+        self._buckets = {}
+        self._breakers = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self.limits.get(host, self.default_limit)
+                self._buckets[host] = TokenBucket(rate, burst, sleep=self._sleep)
+            return self._buckets[host]
+
+    def set_burst(self, host: str, burst: int) -> None:
+        """Resize `host`'s burst, keeping its rate; the bucket is rebuilt on next use."""
+        with self._lock:
+            rate, _ = self.limits.get(host, self.default_limit)
+            self.limits[host] = (rate, burst)
+            self._buckets.pop(host, None)
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker()
+            return self._breakers[name]
+
+    def _record(self, host: str, **increments) -> None:
+        with self._lock:
+            entry = self.stats.setdefault(host, {"calls": 0, "failures": 0, "retries": 0,
+                                                 "throttle_wait": 0.0, "backoff": 0.0})
+            for key, value in increments.items():
+                entry[key] += value
+
+    def backoff_delay(self, attempt: int, retry_after: float = None) -> float:
+        """Full-jitter exponential backoff, honouring a server-supplied Retry-After."""
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, host: str, fn, *args, retry_on: tuple = (), breaker: str = None,
+             retries: int = None, passthrough: tuple = (), **kwargs):
+        """
+        Call fn(*args, **kwargs) under `host`'s rate limit. Exceptions that are
+        instances of `retry_on` are retried with backoff; anything else (or the
+        last retryable failure) is raised. With `breaker`, the call fails fast
+        with CircuitOpenError while that breaker is open. Instances of
+        `passthrough` mean the backend answered but the caller rejected the
+        answer (e.g. malformed output): they are raised as-is and count as
+        neither a host failure nor a breaker failure.
+        """
+        retries = self.max_retries if retries is None else retries
+        circuit = self.breaker(breaker) if breaker else None
+        if circuit is not None and circuit.is_open:
+            raise CircuitOpenError(f"circuit '{breaker}' is open after {circuit.failures} failures")
+
+        attempt = 0
+        while True:
+            self._record(host, calls=1, throttle_wait=self.bucket(host).acquire())
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if passthrough and isinstance(e, passthrough):
+                    raise
+                self._record(host, failures=1)
+                if attempt < retries and retry_on and isinstance(e, retry_on):
+                    delay = self.backoff_delay(attempt)
+                    self._record(host, retries=1, backoff=delay)
+                    self._sleep(delay)
+                    attempt += 1
+                    continue
+                if circuit is not None:
+                    circuit.record_failure()
+                raise
+            if circuit is not None:
+                circuit.record_success()
+            return result
+
+    def request(self, method: str, url: str, retries: int = None, **kwargs) -> "requests.Response":
+        """
+        requests.request() with rate limiting and retries on throttling and
+        transient server errors. Non-idempotent methods (POST) are only retried
+        when the server explicitly rejected the request or the connection never
+        opened, so a retry cannot create a duplicate issue or comment.
+        """
+        requests = _lazy("requests")
+        retries = self.max_retries if retries is None else retries
+        host = urlsplit(url).hostname or url
+        method = method.upper()
+        if method in IDEMPOTENT_METHODS:
+            retry_exceptions = (requests.ConnectionError, requests.Timeout)
+            retry_statuses = RETRYABLE_STATUSES
+        else:
+            retry_exceptions = (requests.exceptions.ConnectTimeout,)
+            retry_statuses = REJECTED_STATUSES
+
+        attempt = 0
+        while True:
+            self._record(host, calls=1, throttle_wait=self.bucket(host).acquire())
+            try:
+                response = requests.request(method, url, **kwargs)
+            except retry_exceptions:
+                self._record(host, failures=1)
+                if attempt >= retries:
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in retry_statuses:
+                    return response
+                self._record(host, failures=1)
+                if attempt >= retries:
+                    return response
+                retry_after = _parse_retry_after(response)
+
+            delay = self.backoff_delay(attempt, retry_after)
+            self._record(host, retries=1, backoff=delay)
+            self._sleep(delay)
+            attempt += 1
+
+    def report(self) -> str:
+        """One line per host: calls, failures, retries and time spent waiting."""
+        with self._lock:
+            lines = [
+                f"   {host}: {s['calls']} calls, {s['failures']} failures, {s['retries']} retries, "
+                f"{s['backoff']:.1f}s backoff, {s['throttle_wait']:.1f}s throttled"
+                for host, s in sorted(self.stats.items())
+            ]
+            open_breakers = [name for name, b in self._breakers.items() if b.opened_at is not None]
+        if open_breakers:
+            lines.append(f"   open circuits: {', '.join(sorted(open_breakers))}")
+        return "\n".join(lines) if lines else "   no outbound calls"
+
+
+def _parse_retry_after(response) -> float:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Shared limiter for the current process
+outbound = HostRateLimiter()
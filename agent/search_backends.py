@@ -0,0 +1,179 @@
+"""
+Search backends for the news agent.
+
+search_news_node only depends on the SearchBackend protocol below, so the
+selection pipeline can run against live DuckDuckGo (DDGSBackend) or a
+generated, fully offline corpus (LocalCorpusBackend) for tests and
+benchmarks at 10k-1M candidates.
+
+Both backends return raw results in DDGS's shape: news results carry
+title/body/url/date/source, text results carry title/body/href.
+"""
+
+import re
+import random
+import datetime
+import threading
+from collections import Counter
+from typing import Protocol
+
+from rate_limit import outbound
+from lazy_imports import lazy_importer
+
+# ddgs is only imported once a live search actually runs
+__getattr__, _lazy = lazy_importer(globals(), {
+    "DDGS": ("ddgs", "DDGS"),
+    "RatelimitException": ("ddgs.exceptions", "RatelimitException"),
+    "TimeoutException": ("ddgs.exceptions", "TimeoutException"),
+})
+
+
+class SearchBackend(Protocol):
+    """What the search stage needs from a search provider."""
+
+    name: str
+    cacheable: bool  # whether results are worth keeping in the on-disk search cache
+
+    def search(self, method: str, query: str, **kwargs) -> list:
+        """Run a 'news' or 'text' search; kwargs are max_results, timelimit, page."""
+        ...
+
+    def close(self) -> None:
+        """Release connections or other per-run resources."""
+        ...
+
+
+class DDGSBackend:
+    """
+    Live DuckDuckGo search through one shared DDGS instance. DDGS caches its
+    engine objects (and their HTTP sessions), so reusing a single instance
+    keeps connections alive instead of re-opening them for every query.
+    """
+
+    name = "ddgs"
+    cacheable = True
+
+    def __init__(self, timeout: float = 20):
+        self.timeout = timeout
+        self.requests = 0
+        self._ddgs = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        with self._lock:
+            if self._ddgs is None:
+                self._ddgs = _lazy("DDGS")(timeout=max(1, int(self.timeout))).__enter__()
+            self.requests += 1
+            return self._ddgs
+
+    def search(self, method: str, query: str, **kwargs) -> list:
+        """
+        Run ddgs.news / ddgs.text on the shared session, paced by the shared
+        rate limiter. Throttling and timeouts are retried with backoff; once a
+        method keeps failing its circuit opens and calls fail fast with
+        CircuitOpenError so callers can switch to another method.
+        """
+        return outbound.call(
+            "duckduckgo.com",
+            lambda: list(getattr(self._client(), method)(query, **kwargs)),
+            retry_on=(_lazy("RatelimitException"), _lazy("TimeoutException")),
+            breaker=f"ddgs:{method}",
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._ddgs is not None:
+                self._ddgs.__exit__(None, None, None)
+                self._ddgs = None
+
+
+# Vocabulary for generated stories
+_COMPANIES = ["OpenAI", "Anthropic", "Google", "Meta", "Microsoft", "Nvidia", "Mistral", "Apple",
+              "Amazon", "Cohere", "a startup", "researchers", "regulators", "the EU", "developers"]
+_TOPIC_WORDS = ["release", "launch", "product", "announcement", "research", "breakthrough", "paper",
+                "benchmark", "business", "startup", "funding", "enterprise", "adoption", "regulation",
+                "safety", "policy", "ethics", "tools", "api", "update", "features", "chatgpt"]
+_FILLER_WORDS = ["quarterly", "earnings", "weather", "sports", "recipe", "travel", "housing",
+                 "election", "concert", "fashion", "traffic", "gardening"]
+_VERBS = ["unveils", "announces", "ships", "debates", "reports", "expands", "delays", "updates"]
+_UNKNOWN_DOMAINS = ["tech-roundup.net", "newswire-hub.com", "bestgadgets.io", "dailyfeed.org",
+                    "infodigest.co", "smallblog.dev", "pressroom.biz", "aggregator.site"]
+_STOPWORDS = {"or", "and", "the", "this", "week", "new", "of", "a"}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class LocalCorpusBackend:
+    """
+    Serves searches from a generated in-memory corpus, so filtering, ranking
+    and selection can be exercised without the network.
+
+    size: number of stories. domain_mix: share of stories from trusted,
+    excluded and unknown domains. keyword_density: share of stories that
+    mention an AI keyword. The corpus is deterministic for a given seed.
+    """
+
+    name = "local"
+    cacheable = False
+
+    def __init__(self, size: int = 1000, trusted_domains: list = None, excluded_domains: list = None,
+                 keywords: list = None, domain_mix: dict = None, keyword_density: float = 0.6,
+                 seed: int = 0, today: datetime.date = None):
+        self.size = size
+        self.domain_mix = domain_mix or {"trusted": 0.5, "excluded": 0.2, "unknown": 0.3}
+        self.keyword_density = keyword_density
+        self.requests = 0
+        self._pools = {
+            "trusted": list(trusted_domains or ["techcrunch.com", "theverge.com", "openai.com"]),
+            # Bare words like "local" are URL substrings, not domains
+            "excluded": [d for d in (excluded_domains or ["msn.com"]) if "." in d],
+            "unknown": _UNKNOWN_DOMAINS,
+        }
+        self._keywords = list(keywords or ["ai", "llm", "machine learning"])
+        self._today = today or datetime.date.today()
+        self.corpus = self._generate(random.Random(seed))
+        self._index = self._build_index()
+
+    def _generate(self, rng: random.Random) -> list:
+        kinds = list(self.domain_mix)
+        weights = [self.domain_mix[k] for k in kinds]
+        corpus = []
+        for i in range(self.size):
+            domain = rng.choice(self._pools[rng.choices(kinds, weights)[0]])
+            topic = rng.sample(_TOPIC_WORDS, 2)
+            lead = rng.choice(self._keywords) if rng.random() < self.keyword_density else rng.choice(_FILLER_WORDS)
+            title = f"{rng.choice(_COMPANIES)} {rng.choice(_VERBS)} {lead} {topic[0]}"
+            body = f"Story {i} covers {lead} {topic[1]} and what it means for {rng.choice(_COMPANIES)}."
+            date = self._today - datetime.timedelta(days=rng.randint(0, 6), hours=rng.randint(0, 23))
+            corpus.append({
+                "title": title,
+                "body": body,
+                "url": f"https://{domain}/{i}-{topic[0]}",
+                "date": f"{date.isoformat()}T00:00:00+00:00",
+                "source": domain,
+            })
+        return corpus
+
+    def _build_index(self) -> dict:
+        index = {}
+        for i, item in enumerate(self.corpus):
+            for token in set(_TOKEN.findall(f"{item['title']} {item['body']}".lower())):
+                index.setdefault(token, []).append(i)
+        return index
+
+    def search(self, method: str, query: str, max_results: int = 10, page: int = 1, **kwargs) -> list:
+        """Rank stories by how many query terms they contain and return one page."""
+        self.requests += 1
+        terms = [t for t in _TOKEN.findall(query.lower()) if t not in _STOPWORDS]
+        hits = Counter()
+        for term in terms:
+            hits.update(self._index.get(term, ()))
+
+        ranked = sorted(hits, key=lambda i: (-hits[i], i))
+        start = (page - 1) * max_results
+        results = [self.corpus[i] for i in ranked[start:start + max_results]]
+        if method == "text":
+            return [{"title": r["title"], "body": r["body"], "href": r["url"]} for r in results]
+        return [dict(r) for r in results]
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,132 @@
+"""
+Static data the site loads on demand instead of bundling every post.
+
+Written under public/data/blog/:
+- manifest.json: page size, total posts and page count
+- pages/<n>.json: title, date, tags and summary of up to page_size posts,
+  newest first. Pages are numbered from the oldest posts, so page 1 never
+  changes once full and the newest posts are always on the last page.
+- posts/<id>.json: the body of one post (content, sources, link), fetched
+  when the post is opened
+
+Publishing a post rewrites only its chunk, the last page (or a new one) and
+manifest.json; a batch rewrites each page it fills once.
+
+Run with: python agent/site_manifest.py build [--data-dir src/data] [--site-dir public/data/blog]
+"""
+
+import os
+import json
+import argparse
+
+from atomic_files import write_text_atomic
+from post_store import DEFAULT_DATA_DIR, PostStore, index_entry
+
+MANIFEST_VERSION = 1
+DEFAULT_PAGE_SIZE = 10
+DEFAULT_SITE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "data", "blog")
+CHUNK_FIELDS = ("id", "content", "sources", "link")
+
+
+def _write_json(path: str, data) -> str:
+    write_text_atomic(path, json.dumps(data, indent=2) + "\n")
+    return path
+
+
+def _page_path(site_dir: str, page: int) -> str:
+    return os.path.join(site_dir, "pages", f"{page}.json")
+
+
+def write_post_chunk(post: dict, site_dir: str = DEFAULT_SITE_DIR) -> str:
+    """Write (or refresh) the on-demand body of one post; returns its path."""
+    chunk = {field: post.get(field) for field in CHUNK_FIELDS}
+    return _write_json(os.path.join(site_dir, "posts", f"{post['id']}.json"), chunk)
+
+
+def _write_manifest(site_dir: str, page_size: int, total: int) -> str:
+    pages = -(-total // page_size)
+    return _write_json(os.path.join(site_dir, "manifest.json"),
+                       {"version": MANIFEST_VERSION, "page_size": page_size, "total": total, "pages": pages})
+
+
+def load_manifest(site_dir: str = DEFAULT_SITE_DIR):
+    try:
+        with open(os.path.join(site_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_site(store: PostStore, site_dir: str = DEFAULT_SITE_DIR, page_size: int = DEFAULT_PAGE_SIZE) -> list:
+    """Write the manifest, every page and every post chunk from the store. Returns the written paths."""
+    oldest_first = list(reversed(store.index["posts"]))
+    written = []
+    for start in range(0, len(oldest_first), page_size):
+        page = start // page_size + 1
+        entries = list(reversed(oldest_first[start:start + page_size]))
+        written.append(_write_json(_page_path(site_dir, page), {"page": page, "posts": entries}))
+    for post in store.iter_posts():
+        written.append(write_post_chunk(post, site_dir))
+    written.append(_write_manifest(site_dir, page_size, len(oldest_first)))
+
+    # Drop pages left over from a larger page count (e.g. after changing page_size)
+    page = -(-len(oldest_first) // page_size) + 1
+    while os.path.exists(_page_path(site_dir, page)):
+        os.remove(_page_path(site_dir, page))
+        page += 1
+    return written
+
+
+def add_post_to_site(post: dict, store: PostStore, site_dir: str = DEFAULT_SITE_DIR,
+                     page_size: int = DEFAULT_PAGE_SIZE) -> list:
+    """
+    Publish one new post (already added to `store`): write its chunk, put it
+    at the top of the last page or start a new page, and update the
+    manifest. Falls back to build_site when there is no usable manifest yet.
+    Returns the written paths.
+    """
+    return add_posts_to_site([post], store, site_dir, page_size)
+
+
+def add_posts_to_site(posts: list, store: PostStore, site_dir: str = DEFAULT_SITE_DIR,
+                      page_size: int = DEFAULT_PAGE_SIZE) -> list:
+    """
+    add_post_to_site for a batch of new posts, oldest first. Each page the
+    batch touches and the manifest are written once.
+    """
+    manifest = load_manifest(site_dir)
+    if (not manifest or manifest.get("version") != MANIFEST_VERSION or manifest.get("page_size") != page_size
+            or manifest.get("total", 0) + len(posts) != len(store.index["posts"])):
+        return build_site(store, site_dir, page_size)
+
+    total = manifest["total"]
+    page, entries = total // page_size + 1, []
+    if total % page_size:
+        with open(_page_path(site_dir, page)) as f:
+            entries = json.load(f)["posts"]
+
+    written = [write_post_chunk(post, site_dir) for post in posts]
+    for i, post in enumerate(posts, 1):
+        entries.insert(0, index_entry(post))
+        total += 1
+        if total % page_size == 0 or i == len(posts):
+            written.append(_write_json(_page_path(site_dir, page), {"page": page, "posts": entries}))
+            page, entries = page + 1, []
+    written.append(_write_manifest(site_dir, page_size, total))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the site's paginated post manifest and chunks")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--site-dir", default=DEFAULT_SITE_DIR)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    written = build_site(PostStore(args.data_dir), args.site_dir, args.page_size)
+    print(f"✅ Wrote {len(written)} files to {args.site_dir}")
+
+
+if __name__ == "__main__":
+    main()
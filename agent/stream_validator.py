@@ -0,0 +1,136 @@
+"""
+Incremental validation of a streamed JSON completion.
+
+The digest is one JSON object. Feeding the stream chunk by chunk into
+IncrementalJSONValidator lets summarize_node stop generation as soon as
+the output can no longer be a valid post: text before the opening brace,
+mismatched brackets, a required key set to null or "", text after the
+object, or the object closing without one of the required keys.
+"""
+
+import re
+
+_FENCE_PREFIX = re.compile(r"```(?:json)?\s*")
+
+
+class MalformedStreamError(ValueError):
+    """Raised as soon as a streamed completion cannot be a valid post object."""
+
+
+class IncrementalJSONValidator:
+    """
+    Tracks just enough JSON structure (string/escape state, bracket stack and
+    top-level keys) to reject bad output early. It does not build the value;
+    the complete text is still parsed with json.loads afterwards.
+    """
+
+    def __init__(self, required_keys=("title", "summary", "content")):
+        self.required = set(required_keys)
+        self.keys = set()
+        self.text_length = 0
+        self._prefix = ""
+        self._started = False
+        self._done = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_chars = None  # collecting a top-level key
+        self._current_key = None
+        self._value_key = None  # required key whose value starts next
+        self._empty_check = None  # required key whose string value just opened
+        self._suffix = ""
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next piece of the completion; raises MalformedStreamError on bad structure."""
+        for ch in chunk:
+            self.text_length += 1
+            if not self._started:
+                self._feed_prefix(ch)
+            elif self._done:
+                self._feed_suffix(ch)
+            else:
+                self._feed_body(ch)
+
+    def close(self) -> None:
+        """Call once the stream ends; raises if the object never closed."""
+        if not self._started:
+            raise MalformedStreamError("Response contained no JSON object")
+        if not self._done:
+            raise MalformedStreamError(
+                f"Response ended inside the JSON object (missing keys: {self._missing() or 'none'})")
+
+    def _missing(self) -> list:
+        return sorted(self.required - self.keys)
+
+    def _feed_prefix(self, ch: str) -> None:
+        if ch == "{":
+            self._started = True
+            self._stack.append("{")
+            self._expect_key = True
+            return
+        self._prefix += ch
+        head = self._prefix.lstrip()
+        if head and not ("```json".startswith(head) or _FENCE_PREFIX.fullmatch(head)):
+            raise MalformedStreamError(f"Response does not start with a JSON object: {head[:40]!r}")
+
+    def _feed_suffix(self, ch: str) -> None:
+        self._suffix += ch
+        tail = self._suffix.strip()
+        if tail and not "```".startswith(tail):
+            raise MalformedStreamError(f"Unexpected text after the JSON object: {tail[:40]!r}")
+
+    def _feed_body(self, ch: str) -> None:
+        if self._in_string:
+            if self._empty_check is not None:
+                if ch == '"' and not self._escape:
+                    raise MalformedStreamError(f"Required key '{self._empty_check}' is empty")
+                self._empty_check = None
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._key_chars is not None:
+                    self._current_key = "".join(self._key_chars)
+                    self.keys.add(self._current_key)
+                    self._key_chars = None
+                return
+            if self._key_chars is not None:
+                self._key_chars.append(ch)
+            return
+
+        if ch.isspace():
+            return
+
+        top_level = len(self._stack) == 1
+        if self._value_key is not None:
+            key, self._value_key = self._value_key, None
+            if ch == "n":
+                raise MalformedStreamError(f"Required key '{key}' is null")
+            if ch == '"':
+                self._empty_check = key
+
+        if ch == '"':
+            self._in_string = True
+            if top_level and self._expect_key:
+                self._key_chars = []
+                self._expect_key = False
+        elif ch == ":" and top_level:
+            if self._current_key in self.required:
+                self._value_key = self._current_key
+            self._current_key = None
+        elif ch == "," and top_level:
+            self._expect_key = True
+        elif ch in "{[":
+            self._stack.append(ch)
+        elif ch in "}]":
+            opener = "{" if ch == "}" else "["
+            if self._stack[-1] != opener:
+                raise MalformedStreamError(f"Mismatched '{ch}' in JSON object")
+            self._stack.pop()
+            if not self._stack:
+                if self._missing():
+                    raise MalformedStreamError(f"JSON object closed without required keys: {self._missing()}")
+                self._done = True
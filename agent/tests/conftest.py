@@ -1 +1,40 @@
 # Test configuration for pytest
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_search_cache(tmp_path, monkeypatch):
+    """Point the search cache at a per-test directory so tests never share results."""
+    import news_agent
+    import search_backends
+    from disk_cache import DiskCache
+    from rate_limit import HostRateLimiter
+    from published_index import PublishedIndex
+
+    cache = DiskCache(str(tmp_path / "search"), ttl=news_agent.SEARCH_CACHE_TTL)
+    monkeypatch.setattr(news_agent, "search_cache", cache)
+    monkeypatch.setattr(news_agent, "llm_cache", DiskCache(str(tmp_path / "llm")))
+    monkeypatch.setattr(news_agent, "llm_latency_cache", DiskCache(str(tmp_path / "llm-latency"), max_entries=5))
+    # Fresh, unthrottled limiter so breaker state and buckets never carry across tests
+    limiter = HostRateLimiter(limits={}, default_limit=(1000.0, 1000), backoff_base=0)
+    monkeypatch.setattr(news_agent, "outbound", limiter)
+    monkeypatch.setattr(search_backends, "outbound", limiter)
+    # Start from an empty archive so the real published stories never filter test results
+    monkeypatch.setattr(news_agent, "published_index", PublishedIndex())
+    yield cache
+    news_agent.close_search_backend()
+
+
+@pytest.fixture(autouse=True)
+def local_search_backend(monkeypatch):
+    """Serve searches from the generated offline corpus unless a test installs another backend."""
+    import news_agent
+
+    monkeypatch.setattr(news_agent, "SEARCH_BACKEND", "local")
+    monkeypatch.setattr(news_agent, "LOCAL_CORPUS_SIZE", 500)
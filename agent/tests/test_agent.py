@@ -7,6 +7,7 @@ import pytest
 import json
 import os
 import sys
+from contextlib import contextmanager
 from unittest.mock import patch, MagicMock
 
 # Add parent directory to path for imports
@@ -36,6 +37,43 @@ class TestImports:
         assert hasattr(news_agent, 'create_issue_node')
 
 
+class TestStartup:
+    """Guard the cold-start cost of importing the agent."""
+
+    # Cumulative import time budget for news_agent, in milliseconds
+    IMPORT_BUDGET_MS = 300
+    HEAVY_PACKAGES = {"langgraph", "langchain_core", "langchain_groq", "groq", "ddgs", "requests"}
+
+    def _importtime(self, statement):
+        import subprocess
+
+        agent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                                cwd=agent_dir, capture_output=True, text=True, check=True)
+        timings = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            timings[name.strip()] = int(cumulative)
+        return timings
+
+    def test_import_defers_heavy_dependencies(self):
+        """Importing news_agent loads no langgraph/langchain/ddgs/requests and stays in budget."""
+        timings = self._importtime("import news_agent")
+
+        loaded = {name.split(".")[0] for name in timings} & self.HEAVY_PACKAGES
+        assert loaded == set()
+        assert timings["news_agent"] / 1000 < self.IMPORT_BUDGET_MS
+
+    def test_lazy_names_resolve_on_first_use(self):
+        """Deferred names are importable from the module once accessed."""
+        timings = self._importtime("import news_agent; news_agent.ChatGroq; news_agent.build_graph()")
+
+        loaded = {name.split(".")[0] for name in timings}
+        assert {"langchain_groq", "langgraph"} <= loaded
+
+
 class TestSearchNode:
     """Test the search news node functionality."""
     
@@ -66,6 +104,630 @@ class TestSearchNode:
                 assert len(result["news_items"]) > 0
 
 
+@contextmanager
+def fake_ddgs(fake):
+    """Serve searches from `fake` (a DDGS stand-in) through the real DDGS backend."""
+    import news_agent
+    from search_backends import DDGSBackend
+
+    with patch('search_backends.DDGS', fake):
+        news_agent.set_search_backend(DDGSBackend(timeout=5))
+        try:
+            yield fake
+        finally:
+            news_agent.close_search_backend()
+
+
+class FakeDDGS:
+    """Minimal stand-in for ddgs.DDGS that serves canned results per query."""
+
+    def __init__(self, results=None, delay=0.0, failing=(), pages=None, delays=None, **kwargs):
+        self.results = results or {}
+        self.pages = pages or {}  # query -> list of result pages
+        self.delay = delay
+        self.delays = delays or {}  # query -> delay, overriding `delay`
+        self.failing = failing
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _page(self, query, page):
+        if query in self.pages:
+            pages = self.pages[query]
+            return pages[page - 1] if page <= len(pages) else []
+        return self.results.get(query, [])
+
+    def news(self, query, page=1, **kwargs):
+        import time
+        self.calls.append(("news", query, page))
+        time.sleep(self.delays.get(query, self.delay))
+        if query in self.failing:
+            raise Exception("news backend down")
+        return self._page(query, page)
+
+    def text(self, query, page=1, **kwargs):
+        self.calls.append(("text", query, page))
+        return [{"title": r["title"], "body": r["body"], "href": r["url"]}
+                for r in self._page(query, page)]
+
+
+class TestConcurrentSearch:
+    """Test the concurrent category fan-out."""
+
+    CATEGORIES = [{"name": f"Cat {i}", "query": f"query {i}"} for i in range(5)]
+
+    def _results(self):
+        return {
+            cat["query"]: [{"title": f"{cat['name']} story", "body": "AI news", "url": f"https://techcrunch.com/{i}"}]
+            for i, cat in enumerate(self.CATEGORIES)
+        }
+
+    def test_fan_out_preserves_category_order(self):
+        """Results come back keyed in the original category order."""
+        import time
+        from news_agent import run_category_searches
+
+        with fake_ddgs(FakeDDGS(self._results(), delay=0.2)):
+            started = time.monotonic()
+            results = run_category_searches(self.CATEGORIES, concurrency=5, timeout=5)
+            elapsed = time.monotonic() - started
+
+        assert list(results) == [c["name"] for c in self.CATEGORIES]
+        assert results["Cat 3"][0]["title"] == "Cat 3 story"
+        # Five 0.2s queries in parallel should take well under the serial 1.0s
+        assert elapsed < 0.8
+
+    def test_text_fallback_runs_when_news_fails(self):
+        """A failed news query falls back to text search inside its worker."""
+        from news_agent import run_category_searches
+
+        fake = FakeDDGS(self._results(), failing=("query 1",))
+        with fake_ddgs(fake):
+            results = run_category_searches(self.CATEGORIES, concurrency=3, timeout=5)
+
+        assert results["Cat 1"][0]["link"] == "https://techcrunch.com/1"
+
+    def test_slow_query_misses_deadline(self):
+        """Queries that exceed the deadline contribute no results."""
+        from news_agent import run_category_searches
+
+        with fake_ddgs(FakeDDGS(self._results(), delay=2)):
+            results = run_category_searches(self.CATEGORIES[:2], concurrency=2, timeout=0.2)
+
+        assert results == {"Cat 0": [], "Cat 1": []}
+
+
+class TestQuotaDrivenSearch:
+    """Test lazy, quota-driven paging of search results."""
+
+    @staticmethod
+    def _page(domains):
+        return [{"title": "AI story", "body": "LLM news", "url": f"https://{d}/story"} for d in domains]
+
+    def test_dense_category_stops_after_first_page(self):
+        """A category that fills its quota on page 1 never requests page 2."""
+        from news_agent import fetch_category_results
+
+        fake = FakeDDGS(pages={"dense": [
+            self._page(["techcrunch.com", "wired.com", "theverge.com"]),
+            self._page(["engadget.com"]),
+        ]})
+        with fake_ddgs(fake):
+            results = fetch_category_results({"name": "Dense", "query": "dense"}, quota=3)
+
+        assert len(results) == 3
+        assert [c[2] for c in fake.calls] == [1]
+
+    def test_sparse_category_pulls_deeper_pages(self):
+        """A category short of its quota keeps paging until it fills or runs dry."""
+        from news_agent import fetch_category_results
+
+        fake = FakeDDGS(pages={"sparse": [
+            self._page(["unknown-blog.net", "techcrunch.com"]),
+            self._page(["techcrunch.com", "wired.com"]),
+            self._page(["theverge.com"]),
+        ]})
+        with fake_ddgs(fake):
+            results = fetch_category_results({"name": "Sparse", "query": "sparse"}, quota=3)
+
+        assert [r["_source_name"] for r in results] == ["TechCrunch", "Wired", "The Verge"]
+        assert [c[2] for c in fake.calls] == [1, 2, 3]
+
+    def test_domains_claimed_by_earlier_category_do_not_fill_quota(self):
+        """A category whose first page repeats another category's domains pages deeper."""
+        from news_agent import run_category_searches
+
+        fake = FakeDDGS(pages={
+            "first": [self._page(["techcrunch.com", "wired.com", "theverge.com"])],
+            "second": [
+                self._page(["techcrunch.com", "wired.com", "engadget.com"]),
+                self._page(["arstechnica.com", "venturebeat.com"]),
+            ],
+        })
+        categories = [{"name": "First", "query": "first"}, {"name": "Second", "query": "second"}]
+        claimed = set()
+        with fake_ddgs(fake), patch("news_agent.SEARCH_CATEGORY_QUOTA", 3):
+            results = run_category_searches(categories, concurrency=1, claimed_domains=claimed)
+
+        second = [r["_source_domain"] for r in results["Second"]]
+        assert second == ["engadget.com", "arstechnica.com", "venturebeat.com"]
+        assert len(claimed) == 6
+
+    def test_slower_earlier_category_still_owns_shared_domain(self):
+        """Concurrent claims settle in category order, not in the order queries return."""
+        from news_agent import run_category_searches
+
+        fake = FakeDDGS(pages={"a": [self._page(["techcrunch.com"])],
+                               "b": [self._page(["techcrunch.com"])]},
+                        delays={"a": 0.3})
+        categories = [{"name": "A", "query": "a"}, {"name": "B", "query": "b"}]
+        selections = []
+        # Concurrent first: the serial run's cached pages would hide the slow query
+        for concurrency in (5, 1):
+            with fake_ddgs(fake):
+                results = run_category_searches(categories, concurrency=concurrency, timeout=5,
+                                                 claimed_domains=set())
+            selections.append({name: [r["_source_domain"] for r in items] for name, items in results.items()})
+
+        assert selections[0] == selections[1] == {"A": ["techcrunch.com"], "B": []}
+
+    def test_concurrent_claims_match_serial_paging(self):
+        """A later category that loses domains to an earlier one pages deeper, as in a serial run."""
+        from news_agent import run_category_searches
+
+        pages = {
+            "first": [self._page(["techcrunch.com", "wired.com", "theverge.com"])],
+            "second": [
+                self._page(["techcrunch.com", "wired.com", "engadget.com"]),
+                self._page(["arstechnica.com", "venturebeat.com"]),
+            ],
+        }
+        categories = [{"name": "First", "query": "first"}, {"name": "Second", "query": "second"}]
+        selections = []
+        # Concurrent first: the serial run's cached pages would hide the slow query
+        for concurrency in (5, 1):
+            with fake_ddgs(FakeDDGS(pages=pages, delays={"first": 0.3})), \
+                    patch("news_agent.SEARCH_CATEGORY_QUOTA", 3):
+                results = run_category_searches(categories, concurrency=concurrency, timeout=5,
+                                                claimed_domains=set())
+            selections.append({name: [r["_source_domain"] for r in items] for name, items in results.items()})
+
+        assert selections[0] == selections[1]
+        assert selections[1]["Second"] == ["engadget.com", "arstechnica.com", "venturebeat.com"]
+
+
+class TestSharedSearchClient:
+    """Test the pooled search client shared across a run."""
+
+    def test_one_session_serves_all_queries(self):
+        """Category queries and fallbacks reuse a single DDGS instance."""
+        from news_agent import run_category_searches
+
+        factory = MagicMock(return_value=FakeDDGS(failing=("query 0",)))
+        categories = [{"name": f"Cat {i}", "query": f"query {i}"} for i in range(3)]
+        with fake_ddgs(factory):
+            run_category_searches(categories, concurrency=3, timeout=5)
+
+        assert factory.call_count == 1
+
+    def test_cleanup_node_closes_client(self):
+        """The graph's cleanup node closes the client; the next run opens a new one."""
+        import news_agent
+
+        first = news_agent.get_search_backend()
+        assert news_agent.get_search_backend() is first
+        news_agent.cleanup_node({"news_items": []})
+        assert news_agent.get_search_backend() is not first
+
+
+class TestLocalCorpusBackend:
+    """Test the generated offline search corpus."""
+
+    def test_corpus_is_deterministic_and_respects_mix(self):
+        """Same seed gives the same corpus; the domain mix is honoured."""
+        from search_backends import LocalCorpusBackend
+
+        a = LocalCorpusBackend(size=2000, trusted_domains=["techcrunch.com"], excluded_domains=["msn.com"],
+                               domain_mix={"trusted": 0.25, "excluded": 0.75, "unknown": 0.0}, seed=7)
+        b = LocalCorpusBackend(size=2000, trusted_domains=["techcrunch.com"], excluded_domains=["msn.com"],
+                               domain_mix={"trusted": 0.25, "excluded": 0.75, "unknown": 0.0}, seed=7)
+
+        assert a.corpus == b.corpus
+        trusted_share = sum("techcrunch.com" in item["url"] for item in a.corpus) / a.size
+        assert 0.2 < trusted_share < 0.3
+
+    def test_pages_do_not_overlap(self):
+        """Paged searches walk through distinct results."""
+        from search_backends import LocalCorpusBackend
+
+        backend = LocalCorpusBackend(size=500)
+        first = backend.search("news", "AI research breakthrough", max_results=10, page=1)
+        second = backend.search("news", "AI research breakthrough", max_results=10, page=2)
+
+        assert len(first) == 10
+        assert not {r["url"] for r in first} & {r["url"] for r in second}
+        assert "href" in backend.search("text", "AI research", max_results=1)[0]
+
+    def test_search_node_runs_offline(self):
+        """The full search stage selects five diverse items from the local corpus."""
+        from news_agent import search_news_node
+
+        state = {"news_items": [], "generated_post": None, "issue_url": None, "error": None}
+        result = search_news_node(state)
+
+        domains = [item["_source_domain"] for item in result["news_items"]]
+        assert len(domains) == 5
+        assert len(set(domains)) == 5
+
+
+class TestSearchCache:
+    """Test the on-disk DuckDuckGo result cache."""
+
+    def test_cache_round_trip_and_ttl(self, tmp_path):
+        """Entries are returned until their TTL expires."""
+        from disk_cache import DiskCache
+
+        cache = DiskCache(str(tmp_path), ttl=60)
+        cache.set([{"title": "a"}], "ddgs", "news", "q", "w", 15)
+        assert cache.get("ddgs", "news", "q", "w", 15) == [{"title": "a"}]
+        assert cache.get("ddgs", "news", "q", "w", 30) is None
+
+        cache.ttl = -1
+        assert cache.get("ddgs", "news", "q", "w", 15) is None
+
+    def test_cache_evicts_least_recently_used(self, tmp_path):
+        """The cache never grows past max_entries."""
+        from disk_cache import DiskCache
+
+        cache = DiskCache(str(tmp_path), max_entries=2)
+        for i in range(4):
+            cache.set(i, "key", i)
+        assert len(list(tmp_path.glob("*.json"))) == 2
+        assert cache.get("key", 3) == 3
+        assert cache.stats["evictions"] == 2
+
+    def test_cached_search_skips_network_on_rerun(self, isolated_search_cache):
+        """A repeated query is served from disk without calling DDGS."""
+        from news_agent import cached_search
+
+        fake = FakeDDGS({"q": [{"title": "t", "body": "b", "url": "https://openai.com/x"}]})
+        with fake_ddgs(fake):
+            first = cached_search("news", "q", timelimit="w")
+        with fake_ddgs(MagicMock(side_effect=AssertionError("network used"))):
+            second = cached_search("news", "q", timelimit="w")
+
+        assert first == second
+        assert isolated_search_cache.stats["hits"] == 1
+
+    def test_bypass_ignores_cached_results(self, isolated_search_cache):
+        """With the cache disabled, results are fetched fresh."""
+        from news_agent import cached_search
+
+        isolated_search_cache.set([{"title": "stale"}], "ddgs", "news", "q", "w", 15, 1)
+        isolated_search_cache.enabled = False
+        fake = FakeDDGS({"q": [{"title": "fresh", "body": "", "url": ""}]})
+        with fake_ddgs(fake):
+            assert cached_search("news", "q", timelimit="w")[0]["title"] == "fresh"
+
+
+class TestSourceQualityIndex:
+    """Test the host-suffix source quality lookup."""
+
+    def test_matches_host_and_subdomains_only(self):
+        """Domains match on host labels, not anywhere in the URL text."""
+        from news_agent import get_source_quality_score
+
+        assert get_source_quality_score("https://openai.com/blog/gpt-5")[2] == "OpenAI Blog"
+        assert get_source_quality_score("https://www.theverge.com/ai")[2] == "The Verge"
+        assert get_source_quality_score("https://notopenai.com/x")[1] == "Other"
+        assert get_source_quality_score("https://example.com/openai.com")[1] == "Other"
+
+    def test_path_scoped_entries(self):
+        """Entries with a path only match URLs under that path."""
+        from news_agent import get_source_quality_score
+
+        assert get_source_quality_score("https://www.wsj.com/ai/story")[2] == "WSJ AI"
+        assert get_source_quality_score("https://www.wsj.com/airlines/story")[2] == "Wall Street Journal"
+        assert get_source_quality_score("https://netflix.com/ai")[1] == "Other"
+
+    def test_exclusions_apply_to_subdomains(self):
+        """Excluded hosts win over everything, including their subdomains."""
+        from news_agent import get_source_quality_score
+
+        assert get_source_quality_score("https://finance.yahoo.com/news/ai")[0] == 999
+
+    def test_batch_scoring_returns_parallel_lists(self):
+        """score_source_urls agrees with the single-URL scorer."""
+        from news_agent import score_source_urls, get_source_quality_score
+
+        urls = ["https://techcrunch.com/a", "https://msn.com/b", "", "https://arxiv.org/abs/1"]
+        priorities, tiers, names = score_source_urls(urls)
+
+        assert list(zip(priorities, tiers, names)) == [get_source_quality_score(u) for u in urls]
+
+
+class TestRelevanceMatcher:
+    """Test the compiled AI relevance matcher."""
+
+    def test_short_keywords_need_word_boundaries(self):
+        """'ai' and 'ml' no longer match inside ordinary words."""
+        from news_agent import is_ai_relevant
+
+        assert not is_ai_relevant("Officials said the HTML email failed", "", "https://techcrunch.com/x")
+        assert is_ai_relevant("New AI-powered search", "", "https://techcrunch.com/x")
+        assert is_ai_relevant("Open models gain ground", "", "https://techcrunch.com/x")
+        assert is_ai_relevant("Machine-learning at scale", "", "https://wired.com/x")
+
+    def test_brand_compounds_still_match(self):
+        """Compound brand names that only contain a keyword are still relevant."""
+        from news_agent import is_ai_relevant
+
+        assert is_ai_relevant("ChatGPT adds memory for all users", "", "https://theverge.com/x")
+        assert is_ai_relevant("GenAI startup raises $50M", "", "https://techcrunch.com/x")
+        assert is_ai_relevant("Copilot update lands in VS Code", "", "https://github.blog/x")
+        assert is_ai_relevant("GPT-4o mini price cut", "", "https://wired.com/x")
+        assert is_ai_relevant("Why LLMs hallucinate", "", "https://wired.com/x")
+        assert is_ai_relevant("Gen-AI budgets grow", "", "https://wired.com/x")
+        assert not is_ai_relevant("Officials said the budget passed", "", "https://techcrunch.com/x")
+
+    def test_brands_do_not_match_inside_ordinary_words(self):
+        """Brand patterns are anchored at a word start, so 'llm' inside a word is not a hit."""
+        from news_agent import is_ai_relevant
+
+        assert not is_ai_relevant("Amazon expands fulfillment centers in Ohio", "", "https://techcrunch.com/x")
+        assert not is_ai_relevant("Student enrollment drops at state colleges", "", "https://techcrunch.com/x")
+        assert not is_ai_relevant("Pay in installments for new sofas", "", "https://techcrunch.com/x")
+
+    def test_exclusions_only_apply_to_link(self):
+        """Excluded domains/patterns reject by link, not by article text."""
+        from news_agent import is_ai_relevant
+
+        assert not is_ai_relevant("AI news", "", "https://www.dailymail.co.uk/ai")
+        assert not is_ai_relevant("AI news", "", "https://techcrunch.com/sports/ai")
+        assert is_ai_relevant("AI coverage from the local paper", "", "https://techcrunch.com/x")
+        # A brand match in the link cannot swallow the start of an excluded domain
+        assert not is_ai_relevant("AI news", "", "https://genaibusiness.com/x")
+        assert not is_ai_relevant("AI news", "", "https://www.aibusiness.com/genai")
+
+    def test_batch_mask_matches_single_calls(self):
+        """ai_relevance_mask returns one flag per item, in order."""
+        from news_agent import ai_relevance_mask
+
+        items = [
+            {"title": "GPT update", "snippet": "", "link": "https://openai.com/x"},
+            {"title": "Weather", "snippet": "sunny", "link": "https://openai.com/y"},
+        ]
+        assert ai_relevance_mask(items) == [True, False]
+
+
+class TestNearDuplicates:
+    """Test MinHash near-duplicate story clustering."""
+
+    STORIES = [
+        {"title": "OpenAI launches GPT-5 with improved reasoning",
+         "snippet": "OpenAI released GPT-5 on Thursday, its newest model, with better reasoning and fewer hallucinations.",
+         "_source_priority": 230, "_source_domain": "venturebeat.com"},
+        {"title": "EU passes AI Act amendments", "snippet": "European lawmakers voted on new rules.",
+         "_source_priority": 100, "_source_domain": "theverge.com"},
+        {"title": "OpenAI releases GPT-5 with improved reasoning",
+         "snippet": "OpenAI on Thursday released GPT-5, its newest model, claiming better reasoning and fewer hallucinations.",
+         "_source_priority": 20, "_source_domain": "techcrunch.com"},
+        {"title": "OpenAI releases Sora 2 video model",
+         "snippet": "OpenAI on Thursday released Sora 2, a video generation model.",
+         "_source_priority": 20, "_source_domain": "wired.com"},
+    ]
+
+    def test_keeps_highest_tier_member(self):
+        """Rewrites of one story collapse onto the best-tier source."""
+        from news_agent import collapse_near_duplicates
+
+        kept = collapse_near_duplicates([dict(s) for s in self.STORIES])
+
+        assert [s["_source_domain"] for s in kept] == ["theverge.com", "techcrunch.com", "wired.com"]
+        assert kept[1]["_duplicate_sources"] == ["venturebeat.com"]
+
+    def test_index_rejects_duplicates_of_indexed_stories(self):
+        """add() returns the indexed story a new item duplicates."""
+        from news_agent import NearDuplicateIndex
+
+        index = NearDuplicateIndex()
+        assert index.add(self.STORIES[2]) is None
+        assert index.add(self.STORIES[0]) is self.STORIES[2]
+        assert index.add(self.STORIES[3]) is None
+
+    def test_search_node_drops_cross_category_duplicates(self):
+        """The same story found by two categories is only selected once."""
+        import news_agent
+
+        story = {"title": "Anthropic ships Claude model update for developers",
+                 "body": "The AI model update adds tool use and longer context for developers."}
+        fake = FakeDDGS({
+            news_agent.SEARCH_CATEGORIES[0]["query"]: [dict(story, url="https://techcrunch.com/a")],
+            news_agent.SEARCH_CATEGORIES[1]["query"]: [dict(story, url="https://venturebeat.com/b")],
+        })
+        with fake_ddgs(fake):
+            state = news_agent.search_news_node({"news_items": [], "generated_post": None,
+                                                 "issue_url": None, "error": None})
+
+        links = [item["link"] for item in state["news_items"]]
+        assert links == ["https://techcrunch.com/a"]
+
+
+class TestPublishedIndex:
+    """Test the cross-week index of already published stories."""
+
+    def test_matches_url_variants_and_reworded_titles(self):
+        """URLs match across scheme/www/query variants; titles match on their content words."""
+        from published_index import PublishedIndex
+
+        index = PublishedIndex.from_posts([{
+            "link": "#",
+            "sources": [{"title": "OpenAI releases GPT-5 to developers",
+                         "url": "https://www.techcrunch.com/2026/07/gpt-5/?utm_source=x"}],
+        }])
+
+        assert index.contains("http://techcrunch.com/2026/07/gpt-5")
+        assert index.contains("https://wired.com/other", "GPT-5 releases to developers, OpenAI")
+        assert not index.contains("https://techcrunch.com/2026/07/sora")
+        assert not index.contains("", "#")
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        """The index persists as hashes and falls back to rebuilding from posts."""
+        from published_index import PublishedIndex
+
+        posts = [{"link": "https://openai.com/blog/a", "sources": []}]
+        PublishedIndex.from_posts(posts).save(str(tmp_path / "index.json"))
+        assert PublishedIndex.load(str(tmp_path / "index.json")).contains("https://openai.com/blog/a")
+
+        posts_path = tmp_path / "posts.json"
+        posts_path.write_text(json.dumps(posts))
+        rebuilt = PublishedIndex.load(str(tmp_path / "missing.json"), posts_path=str(posts_path))
+        assert rebuilt.contains("https://openai.com/blog/a")
+
+        from_store = PublishedIndex.load(str(tmp_path / "missing.json"), posts_path=str(posts_path),
+                                         posts=lambda: [{"link": "https://openai.com/blog/b", "sources": []}])
+        assert from_store.contains("https://openai.com/blog/b")
+        assert not from_store.contains("https://openai.com/blog/a")
+
+    def test_search_skips_published_stories(self, monkeypatch):
+        """Already published candidates are dropped before scoring."""
+        import news_agent
+        from published_index import PublishedIndex
+
+        monkeypatch.setattr(news_agent, "published_index", PublishedIndex.from_posts(
+            [{"link": "#", "sources": [{"title": "", "url": "https://techcrunch.com/a"}]}]))
+        results = news_agent.qualify_results([
+            {"title": "AI model news", "snippet": "", "link": "https://techcrunch.com/a"},
+            {"title": "AI model news", "snippet": "", "link": "https://theverge.com/b"},
+        ], set())
+
+        assert [item["link"] for item in results] == ["https://theverge.com/b"]
+
+    def test_publish_updates_index(self, tmp_path, monkeypatch):
+        """update_blog_data records the new post's sources in the index."""
+        import publish_agent
+        from published_index import PublishedIndex
+
+        monkeypatch.setattr(publish_agent, "BLOG_DATA_DIR", str(tmp_path))
+        monkeypatch.setattr(publish_agent, "SITE_DATA_DIR", str(tmp_path / "site"))
+        monkeypatch.setattr(publish_agent, "BLOG_DATA_PATH", str(tmp_path / "posts.json"))
+        monkeypatch.setattr(publish_agent, "PUBLISHED_INDEX_PATH", str(tmp_path / "index.json"))
+        publish_agent.update_blog_data({"title": "Weekly", "sources": [
+            {"title": "Anthropic ships new Claude model", "url": "https://anthropic.com/news/claude"}]})
+
+        index = PublishedIndex.load(str(tmp_path / "index.json"))
+        assert index.contains("https://anthropic.com/news/claude")
+
+
+class TestRateLimiter:
+    """Test the shared token buckets, backoff and circuit breakers."""
+
+    def test_token_bucket_paces_bursts(self):
+        """Calls beyond the burst wait for tokens to refill."""
+        from rate_limit import TokenBucket
+
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0],
+                             sleep=lambda d: now.__setitem__(0, now[0] + d))
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(0.5)
+        assert now[0] == pytest.approx(1.0)
+
+    def test_groq_burst_covers_map_reduce_fan_out(self):
+        """Every map-reduce section and the assembly call start without waiting on the Groq bucket."""
+        import news_agent
+        import rate_limit
+        from rate_limit import HostRateLimiter
+
+        # news_agent sized the shared limiter's Groq burst from its own concurrency setting
+        limiter = HostRateLimiter(limits=rate_limit.outbound.limits,
+                                  sleep=lambda d: pytest.fail(f"throttled for {d:.2f}s"))
+        bucket = limiter.bucket("api.groq.com")
+        assert [bucket.acquire() for _ in range(news_agent.SUMMARY_MAP_CONCURRENCY + 1)] == \
+            [0.0] * (news_agent.SUMMARY_MAP_CONCURRENCY + 1)
+
+    def test_retries_with_backoff_then_succeeds(self):
+        """Retryable errors are retried and counted in the host stats."""
+        from rate_limit import HostRateLimiter
+
+        slept = []
+        limiter = HostRateLimiter(limits={}, default_limit=(1000.0, 1000), sleep=slept.append)
+        attempts = iter([TimeoutError("slow"), TimeoutError("slow"), "ok"])
+
+        def flaky():
+            result = next(attempts)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        assert limiter.call("example.com", flaky, retry_on=(TimeoutError,)) == "ok"
+        stats = limiter.stats["example.com"]
+        assert (stats["calls"], stats["failures"], stats["retries"]) == (3, 2, 2)
+        assert stats["backoff"] == pytest.approx(sum(slept))
+
+    def test_post_not_retried_on_server_error(self):
+        """A 500 on POST is returned as-is so issues are never created twice."""
+        from rate_limit import HostRateLimiter
+
+        limiter = HostRateLimiter(sleep=lambda d: None)
+        with patch('rate_limit.requests.request') as mock_request:
+            mock_request.return_value.status_code = 500
+            response = limiter.request("POST", "https://api.github.com/repos/x/y/issues")
+
+        assert response.status_code == 500
+        assert mock_request.call_count == 1
+
+    def test_open_news_circuit_switches_to_text(self):
+        """After N news failures the breaker opens and search goes straight to text."""
+        import news_agent
+
+        fake = FakeDDGS({"q": [{"title": "AI news", "body": "LLM", "url": "https://techcrunch.com/a"}]},
+                        failing=("q",))
+        with fake_ddgs(fake):
+            for i in range(news_agent.outbound.breaker("ddgs:news").threshold + 1):
+                news_agent.search_cache.clear()
+                results = news_agent.fetch_category_results({"name": "Cat", "query": "q"}, quota=1)
+                assert results[0]["link"] == "https://techcrunch.com/a"
+
+        news_calls = [c for c in fake.calls if c[0] == "news"]
+        assert len(news_calls) == news_agent.outbound.breaker("ddgs:news").threshold
+
+    def test_open_news_circuit_switches_broad_fallback_to_text(self, monkeypatch):
+        """The broad fallback query also moves to text results once the news breaker is open."""
+        import news_agent
+
+        fallback_query = 'artificial intelligence OR LLM OR GPT OR AI news this week'
+        stories = {"techcrunch.com": "OpenAI ships a cheaper reasoning model",
+                   "wired.com": "EU regulators finalize AI Act guidance",
+                   "theverge.com": "Google adds Gemini to Android messages",
+                   "arstechnica.com": "Researchers publish new LLM benchmark results",
+                   "engadget.com": "Nvidia unveils robotics training chips"}
+        domains = list(stories)
+        fake = FakeDDGS({fallback_query: [{"title": title, "body": f"{title} in this week's AI news",
+                                           "url": f"https://{d}/story"} for d, title in stories.items()]})
+        monkeypatch.setattr(news_agent, "SEARCH_CATEGORIES", [{"name": "Empty", "query": "nothing here"}])
+        breaker = news_agent.outbound.breaker("ddgs:news")
+        for _ in range(breaker.threshold):
+            breaker.record_failure()
+
+        with fake_ddgs(fake):
+            state = news_agent.search_news_node({"news_items": [], "generated_post": None,
+                                                 "issue_url": None, "error": None})
+
+        assert state["error"] is None
+        assert sorted(item["_source_domain"] for item in state["news_items"]) == sorted(domains)
+        assert not [c for c in fake.calls if c[0] == "news"]
+
+
 class TestSummarizeNode:
     """Test the summarize node functionality."""
     
@@ -102,6 +764,881 @@ class TestSummarizeNode:
         
         assert result["error"] == "No news items to summarize"
 
+    def test_identical_prompt_served_from_llm_cache(self, monkeypatch):
+        """A rerun with the same stories reuses the cached response instead of calling Groq."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        response = json.dumps({"title": "T", "summary": "S", "content": "## Weekly Overview\n\nText",
+                               "tags": ["AI"], "sources": []})
+        items = [{"title": "AI news", "snippet": "LLM", "link": "https://openai.com/a"}]
+
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.invoke.return_value.content = response
+            for _ in range(2):
+                state = news_agent.summarize_node({"news_items": [dict(i) for i in items], "generated_post": None,
+                                                   "issue_url": None, "error": None})
+                assert state["generated_post"]["title"] == "T"
+
+        assert mock_groq.return_value.invoke.call_count == 1
+        assert news_agent.llm_cache.stats["hits"] == 1
+
+    def test_unparseable_response_not_cached(self, monkeypatch):
+        """Only responses that parse are cached, so a bad generation is retried."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.invoke.return_value.content = "not json"
+            news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "", "link": "https://openai.com/a"}],
+                                       "generated_post": None, "issue_url": None, "error": None})
+
+        assert news_agent.llm_cache.stats["writes"] == 0
+
+
+class TestPromptBudget:
+    """Test token-budgeted prompt assembly."""
+
+    def test_repeated_boilerplate_is_stripped(self):
+        """Sentences shared by several snippets are dropped, unique ones kept."""
+        from prompt_budget import strip_repeated_boilerplate
+
+        snippets = ["OpenAI shipped a model. Subscribe to our newsletter.",
+                    "EU passed a law. Subscribe to our newsletter.",
+                    "Nvidia posted results [+1200 chars]"]
+        assert strip_repeated_boilerplate(snippets) == ["OpenAI shipped a model.", "EU passed a law.",
+                                                        "Nvidia posted results"]
+
+    def test_snippets_fit_budget_and_short_ones_are_kept(self):
+        """Long snippets are trimmed to the budget; short ones keep their full text."""
+        from prompt_budget import fit_snippets, count_tokens
+
+        short = "Short AI story."
+        long_snippets = ["word " * 400, "token " * 400]
+        fitted = fit_snippets([short] + long_snippets, 200)
+
+        assert fitted[0] == short
+        assert sum(count_tokens(s) for s in fitted) <= 200
+        assert all(s.endswith("…") for s in fitted[1:])
+
+    def test_counts_without_tiktoken_are_reported_as_estimates(self, monkeypatch):
+        """The chars/token fallback is flagged so printed numbers can say they are estimates."""
+        import prompt_budget
+
+        monkeypatch.setattr(prompt_budget, "_ENCODING_LOADED", True)
+        monkeypatch.setattr(prompt_budget, "_ENCODING", None)
+        assert prompt_budget.counts_are_estimates()
+        assert prompt_budget.count_tokens("x" * 10) == 3
+
+    def test_prompt_stays_within_budget_with_many_stories(self, monkeypatch):
+        """Twenty long stories still produce a prompt under PROMPT_TOKEN_BUDGET."""
+        import news_agent
+        from prompt_budget import count_tokens
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        items = [{"title": f"AI story {i}", "snippet": f"Story {i} detail. " * 200,
+                  "link": f"https://openai.com/{i}"} for i in range(20)]
+
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.invoke.return_value.content = "not json"
+            news_agent.summarize_node({"news_items": items, "generated_post": None,
+                                       "issue_url": None, "error": None})
+
+        prompt = mock_groq.return_value.invoke.call_args[0][0][0].content
+        assert count_tokens(prompt) <= news_agent.PROMPT_TOKEN_BUDGET
+        assert all(f"https://openai.com/{i}" in prompt for i in range(20))
+
+    def test_instructions_over_budget_are_reported(self, monkeypatch, capsys):
+        """A budget smaller than the instructions themselves is warned about, not silently exceeded."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "PROMPT_TOKEN_BUDGET", 100)
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.invoke.return_value.content = "not json"
+            news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "LLM " * 50,
+                                                       "link": "https://openai.com/a"}],
+                                       "generated_post": None, "issue_url": None, "error": None})
+
+        assert "Prompt is over budget" in capsys.readouterr().out
+
+
+class TestStreamingValidation:
+    """Test incremental validation of streamed completions."""
+
+    def _feed(self, chunks):
+        from stream_validator import IncrementalJSONValidator
+
+        validator = IncrementalJSONValidator()
+        for chunk in chunks:
+            validator.feed(chunk)
+        validator.close()
+        return validator
+
+    def test_accepts_valid_fenced_object(self):
+        """A complete object (optionally fenced) passes, however it is chunked."""
+        text = '```json\n{"title": "T", "summary": "S \\"quoted\\"", "content": "## A {b}", "tags": ["AI"]}\n```'
+        validator = self._feed([text[i:i + 3] for i in range(0, len(text), 3)])
+        assert {"title", "summary", "content", "tags"} <= validator.keys
+
+    @pytest.mark.parametrize("text", [
+        'Here is your digest: {"title": "T"}',
+        '{"title": null, "summary": "S", "content": "C"}',
+        '{"title": "", "summary": "S", "content": "C"}',
+        '{"title": "T", "summary": "S"}',
+        '{"title": "T", "summary": "S", "content": "C"] ',
+        '{"title": "T", "summary": "S", "content": "C"} and more',
+    ])
+    def test_rejects_malformed_output(self, text):
+        """Bad prefixes, null/empty/missing required keys and stray text are rejected."""
+        from stream_validator import MalformedStreamError
+
+        with pytest.raises(MalformedStreamError):
+            self._feed([text])
+
+    def test_streaming_aborts_early(self, monkeypatch):
+        """summarize_node stops reading the stream at the first bad chunk."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "LLM_STREAMING", True)
+        consumed = []
+
+        def fake_stream(messages):
+            for text in ["Sure! ", '{"title": "T"', ', "summary": "S"}']:
+                consumed.append(text)
+                yield MagicMock(content=text)
+
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.stream.side_effect = fake_stream
+            state = news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "", "link": "https://openai.com/a"}],
+                                               "generated_post": None, "issue_url": None, "error": None})
+
+        assert state["error"].startswith("Malformed LLM output")
+        assert consumed == ["Sure! "]
+
+    def test_malformed_streams_leave_groq_breaker_closed(self, monkeypatch):
+        """Malformed output is a validation failure, not a Groq outage, so the breaker stays closed."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "LLM_STREAMING", True)
+        breaker = news_agent.outbound.breaker("groq")
+
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.stream.side_effect = lambda messages: iter([MagicMock(content="Sure! ")])
+            for _ in range(breaker.threshold + 1):
+                state = news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "",
+                                                                   "link": "https://openai.com/a"}],
+                                                   "generated_post": None, "issue_url": None, "error": None})
+                assert state["error"].startswith("Malformed LLM output")
+
+        assert mock_groq.return_value.stream.call_count == breaker.threshold + 1
+        assert not breaker.is_open and breaker.failures == 0
+
+
+class TestCategoryClassifier:
+    """Test the weighted keyword story classifier."""
+
+    def test_specific_keywords_beat_generic_model_mentions(self):
+        """'model' alone no longer drags a research or policy story into Model Releases."""
+        from news_agent import category_classifier
+
+        labels = category_classifier.classify([
+            {"title": "New model paper on arXiv shows benchmark gains", "snippet": ""},
+            {"title": "EU lawmakers debate model regulation", "snippet": ""},
+            {"title": "OpenAI releases GPT-5", "snippet": "The model launches today."},
+            {"title": "Startup raises $200M at a $2B valuation", "snippet": ""},
+            {"title": "GitHub ships a new SDK for developers", "snippet": ""},
+            {"title": "Banks see quiet quarter", "snippet": ""},
+        ])
+        assert labels == ["Research", "Policy", "Model Releases", "Business", "Developer Tools", "Business"]
+
+    def test_scores_are_batched_per_category(self):
+        """scores() returns one row per item and one column per category."""
+        from news_agent import category_classifier
+
+        scores = category_classifier.scores([{"title": "arXiv paper"}, {"title": "API update"}, {"title": ""}])
+        assert scores.shape == (3, len(category_classifier.categories))
+        assert scores[0, category_classifier.categories.index("Research")] == 3.0
+        assert not scores[2].any()
+
+    def test_backfill_balances_categories(self):
+        """Backfill picks an uncovered category before better-ranked repeats."""
+        import news_agent
+
+        releases = [("openai.com", "OpenAI releases GPT-5"), ("anthropic.com", "Anthropic launches Claude Opus"),
+                    ("techcrunch.com", "Mistral unveils Large 3 weights"), ("theverge.com", "Google releases Gemini Ultra"),
+                    ("wired.com", "Meta launches Llama 5"), ("arstechnica.com", "xAI releases Grok 4")]
+        results = [{"title": title, "body": "New AI model launch.", "url": f"https://{domain}/{i}"}
+                   for i, (domain, title) in enumerate(releases)]
+        results.append({"title": "Senate passes AI regulation bill", "body": "AI policy news.",
+                        "url": "https://www.reuters.com/policy"})
+        fake = FakeDDGS({news_agent.SEARCH_CATEGORIES[0]["query"]: results})
+        with fake_ddgs(fake):
+            state = news_agent.search_news_node({"news_items": [], "generated_post": None,
+                                                 "issue_url": None, "error": None})
+
+        categories = [item["_category"] for item in state["news_items"]]
+        assert len(categories) == 5
+        assert categories.count("Policy") == 1
+
+
+class TestCandidateRanking:
+    """Test the combined authority/relevance/freshness/category ranking."""
+
+    NOW = 1_790_000_000.0  # fixed clock for freshness
+
+    @staticmethod
+    def _item(link, title, priority, category="AI Research & Breakthroughs", date=""):
+        return {"title": title, "snippet": "", "link": link, "date": date,
+                "_search_category": category, "_source_priority": priority}
+
+    def test_relevant_tier2_story_beats_marginal_tier1_post(self):
+        """Authority alone no longer decides: a strongly relevant story outranks a marginal one."""
+        from news_agent import rank_candidates
+
+        marginal = self._item("https://openai.com/blog/office", "OpenAI shares an office update", 0)
+        relevant = self._item("https://techcrunch.com/llm-paper",
+                              "New LLM benchmark paper: GPT and Claude models tested on an arxiv dataset", 120)
+        ranked = rank_candidates([marginal, relevant], now=self.NOW)
+
+        assert ranked[0] is relevant
+        assert relevant["_rank_score"] > marginal["_rank_score"]
+
+    def test_weights_are_configurable(self):
+        """With only the authority column weighted, the order is plain source quality."""
+        from news_agent import rank_candidates
+
+        items = [self._item(f"https://example.com/{p}", "AI model news", p) for p in (300, 20, 120)]
+        ranked = rank_candidates(items, weights={"authority": 1.0}, now=self.NOW)
+
+        assert [i["_source_priority"] for i in ranked] == [20, 120, 300]
+        with pytest.raises(ValueError):
+            rank_candidates(items, weights={"popularity": 1.0})
+
+    def test_weights_setting_is_validated(self):
+        """RANKING_WEIGHTS overrides the defaults, and a bad entry is reported by name."""
+        from news_agent import parse_ranking_weights
+
+        assert parse_ranking_weights(" authority = 1 , freshness=0")["authority"] == 1.0
+        assert parse_ranking_weights("")["relevance"] == 0.2
+        with pytest.raises(ValueError, match="RANKING_WEIGHTS.*'popularity'"):
+            parse_ranking_weights("popularity=1")
+        with pytest.raises(ValueError, match="RANKING_WEIGHTS.*'high'"):
+            parse_ranking_weights("authority=high")
+        with pytest.raises(ValueError, match="RANKING_WEIGHTS.*'authority'"):
+            parse_ranking_weights("authority")
+
+    def test_freshness_uses_the_search_date(self):
+        """Newer stories score higher; a missing date is neutral, not penalised to zero."""
+        import datetime
+        from news_agent import candidate_score_matrix
+
+        def days_ago(days):
+            when = datetime.datetime.fromtimestamp(self.NOW - days * 86400, tz=datetime.timezone.utc)
+            return when.isoformat()
+
+        items = [self._item("https://a.com", "AI", 20, date=days_ago(0)),
+                 self._item("https://b.com", "AI", 20, date=days_ago(3)),
+                 self._item("https://c.com", "AI", 20)]
+        freshness = candidate_score_matrix(items, now=self.NOW)[:, 2]
+
+        assert freshness[0] == pytest.approx(1.0)
+        assert freshness[1] == pytest.approx(0.5)
+        assert freshness[2] == pytest.approx(0.5)
+
+    def test_category_fit_follows_the_search_query(self):
+        """A story matching what its query looked for scores full category fit."""
+        from news_agent import candidate_score_matrix
+
+        policy = "EU lawmakers pass AI regulation"
+        items = [self._item("https://a.com", policy, 20, category="AI Policy & Safety"),
+                 self._item("https://b.com", policy, 20, category="AI Research & Breakthroughs"),
+                 self._item("https://c.com", policy, 20, category="Custom")]
+        fit = candidate_score_matrix(items, now=self.NOW)[:, 3]
+
+        assert fit[0] == pytest.approx(1.0)
+        assert fit[1] == 0.0
+        assert fit[2] == 0.5
+
+    def test_scales_to_thousands_of_candidates(self):
+        """Scoring stays batched, so thousands of candidates rank quickly."""
+        import time
+        from news_agent import rank_candidates
+
+        items = [self._item(f"https://example.com/{i}", f"AI model story {i} about LLM research", i % 400)
+                 for i in range(5000)]
+        started = time.perf_counter()
+        ranked = rank_candidates(items, now=self.NOW)
+
+        assert len(ranked) == 5000
+        assert time.perf_counter() - started < 5
+
+
+class TestMapReduceSummary:
+    """Test map-reduce digest generation."""
+
+    ITEMS = [{"title": f"AI story {i}", "snippet": f"Detail {i}", "link": f"https://openai.com/{i}"} for i in range(4)]
+
+    @staticmethod
+    def _fake_invoke(messages):
+        prompt = messages[0].content
+        if "Write ONE story section" in prompt:
+            title = prompt.split("] ", 1)[1].split(":", 1)[0]
+            if title == "AI story 2":
+                raise RuntimeError("section failed")
+            return MagicMock(content=f"## {title} headline\n\nWhat happened.\n\n**Why It Matters:** Specific.")
+        return MagicMock(content=json.dumps({"title": "Weekly", "summary": "S", "overview": "Theme.",
+                                             "looking_ahead": "Next.", "tags": ["AI"]}))
+
+    def test_map_reduce_produces_post_schema(self, monkeypatch, capsys):
+        """Sections are written per story and framed by one assembly call."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "SUMMARY_MODE", "map-reduce")
+        with patch('news_agent.ChatGroq') as mock_groq:
+            mock_groq.return_value.invoke.side_effect = self._fake_invoke
+            state = news_agent.summarize_node({"news_items": [dict(i) for i in self.ITEMS],
+                                               "generated_post": None, "issue_url": None, "error": None})
+
+        post = state["generated_post"]
+        assert state["error"] is None
+        assert {"title", "summary", "content", "tags", "sources"} <= set(post)
+        assert post["content"].startswith("## Weekly Overview")
+        assert "## Looking Ahead" in post["content"]
+        assert "AI story 2 headline" not in post["content"]
+        # Written stories come first; source validation may pad the list from news_items
+        assert [s["url"] for s in post["sources"]][:3] == ["https://openai.com/0", "https://openai.com/1",
+                                                           "https://openai.com/3"]
+        # 4 section calls + the failed one retried on the fallback model + 1 assembly call
+        assert mock_groq.return_value.invoke.call_count == 6
+        assert "completion (counted locally over all sections" in capsys.readouterr().out
+
+    def test_sections_run_in_parallel(self, monkeypatch):
+        """Wall-clock time is close to the slowest section, not the sum."""
+        import time
+        import news_agent
+
+        def slow_invoke(messages):
+            time.sleep(0.2)
+            return self._fake_invoke(messages) if "AI story 2" not in messages[0].content else MagicMock(content="## s")
+
+        monkeypatch.setattr(news_agent, "SUMMARY_MAP_CONCURRENCY", 4)
+        llm = MagicMock()
+        llm.invoke.side_effect = slow_invoke
+        started = time.perf_counter()
+        news_agent.map_reduce_summarize(llm, self.ITEMS, ["Research"] * 4, "past week")
+
+        assert time.perf_counter() - started < 0.6
+
+
+class TestPostLinter:
+    """Test the local quality gate and section-level regeneration."""
+
+    SOURCES = [{"title": f"S{i}", "url": f"https://openai.com/{i}"} for i in range(4)]
+    CONTENT = ("## Weekly Overview\n\nFour launches this week.\n\n"
+               "## GPT Update\n\nThe release remains to be seen in production.\n\n"
+               "## Claude Update\n\nLatency dropped 40%.")
+
+    @staticmethod
+    def _linter():
+        from news_agent import post_linter
+        return post_linter
+
+    def test_clean_post_passes(self):
+        """A post that follows every rule has no problems."""
+        post = {"content": self.CONTENT.replace("remains to be seen", "ships"), "sources": self.SOURCES}
+        report = self._linter().lint(post)
+
+        assert report["problems"] == []
+        assert [heading for heading, _ in report["sections"]] == ["Weekly Overview", "GPT Update", "Claude Update"]
+
+    def test_problems_point_at_offending_sections(self):
+        """Banned phrases are tied to their section; missing overview and sources are reported."""
+        content = self.CONTENT.replace("## Weekly Overview\n\nFour launches this week.\n\n", "")
+        report = self._linter().lint({"content": content, "sources": self.SOURCES[:2]})
+        rules = {(p["rule"], p["section"]) for p in report["problems"]}
+
+        assert rules == {("banned-phrase", "GPT Update"), ("missing-section", "Weekly Overview"),
+                         ("sources", None)}
+        banned = next(p for p in report["problems"] if p["rule"] == "banned-phrase")
+        assert report["sections"][banned["index"]][0] == "GPT Update"
+
+    def test_word_budget_flags_long_sections(self):
+        """Over the word budget, only sections above an even share are asked to shrink."""
+        long_section = "## Long Story\n\n" + "word " * 1300
+        post = {"content": self.CONTENT.replace("remains to be seen", "ships") + "\n\n" + long_section,
+                "sources": self.SOURCES}
+        report = self._linter().lint(post)
+
+        assert [(p["rule"], p["section"]) for p in report["problems"]] == [("word-budget", "Long Story")]
+
+    def test_only_offending_sections_are_regenerated(self, monkeypatch):
+        """The gate re-asks for the bad section and the missing overview, not the whole post."""
+        import news_agent
+
+        prompts = []
+
+        def fake_invoke(messages):
+            prompt = messages[0].content
+            prompts.append(prompt)
+            if "Weekly Overview" in prompt and "Write its" in prompt:
+                return MagicMock(content="## Weekly Overview\n\nTwo model updates.")
+            return MagicMock(content="## GPT Update\n\nThe release ships to all users next week.")
+
+        llm = MagicMock()
+        llm.invoke.side_effect = fake_invoke
+        content = self.CONTENT.replace("## Weekly Overview\n\nFour launches this week.\n\n", "")
+        post = news_agent.lint_and_regenerate(llm, {"content": content, "sources": self.SOURCES})
+
+        assert len(prompts) == 2
+        assert not any("Latency dropped" in p for p in prompts)
+        assert post["content"].startswith("## Weekly Overview\n\nTwo model updates.")
+        assert "ships to all users" in post["content"]
+        assert "Latency dropped 40%." in post["content"]
+        assert post["_lint"]["rounds"] == 1
+        assert post["_lint"]["problems"] == []
+
+    def test_regeneration_stops_after_configured_rounds(self, monkeypatch):
+        """A model that keeps breaking the rules is asked at most POST_REGEN_ROUNDS times."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "POST_REGEN_ROUNDS", 2)
+        llm = MagicMock()
+        llm.invoke.side_effect = lambda messages: MagicMock(
+            content=f"## GPT Update\n\nIt remains to be seen ({len(llm.invoke.call_args_list)}).")
+        post = news_agent.lint_and_regenerate(llm, {"content": self.CONTENT, "sources": self.SOURCES})
+
+        assert llm.invoke.call_count == 2
+        assert post["_lint"]["rounds"] == 2
+        assert post["_lint"]["problems"] == ['Section "GPT Update" uses the banned phrase "remains to be seen"']
+
+
+class TestStructuredOutput:
+    """Test schema-enforced output with tolerant repair."""
+
+    def test_repair_handles_common_llm_mistakes(self):
+        """Fences, raw newlines, invalid escapes, trailing commas and truncation are repaired."""
+        from post_schema import repair_json
+
+        text = "Sure!\n```json\n{\"title\": \"It\\'s out\", \"content\": \"## A\n\nB\", \"tags\": [\"AI\",],}\n```"
+        assert repair_json(text) == {"title": "It's out", "content": "## A\n\nB", "tags": ["AI"]}
+        assert repair_json('{"title": "T", "sources": [{"url": "https://x.com"') == \
+            {"title": "T", "sources": [{"url": "https://x.com"}]}
+        assert repair_json('{"title": "T", "summary":') == {"title": "T", "summary": None}
+
+    def test_recover_reports_truncation(self):
+        """Only output that had to be closed counts as truncated."""
+        from post_schema import recover_json
+
+        assert recover_json('{"title": "T"} trailing prose') == ({"title": "T"}, False)
+        assert recover_json('{"title": "T", "tags": ["AI"') == ({"title": "T", "tags": ["AI"]}, True)
+
+    def test_invalid_fields(self):
+        """Missing, empty and wrongly typed fields are reported in schema order."""
+        from post_schema import invalid_fields
+
+        post = {"title": "T", "summary": "", "content": "C", "tags": "AI", "sources": [{"url": "https://x.com"}]}
+        assert invalid_fields(post) == ["summary", "tags"]
+        assert invalid_fields(dict(post, summary="S", tags=["AI"])) == []
+
+    def test_only_invalid_fields_are_rerequested(self, monkeypatch):
+        """A post with bad fields is patched by a narrower follow-up call, not regenerated."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "LLM_STRUCTURED_OUTPUT", True)
+        first = {"parsed": None, "raw": MagicMock(tool_calls=[], invalid_tool_calls=[],
+                 content='{"title": "T", "summary": "S", "content": "## Weekly Overview\n\nX", "tags": []'),
+                 "parsing_error": "bad"}
+        second = {"parsed": {"tags": ["AI", "LLM"], "sources": [{"title": "A", "url": "https://openai.com/a"}],
+                             "title": "ignored"}, "raw": None, "parsing_error": None}
+
+        with patch('news_agent.ChatGroq') as mock_groq:
+            structured = mock_groq.return_value.with_structured_output
+            structured.return_value.invoke.side_effect = [first, second]
+            state = news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "", "link": "https://openai.com/a"}],
+                                               "generated_post": None, "issue_url": None, "error": None})
+
+        post = state["generated_post"]
+        assert post["title"] == "T" and post["tags"] == ["AI", "LLM"]
+        follow_up_schema = structured.call_args_list[1][0][0]
+        assert follow_up_schema["required"] == ["tags", "sources"]
+        assert structured.return_value.invoke.call_count == 2
+
+    def test_default_path_keeps_newlines(self):
+        """Raw newlines inside strings survive parsing instead of being flattened, even in valid-looking JSON."""
+        from news_agent import parse_llm_json
+
+        assert parse_llm_json('{"content": "## A\n\nB",}')["content"] == "## A\n\nB"
+        assert parse_llm_json('```json\n{"content": "## A\n\nB"}\n```') == {"content": "## A\n\nB"}
+
+    def test_truncated_output_is_flagged_and_not_cached(self, capsys):
+        """A cut-off response is recovered, logged, marked and kept out of the LLM cache."""
+        import news_agent
+
+        llm = MagicMock()
+        llm.invoke.return_value.content = '{"title": "T", "content": "## A'
+        data = news_agent.invoke_llm(llm, "truncation prompt", parse=news_agent.parse_llm_json)
+
+        assert data == {"title": "T", "content": "## A", "_truncated": True}
+        assert "truncated" in capsys.readouterr().out
+        assert news_agent.llm_cache.get(news_agent.LLM_MODEL, news_agent.LLM_TEMPERATURE, "truncation prompt") is None
+
+
+@pytest.fixture
+def openai_standin():
+    """Local OpenAI-compatible chat server; per-model delays, failures and 429s are configurable."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            import time
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            model = body["model"]
+            server.calls.append(model)
+            time.sleep(server.delays.get(model, 0))
+            if server.throttled.get(model):
+                server.throttled[model] -= 1
+                status, payload = 429, {"error": {"message": "rate limited", "type": "rate_limit_exceeded"}}
+            elif model in server.failing:
+                status, payload = 503, {"error": {"message": "overloaded", "type": "server_error"}}
+            elif body.get("stream"):
+                post = {"title": f"Digest from {model}", "summary": "S",
+                        "content": "## Weekly Overview\n\nText", "tags": ["AI"], "sources": []}
+                self._send_stream(model, json.dumps(post))
+                return
+            else:
+                post = {"title": f"Digest from {model}", "summary": "S",
+                        "content": "## Weekly Overview\n\nText", "tags": ["AI"], "sources": []}
+                status, payload = 200, {
+                    "id": "cmpl-1", "object": "chat.completion", "created": 0, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps(post)}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+                }
+            data = json.dumps(payload).encode()
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except OSError:
+                pass  # client gave up on this attempt
+
+        def _send_stream(self, model, content):
+            """Server-sent chat.completion.chunk events, a few characters of `content` each."""
+            import time
+            pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i, piece in enumerate(pieces + [""]):
+                    chunk = {"id": "cmpl-1", "object": "chat.completion.chunk", "created": 0, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": piece} if piece else {},
+                                          "finish_reason": None if piece else "stop"}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.delays, server.failing, server.throttled, server.calls = {}, set(), {}, []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestModelLadder:
+    """Test the model fallback ladder against a local OpenAI-compatible stand-in."""
+
+    @pytest.fixture(autouse=True)
+    def _ladder_config(self, monkeypatch, openai_standin):
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "GROQ_API_KEY", "test_key")
+        monkeypatch.setattr(news_agent, "LLM_BASE_URL", openai_standin.url)
+        monkeypatch.setattr(news_agent, "LLM_MODEL", "big-model")
+        monkeypatch.setattr(news_agent, "LLM_FALLBACK_MODELS", ["small-model"])
+        monkeypatch.setattr(news_agent, "LLM_ATTEMPT_TIMEOUT", 0.5)
+        monkeypatch.setattr(news_agent, "LLM_HEDGE_AFTER", None)
+
+    def _summarize(self):
+        import news_agent
+
+        return news_agent.summarize_node({"news_items": [{"title": "AI", "snippet": "", "link": "https://openai.com/a"}],
+                                          "generated_post": None, "issue_url": None, "error": None})
+
+    def test_primary_model_serves_when_healthy(self, openai_standin):
+        """The top model answers and is recorded on the post."""
+        state = self._summarize()
+
+        assert state["generated_post"]["_served_by"] == ["big-model"]
+        assert openai_standin.calls == ["big-model"]
+
+    def test_falls_back_after_latency_budget(self, openai_standin):
+        """A model that exceeds the per-attempt budget is abandoned for the next one."""
+        openai_standin.delays["big-model"] = 2.0
+        state = self._summarize()
+
+        assert state["generated_post"]["title"] == "Digest from small-model"
+        assert state["generated_post"]["_served_by"] == ["small-model"]
+
+    def test_falls_back_on_server_error(self, openai_standin):
+        """A failing model falls through to the next rung."""
+        openai_standin.failing.add("big-model")
+        state = self._summarize()
+
+        assert state["generated_post"]["_served_by"] == ["small-model"]
+
+    def test_rate_limited_primary_is_retried_with_backoff(self, openai_standin, monkeypatch):
+        """A 429 from the primary is retried through the shared limiter instead of falling back."""
+        import news_agent
+        from rate_limit import HostRateLimiter
+
+        limiter = HostRateLimiter(limits={}, default_limit=(1000.0, 1000), backoff_base=0.01)
+        slept = []
+        monkeypatch.setattr(limiter, "_sleep", slept.append)
+        monkeypatch.setattr(news_agent, "outbound", limiter)
+        openai_standin.throttled["big-model"] = 1
+        state = self._summarize()
+
+        assert state["generated_post"]["_served_by"] == ["big-model"]
+        assert openai_standin.calls == ["big-model", "big-model"]
+        assert limiter.stats["api.groq.com"]["retries"] == 1
+        assert len(slept) == 1
+
+    def test_hedged_request_takes_first_answer(self, openai_standin, monkeypatch):
+        """With hedging, a slow primary is raced by the next model and the faster answer wins."""
+        import time
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "LLM_ATTEMPT_TIMEOUT", 5.0)
+        monkeypatch.setattr(news_agent, "LLM_HEDGE_AFTER", 0.2)
+        openai_standin.delays["big-model"] = 1.5
+        started = time.perf_counter()
+        state = self._summarize()
+
+        assert time.perf_counter() - started < 1.2
+        assert state["generated_post"]["_served_by"] == ["small-model"]
+        assert openai_standin.calls == ["big-model", "small-model"]
+
+    def test_overrunning_attempt_does_not_block_the_fallback(self):
+        """A slow client that never times itself out keeps its thread; the next model still gets its full budget."""
+        import threading
+        from model_ladder import ModelLadder
+
+        release = threading.Event()
+        clients = {"slow": MagicMock(), "fast": MagicMock()}
+        clients["slow"].invoke.side_effect = lambda messages: release.wait(5) and "late"
+        clients["fast"].invoke.return_value = "fast answer"
+        ladder = ModelLadder(["slow", "fast"], clients.__getitem__, attempt_timeout=0.5)
+        try:
+            assert ladder.invoke([]) == "fast answer"
+            assert ladder.last_model == "fast"
+        finally:
+            release.set()
+
+    def test_fallback_answers_are_not_cached_as_primary(self, openai_standin):
+        """Only the primary model's answers are cached under its name; cache hits still report who served."""
+        openai_standin.failing.add("big-model")
+        assert self._summarize()["generated_post"]["_served_by"] == ["small-model"]
+
+        openai_standin.failing.discard("big-model")
+        state = self._summarize()
+        assert state["generated_post"]["_served_by"] == ["big-model"]
+        assert openai_standin.calls[-1] == "big-model"
+
+        calls = len(openai_standin.calls)
+        assert self._summarize()["generated_post"]["_served_by"] == ["big-model"]
+        assert len(openai_standin.calls) == calls
+
+    def test_streamed_post_records_served_by(self, openai_standin, monkeypatch):
+        """A streamed answer is recorded like a ladder call, so the post carries _served_by."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "LLM_STREAMING", True)
+        state = self._summarize()
+
+        assert state["generated_post"]["title"] == "Digest from big-model"
+        assert state["generated_post"]["_served_by"] == ["big-model"]
+        assert openai_standin.calls == ["big-model"]
+
+    def test_failed_stream_falls_back_to_ladder(self, openai_standin, monkeypatch):
+        """A stream that fails at the transport level is answered through the ladder instead."""
+        import news_agent
+
+        monkeypatch.setattr(news_agent, "LLM_STREAMING", True)
+        openai_standin.failing.add("big-model")
+        state = self._summarize()
+
+        assert state["generated_post"]["_served_by"] == ["small-model"]
+
+    def test_stream_over_budget_raises_timeout(self):
+        """The ladder's latency budget covers the whole stream, not just the first token."""
+        import time
+        from model_ladder import ModelLadder
+
+        def slow_stream(messages):
+            for text in ["{", '"title": "T"', "}"]:
+                time.sleep(0.2)
+                yield MagicMock(content=text)
+
+        client = MagicMock()
+        client.stream.side_effect = slow_stream
+        ladder = ModelLadder(["a", "b"], lambda model: client, attempt_timeout=0.3)
+        with pytest.raises(TimeoutError):
+            list(ladder.stream([]))
+        assert ladder.served == []
+
+        ladder.attempt_timeout = 5
+        assert len(list(ladder.stream([]))) == 3
+        assert [model for model, _ in ladder.served] == ["a"]
+
+    def test_hedge_delay_uses_recorded_p95(self):
+        """Once enough latencies are recorded, the hedge fires at their p95."""
+        from model_ladder import ModelLadder
+
+        ladder = ModelLadder(["a", "b"], MagicMock, hedge_after=30.0,
+                             latencies={"a": [1.0, 1.2, 1.1, 0.9, 4.0, 1.0]})
+        assert ladder.hedge_delay("a") == 4.0
+        assert ladder.hedge_delay("b") == 30.0
+
+
+class TestMarkdownNormalizer:
+    """Test the shared markdown normalizer."""
+
+    def test_run_on_markdown_is_split_into_blocks(self):
+        """Headings, labels and run-on bullets end up on their own lines."""
+        from markdown_normalizer import normalize_markdown
+
+        raw = ("Intro. ## Big Launch  It shipped.\n"
+               "**Key Takeaways**: - 40% faster - Open weights  **Why It Matters:** Cheaper inference.\n\n\n"
+               "---\n### Next Story\nBody")
+        assert normalize_markdown(raw) == (
+            "Intro.\n\n## Big Launch\n\nIt shipped.\n\n**Key Takeaways:**\n\n- 40% faster\n- Open weights\n\n"
+            "**Why It Matters:**\n\nCheaper inference.\n\n## Next Story\n\nBody")
+
+    def test_prose_dashes_and_code_blocks_are_left_alone(self):
+        """Only bullet lines are split on " - "; fenced code passes through verbatim."""
+        from markdown_normalizer import normalize_markdown
+
+        prose = "The model - released Monday - is open."
+        code = "```\n## not a heading  x\n\n\n```"
+        assert normalize_markdown(prose) == prose
+        assert normalize_markdown(code) == code
+
+    def test_agent_and_repair_script_agree_on_the_archive(self):
+        """format_newsletter_content is the shared normalizer, and it is idempotent on every post."""
+        import archive_formatter
+        from news_agent import format_newsletter_content, BLOG_POSTS_PATH
+        from markdown_normalizer import normalize_markdown
+
+        with open(BLOG_POSTS_PATH) as f:
+            posts = json.load(f)
+        script = open(os.path.join(os.path.dirname(BLOG_POSTS_PATH), "..", "..", "fix_json_formatting.py")).read()
+
+        assert "from archive_formatter import" in script
+        assert archive_formatter.normalize_markdown is normalize_markdown
+        for post in posts:
+            once = format_newsletter_content(post["content"])
+            assert once == normalize_markdown(post["content"])
+            assert normalize_markdown(once) == once
+
+    def test_time_is_linear_on_pathological_input(self):
+        """A long single line full of markers would be quadratic for lazy DOTALL regexes."""
+        import time
+        from markdown_normalizer import normalize_markdown
+
+        line = "word - **Key Takeaways**: - x - y ## H  " * 20000
+        started = time.perf_counter()
+        normalize_markdown(line)
+        assert time.perf_counter() - started < 2
+
+
+class TestArchiveFormatter:
+    """Test incremental archive reformatting."""
+
+    RAW = "Intro. ## Story  Body\n**Key Takeaways:** - a - b"
+
+    @staticmethod
+    def _archive(tmp_path, contents):
+        posts_path = tmp_path / "blogPosts.json"
+        posts_path.write_text(json.dumps([{"id": i + 1, "content": c} for i, c in enumerate(contents)], indent=2))
+        return str(posts_path), str(tmp_path / "manifest.json")
+
+    def test_second_run_reprocesses_and_writes_nothing(self, tmp_path):
+        """Once normalized, an unchanged archive is neither reprocessed nor rewritten."""
+        from archive_formatter import reformat_archive
+
+        posts_path, manifest_path = self._archive(tmp_path, [self.RAW, "Already fine."])
+        first = reformat_archive(posts_path, manifest_path)
+        mtime = os.stat(posts_path).st_mtime_ns
+        second = reformat_archive(posts_path, manifest_path)
+
+        assert (first["stale"], first["changed"], first["written"]) == (2, 1, True)
+        assert (second["stale"], second["changed"], second["written"]) == (0, 0, False)
+        assert os.stat(posts_path).st_mtime_ns == mtime
+        assert json.load(open(posts_path))[0]["content"].startswith("Intro.\n\n## Story")
+
+    def test_only_edited_posts_are_reprocessed(self, tmp_path):
+        """Editing one post makes only that post stale."""
+        from archive_formatter import reformat_archive
+
+        posts_path, manifest_path = self._archive(tmp_path, ["One.", "Two.", "Three."])
+        reformat_archive(posts_path, manifest_path)
+        posts = json.load(open(posts_path))
+        posts[1]["content"] = self.RAW
+        open(posts_path, "w").write(json.dumps(posts, indent=2))
+
+        stats = reformat_archive(posts_path, manifest_path)
+        assert (stats["stale"], stats["changed"]) == (1, 1)
+
+    def test_formatter_version_bump_reprocesses_everything(self, tmp_path, monkeypatch):
+        """A manifest written by another formatter version is ignored."""
+        import archive_formatter
+
+        posts_path, manifest_path = self._archive(tmp_path, ["One.", "Two."])
+        archive_formatter.reformat_archive(posts_path, manifest_path)
+        monkeypatch.setattr(archive_formatter, "FORMATTER_VERSION", archive_formatter.FORMATTER_VERSION + 1)
+
+        stats = archive_formatter.reformat_archive(posts_path, manifest_path)
+        assert (stats["stale"], stats["written"]) == (2, False)
+
+    def test_store_rewrites_only_changed_post_files(self, tmp_path):
+        """In the per-post store only the files of reformatted posts are written."""
+        from archive_formatter import reformat_store
+        from post_store import PostStore
+
+        posts_path, manifest_path = self._archive(tmp_path, ["Clean.", self.RAW])
+        store = PostStore.migrate(posts_path, str(tmp_path))
+        clean_mtime = os.stat(store.post_path(1)).st_mtime_ns
+
+        stats = reformat_store(store, manifest_path)
+        assert (stats["changed"], stats["written"]) == (1, True)
+        assert os.stat(store.post_path(1)).st_mtime_ns == clean_mtime
+        assert stats["changed_ids"] == [2]
+        assert store.get_post(2)["content"].startswith("Intro.\n\n## Story")
+
+    def test_process_pool_matches_serial(self):
+        """Large batches fan out to a process pool with identical results."""
+        from archive_formatter import normalize_contents
+
+        contents = [f"{self.RAW} {i}" for i in range(40)]
+        assert normalize_contents(contents, workers=2, parallel_threshold=1) == normalize_contents(contents, workers=1)
+
 
 class TestGraphBuild:
     """Test the LangGraph workflow construction."""
@@ -163,41 +1700,35 @@ class TestAgentState:
 
 
 class TestBlogPostsJSON:
-    """Test the blog posts data file."""
-    
+    """Test the published blog data (postIndex.json and posts/, which replaced blogPosts.json)."""
+
+    DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "src", "data")
+
     def test_blog_posts_file_exists(self):
-        """Test 12: blogPosts.json exists."""
-        blog_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "src", "data", "blogPosts.json"
-        )
-        assert os.path.exists(blog_path), f"blogPosts.json not found at {blog_path}"
-    
+        """Test 12: postIndex.json and the posts/ directory exist."""
+        index_path = os.path.join(self.DATA_DIR, "postIndex.json")
+        assert os.path.exists(index_path), f"postIndex.json not found at {index_path}"
+        assert os.path.isdir(os.path.join(self.DATA_DIR, "posts"))
+
     def test_blog_posts_valid_json(self):
-        """Test 13: blogPosts.json contains valid JSON."""
-        blog_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "src", "data", "blogPosts.json"
-        )
-        with open(blog_path, 'r') as f:
+        """Test 13: postIndex.json contains valid JSON with a list of posts."""
+        with open(os.path.join(self.DATA_DIR, "postIndex.json"), 'r') as f:
             data = json.load(f)
-        
-        assert isinstance(data, list)
-    
+
+        assert isinstance(data["posts"], list)
+        assert data["next_id"] > max(entry["id"] for entry in data["posts"])
+
     def test_blog_posts_have_required_fields(self):
-        """Test 14: Each blog post has required fields."""
-        blog_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "src", "data", "blogPosts.json"
-        )
-        with open(blog_path, 'r') as f:
-            posts = json.load(f)
-        
+        """Test 14: Every indexed post has a post file with the required fields."""
+        from post_store import PostStore
+
+        store = PostStore(self.DATA_DIR)
         required_fields = ["id", "title", "date", "summary", "tags"]
-        
-        for post in posts:
+
+        for entry in store.index["posts"]:
+            post = store.get_post(entry["id"])
             for field in required_fields:
-                assert field in post, f"Post missing required field: {field}"
+                assert field in post, f"Post {entry['id']} missing required field: {field}"
 
 
 class TestPublishAgent:
@@ -209,6 +1740,282 @@ class TestPublishAgent:
         assert hasattr(publish_agent, 'update_blog_data')
         assert hasattr(publish_agent, 'extract_post_data')
 
+    @staticmethod
+    def _legacy_archive(tmp_path, count):
+        posts = [{"id": i, "title": f"Post {i}", "date": "2026-01-01", "summary": "S", "content": "C",
+                  "tags": ["AI"], "sources": [], "link": "#"} for i in range(count, 0, -1)]
+        (tmp_path / "blogPosts.json").write_text(json.dumps(posts, indent=2))
+        return posts
+
+    @pytest.fixture
+    def data_dir(self, tmp_path, monkeypatch):
+        import publish_agent
+
+        monkeypatch.setattr(publish_agent, "BLOG_DATA_DIR", str(tmp_path))
+        monkeypatch.setattr(publish_agent, "SITE_DATA_DIR", str(tmp_path / "site"))
+        monkeypatch.setattr(publish_agent, "BLOG_DATA_PATH", str(tmp_path / "blogPosts.json"))
+        monkeypatch.setattr(publish_agent, "PUBLISHED_INDEX_PATH", str(tmp_path / "publishedIndex.json"))
+        return tmp_path
+
+    def test_migration_and_export_round_trip(self, tmp_path):
+        """Migrating blogPosts.json into shards and exporting it back is lossless and byte-identical."""
+        from post_store import PostStore
+
+        self._legacy_archive(tmp_path, 3)
+        original = (tmp_path / "blogPosts.json").read_text()
+        store = PostStore.migrate(str(tmp_path / "blogPosts.json"), str(tmp_path))
+        store.export(str(tmp_path / "blogPosts.json"))
+
+        assert (tmp_path / "blogPosts.json").read_text() == original
+        assert store.index["next_id"] == 4
+        assert set(store.index["posts"][0]) == {"id", "date", "title", "tags", "summary"}
+
+    def test_failed_atomic_write_leaves_the_old_file(self, tmp_path, monkeypatch):
+        """A write that fails before the rename keeps the previous file and leaves no temp file behind."""
+        import atomic_files
+
+        target = tmp_path / "data.json"
+        atomic_files.write_json_atomic(str(target), {"ok": True})
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+        monkeypatch.setattr(atomic_files.os, "replace", failing_replace)
+        with pytest.raises(OSError):
+            atomic_files.write_json_atomic(str(target), {"ok": False})
+
+        assert json.loads(target.read_text()) == {"ok": True}
+        assert [p.name for p in tmp_path.iterdir()] == ["data.json"]
+
+    def test_publish_touches_only_the_new_post_and_index(self, data_dir, monkeypatch):
+        """A publish writes the new post file and the index; existing post files stay untouched."""
+        import publish_agent
+        from post_store import PostStore
+
+        monkeypatch.setattr(publish_agent, "BLOG_COMPAT_EXPORT", False)
+        self._legacy_archive(data_dir, 3)
+        PostStore.migrate(str(data_dir / "blogPosts.json"), str(data_dir))
+        before = {p.name: p.stat().st_mtime_ns for p in (data_dir / "posts").iterdir()}
+
+        entry = publish_agent.update_blog_data({"title": "New", "content": "Body",
+                                                "sources": [{"title": "A", "url": "https://a.com/x"}]})
+
+        after = {p.name: p.stat().st_mtime_ns for p in (data_dir / "posts").iterdir()}
+        assert entry["id"] == 4
+        assert set(after) - set(before) == {"4.json"}
+        assert all(after[name] == mtime for name, mtime in before.items())
+        index = json.loads((data_dir / "postIndex.json").read_text())
+        assert index["next_id"] == 5 and index["posts"][0]["title"] == "New"
+
+    def test_first_publish_migrates_without_rewriting_blogposts(self, data_dir):
+        """Without a store yet, publishing migrates the legacy file; by default it is not re-exported."""
+        import publish_agent
+
+        self._legacy_archive(data_dir, 2)
+        legacy = (data_dir / "blogPosts.json").read_text()
+        entry = publish_agent.update_blog_data({"title": "New", "content": "Body"})
+
+        assert (data_dir / "blogPosts.json").read_text() == legacy
+        assert json.loads((data_dir / "posts" / "3.json").read_text()) == entry
+
+    def test_compat_export_refreshes_blogposts(self, data_dir, monkeypatch):
+        """With BLOG_COMPAT_EXPORT on, publishing re-exports the whole archive to blogPosts.json."""
+        import publish_agent
+
+        monkeypatch.setattr(publish_agent, "BLOG_COMPAT_EXPORT", True)
+        self._legacy_archive(data_dir, 2)
+        entry = publish_agent.update_blog_data({"title": "New", "content": "Body"})
+
+        exported = json.loads((data_dir / "blogPosts.json").read_text())
+        assert [p["id"] for p in exported] == [3, 2, 1]
+        assert exported[0] == entry
+        assert (data_dir / "posts" / "3.json").exists()
+
+    @staticmethod
+    def _approved_issues(numbers):
+        return [{"number": n, "title": f"Digest {n}",
+                 "body": f'```json\n{{"title": "Issue {n}", "content": "Body"}}\n```'} for n in numbers]
+
+    def test_bulk_publish_writes_the_index_once_and_records_issues(self, data_dir, monkeypatch):
+        """All approved issues are published in one batch, in issue order, with their numbers in the index."""
+        import publish_agent
+        from post_store import PostStore
+
+        self._legacy_archive(data_dir, 2)
+        PostStore.migrate(str(data_dir / "blogPosts.json"), str(data_dir))
+        monkeypatch.setattr(publish_agent, "list_approved_issues", lambda: self._approved_issues((7, 9, 12)))
+        index_writes = []
+        save_index = PostStore.save_index
+        monkeypatch.setattr(PostStore, "save_index", lambda store: index_writes.append(1) or save_index(store))
+
+        entries = publish_agent.bulk_publish()
+
+        assert len(index_writes) == 1
+        assert [(e["issue"], e["title"]) for e in entries] == [(7, "Issue 7"), (9, "Issue 9"), (12, "Issue 12")]
+        index = json.loads((data_dir / "postIndex.json").read_text())
+        assert [p["id"] for p in index["posts"]] == [5, 4, 3, 2, 1]
+        assert index["issues"] == {"7": 3, "9": 4, "12": 5}
+        assert not (data_dir / ".publish.lock").exists()
+
+    def test_issues_left_open_are_not_published_twice(self, data_dir, monkeypatch):
+        """An issue whose post is already stored (e.g. closing it failed) is skipped by the next run."""
+        import publish_agent
+
+        monkeypatch.setattr(publish_agent, "list_approved_issues", lambda: self._approved_issues((7,)))
+        assert [e["id"] for e in publish_agent.bulk_publish()] == [1]
+
+        monkeypatch.setattr(publish_agent, "list_approved_issues", lambda: self._approved_issues((7, 8)))
+        assert [(e["id"], e["issue"]) for e in publish_agent.bulk_publish()] == [(2, 8)]
+        assert publish_agent.bulk_publish() == []
+        assert publish_agent.update_blog_data({"title": "Again", "issue": 7})["id"] == 1
+        assert json.loads((data_dir / "postIndex.json").read_text())["next_id"] == 3
+
+    def test_close_published_closes_stored_issues_and_reports_failures(self, data_dir, monkeypatch):
+        """Only issues with a stored post are closed; a failure is raised after trying the rest."""
+        import publish_agent
+
+        monkeypatch.setattr(publish_agent, "list_approved_issues", lambda: self._approved_issues((1, 2)))
+        publish_agent.bulk_publish()
+        monkeypatch.setattr(publish_agent, "list_pending_issues", lambda: self._approved_issues((1, 2, 3)))
+        closed = []
+
+        def close(number, title):
+            if number == "1":
+                raise Exception("Failed to close issue #1: 403")
+            closed.append((number, title))
+        monkeypatch.setattr(publish_agent, "close_issue_with_success", close)
+
+        with pytest.raises(Exception, match="#1"):
+            publish_agent.close_published()
+        assert closed == [("2", "Issue 2")]
+
+    def test_close_issue_checks_github_responses(self, monkeypatch):
+        """A refused close raises instead of counting as closed; an already removed label is fine."""
+        import publish_agent
+
+        monkeypatch.setattr(publish_agent, "GITHUB_TOKEN", "token")
+        statuses = {"PATCH": 403, "DELETE": 404, "POST": 201}
+        calls = []
+
+        def request(method, url, **kwargs):
+            calls.append(method)
+            return MagicMock(status_code=statuses[method])
+        monkeypatch.setattr(publish_agent.outbound, "request", request)
+
+        with pytest.raises(Exception, match="403"):
+            publish_agent.close_issue_with_success("5", "Title")
+        assert calls == ["PATCH"]
+
+        statuses["PATCH"] = 200
+        publish_agent.close_issue_with_success("5", "Title")
+        assert calls[1:] == ["PATCH", "DELETE", "POST"]
+
+    def test_approval_requires_write_access(self):
+        """Only APPROVE comments from owners, members or collaborators count."""
+        from publish_agent import is_approval
+
+        assert is_approval({"body": "Approve!", "author_association": "OWNER"})
+        assert not is_approval({"body": "APPROVE", "author_association": "NONE"})
+        assert not is_approval({"body": "Looks good", "author_association": "MEMBER"})
+
+    def test_approval_needs_a_leading_approve(self):
+        """Rejections that merely contain "approve" are not approvals."""
+        from publish_agent import is_approval
+
+        assert is_approval({"body": "  approve - looks good", "author_association": "MEMBER"})
+        for body in ("disapprove", "I don't approve this", "not approved yet", "approved"):
+            assert not is_approval({"body": body, "author_association": "OWNER"}), body
+
+    def test_store_lock_is_exclusive(self, tmp_path, monkeypatch):
+        """A held lock makes other publishers time out; a stale one is broken."""
+        import post_store
+        from post_store import PostStore
+
+        store = PostStore(str(tmp_path))
+        with store.lock():
+            with pytest.raises(TimeoutError):
+                with PostStore(str(tmp_path)).lock(timeout=0.2):
+                    pass
+
+        (tmp_path / ".publish.lock").write_text("12345")
+        monkeypatch.setattr(post_store, "LOCK_STALE_SECONDS", -1)
+        with store.lock(timeout=0):
+            assert (tmp_path / ".publish.lock").read_text() == str(os.getpid())
+        assert not (tmp_path / ".publish.lock").exists()
+
+
+class TestSiteManifest:
+    """Test the paginated site data the blog fetches on demand."""
+
+    @staticmethod
+    def _store(tmp_path, count):
+        from post_store import PostStore
+
+        posts = [{"id": i, "title": f"Post {i}", "date": "2026-01-01", "summary": "S", "content": f"Body {i}",
+                  "tags": ["AI"], "sources": [], "link": "#"} for i in range(count, 0, -1)]
+        (tmp_path / "blogPosts.json").write_text(json.dumps(posts))
+        return PostStore.migrate(str(tmp_path / "blogPosts.json"), str(tmp_path / "data"))
+
+    def test_pages_are_numbered_from_the_oldest_posts(self, tmp_path):
+        """Page 1 holds the oldest posts; the newest are on the last, possibly partial, page."""
+        from site_manifest import build_site
+
+        site = tmp_path / "site"
+        build_site(self._store(tmp_path, 5), str(site), page_size=2)
+
+        manifest = json.loads((site / "manifest.json").read_text())
+        pages = {n: [p["id"] for p in json.loads((site / "pages" / f"{n}.json").read_text())["posts"]]
+                 for n in (1, 2, 3)}
+        assert (manifest["total"], manifest["pages"]) == (5, 3)
+        assert pages == {1: [2, 1], 2: [4, 3], 3: [5]}
+        assert "content" not in json.loads((site / "pages" / "1.json").read_text())["posts"][0]
+        assert json.loads((site / "posts" / "5.json").read_text())["content"] == "Body 5"
+
+    def test_adding_a_post_writes_three_files(self, tmp_path):
+        """A new post touches its chunk, one page and the manifest, starting a page when the last is full."""
+        from site_manifest import add_post_to_site, build_site
+
+        site = tmp_path / "site"
+        store = self._store(tmp_path, 3)
+        build_site(store, str(site), page_size=2)
+        page_one = (site / "pages" / "1.json").stat().st_mtime_ns
+
+        fourth = store.add_post({"title": "Post 4", "content": "Body 4"})
+        assert len(add_post_to_site(fourth, store, str(site), page_size=2)) == 3
+        fifth = store.add_post({"title": "Post 5", "content": "Body 5"})
+        written = add_post_to_site(fifth, store, str(site), page_size=2)
+
+        assert sorted(os.path.relpath(p, site) for p in written) == [
+            "manifest.json", os.path.join("pages", "3.json"), os.path.join("posts", "5.json")]
+        assert (site / "pages" / "1.json").stat().st_mtime_ns == page_one
+        assert [p["id"] for p in json.loads((site / "pages" / "2.json").read_text())["posts"]] == [4, 3]
+        assert json.loads((site / "manifest.json").read_text())["pages"] == 3
+
+    def test_batch_matches_full_build(self, tmp_path):
+        """Adding a batch across page boundaries gives the same pages as rebuilding from scratch."""
+        from site_manifest import add_posts_to_site, build_site
+
+        store = self._store(tmp_path, 3)
+        build_site(store, str(tmp_path / "site"), page_size=2)
+        batch = store.add_posts([{"title": f"Post {i}", "content": f"Body {i}"} for i in (4, 5, 6)])
+        written = add_posts_to_site(batch, store, str(tmp_path / "site"), page_size=2)
+        build_site(store, str(tmp_path / "fresh"), page_size=2)
+
+        assert len(written) == 3 + 2 + 1
+        for name in ("manifest.json", "pages/1.json", "pages/2.json", "pages/3.json"):
+            assert (tmp_path / "site" / name).read_text() == (tmp_path / "fresh" / name).read_text()
+
+    def test_stale_manifest_falls_back_to_full_build(self, tmp_path):
+        """A manifest that does not match the store is rebuilt rather than patched."""
+        from site_manifest import add_post_to_site
+
+        site = tmp_path / "site"
+        store = self._store(tmp_path, 2)
+        post = store.add_post({"title": "Post 3", "content": "Body 3"})
+
+        add_post_to_site(post, store, str(site), page_size=2)
+        assert json.loads((site / "manifest.json").read_text())["total"] == 3
+        assert (site / "posts" / "1.json").exists()
+
 
 class TestEdgeCases:
     """Test edge cases and error handling."""
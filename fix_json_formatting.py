@@ -1,51 +1,68 @@
-import json
-import re
+"""
+Normalize the markdown of every published post.
 
+Works on the per-post store (src/data/posts/ + postIndex.json) when it
+exists, refreshing the site's post chunks (public/data/blog/posts/)
+afterwards, plus the blogPosts.json export when BLOG_COMPAT_EXPORT is set,
+and on the single-file src/data/blogPosts.json otherwise.
+
+Incremental: only posts that are new, edited, or formatted by an older
+normalizer version are reprocessed (tracked in a content-hash manifest),
+and files are only rewritten when something changed.
+
+Run with: python fix_json_formatting.py [--full] [--workers N]
+"""
+
+import os
+import sys
+import argparse
+
+AGENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent")
+sys.path.insert(0, AGENT_DIR)
+
+# Same normalizer the agent applies to new posts (news_agent.format_newsletter_content)
+from archive_formatter import PARALLEL_THRESHOLD, reformat_archive, reformat_store
+from post_store import PostStore
+from publish_agent import BLOG_COMPAT_EXPORT
+from site_manifest import write_post_chunk
+
+data_dir = 'src/data'
 file_path = 'src/data/blogPosts.json'
+site_dir = 'public/data/blog'
+manifest_path = os.path.join(os.getenv("AGENT_CACHE_DIR", os.path.join(AGENT_DIR, ".cache")), "format-manifest.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize markdown in the published posts")
+    parser.add_argument("--full", action="store_true", help="Reprocess every post, ignoring the manifest")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--parallel-threshold", type=int, default=PARALLEL_THRESHOLD,
+                        help="Use the process pool from this many stale posts")
+    args = parser.parse_args()
+    options = dict(full=args.full, workers=args.workers, parallel_threshold=args.parallel_threshold)
+
+    store = PostStore(data_dir)
+    if store.exists():
+        target = "post files"
+        stats = reformat_store(store, manifest_path, **options)
+        if stats["written"]:
+            # Page entries hold no content, so only the changed posts' chunks go stale
+            if os.path.isdir(site_dir):
+                for post_id in stats["changed_ids"]:
+                    write_post_chunk(store.get_post(post_id), site_dir)
+            if BLOG_COMPAT_EXPORT:
+                store.export(file_path)
+    else:
+        target = "blogPosts.json"
+        stats = reformat_archive(file_path, manifest_path, **options)
+
+    if stats["written"]:
+        print(f"✅ Normalized {stats['changed']} of {stats['posts']} posts in {target} "
+              f"({stats['stale']} checked)")
+    else:
+        print(f"✅ {target} already normalized ({stats['stale']} of {stats['posts']} posts checked, "
+              f"nothing written)")
+
 
-def format_lists(text):
-    # Regex to find the Key Takeaways section
-    # Matches "**Key Takeaways**:" followed by content until "**Why It Matters**"
-    pattern = r'(\*\*Key Takeaways\*\*:?)(.*?)(\*\*Why It Matters\*\*)'
-    
-    def replace_chunk(match):
-        header = match.group(1)
-        body = match.group(2)
-        footer = match.group(3)
-        
-        # Format the body:
-        # 1. Ensure the first item starts on a new line
-        # 2. Replace subsequent " - " with "\n- "
-        
-        # Fix start: " - Item" -> "\n- Item"
-        body = re.sub(r'^\s*-\s+', '\n- ', body)
-        
-        # Fix middle items: "Item 1 - Item 2" -> "Item 1\n- Item 2"
-        # Look for " - " followed by an uppercase letter (heuristic)
-        body = re.sub(r'\s+-\s+([A-Z])', r'\n- \1', body)
-        
-        return f"{header}\n{body}\n\n{footer}"
-
-    return re.sub(pattern, replace_chunk, text, flags=re.DOTALL)
-
-with open(file_path, 'r') as f:
-    posts = json.load(f)
-
-for post in posts:
-    content = post.get('content', '')
-    
-    # 1. Standardize formatting (previous logic)
-    content = re.sub(r'\s*---\s*###', '\n\n##', content)
-    content = re.sub(r'([^\n])\s*##\s+', r'\1\n\n## ', content)
-    if content.strip().startswith("##"):
-        content = content.strip()
-
-    # 2. Fix Lists in Key Takeaways
-    content = format_lists(content)
-    
-    post['content'] = content
-
-with open(file_path, 'w') as f:
-    json.dump(posts, f, indent=2)
-
-print("✅ Fixed Lists in blogPosts.json")
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { Github, Linkedin, Mail, ExternalLink, X, ChevronRight, Menu, Download, Database } from 'lucide-react';
 import GraphBackground from './GraphBackground';
 import { FaFileAlt, FaNewspaper, FaGraduationCap } from 'react-icons/fa';
-import blogPosts from './data/blogPosts.json';
 import { Analytics } from '@vercel/analytics/react';
 
+// Written by agent/site_manifest.py: manifest.json, pages/<n>.json (page 1 = oldest), posts/<id>.json
+const BLOG_DATA_URL = `${process.env.PUBLIC_URL}/data/blog`;
+
+const fetchJson = async (path) => {
+  const response = await fetch(`${BLOG_DATA_URL}/${path}`);
+  if (!response.ok) {
+    throw new Error(`Failed to load ${path}`);
+  }
+  return response.json();
+};
+
 const isValidUrl = (url) => {
   try {
     const parsed = new URL(url);
@@ -18,11 +28,73 @@ const Portfolio = () => {
 
   const [selectedPost, setSelectedPost] = useState(null);
   const [showAllPosts, setShowAllPosts] = useState(false);
+  // Post summaries by page number (page 1 = oldest); older pages and post bodies are fetched on demand
+  const [postPages, setPostPages] = useState({});
+  const [loadingPosts, setLoadingPosts] = useState(false);
+  const postBodies = useRef({});
+  const loadedPages = Object.keys(postPages).map(Number).sort((a, b) => b - a);
+  const blogPosts = loadedPages.flatMap(page => postPages[page]);
+  const nextPage = loadedPages.length ? loadedPages[loadedPages.length - 1] - 1 : 0;
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
   const [expandedExp, setExpandedExp] = useState({});
   const [showContactModal, setShowContactModal] = useState(false);
   const [formStatus, setFormStatus] = useState({ submitting: false, succeeded: false, error: null });
 
+  const loadPage = useCallback(async (page, isCancelled = () => false) => {
+    setLoadingPosts(true);
+    try {
+      const data = await fetchJson(`pages/${page}.json`);
+      if (!isCancelled()) {
+        // Keyed by page number, so loading a page twice (e.g. StrictMode re-running effects) never duplicates posts
+        setPostPages(prev => ({ ...prev, [page]: data.posts }));
+      }
+      return data.posts.length;
+    } catch (error) {
+      return 0;
+    } finally {
+      if (!isCancelled()) {
+        setLoadingPosts(false);
+      }
+    }
+  }, []);
+
+  useEffect(() => {
+    let cancelled = false;
+    const isCancelled = () => cancelled;
+    (async () => {
+      try {
+        const manifest = await fetchJson('manifest.json');
+        if (cancelled || manifest.pages < 1) {
+          return;
+        }
+        // The newest page can hold a single post; the home page shows two
+        const loaded = await loadPage(manifest.pages, isCancelled);
+        if (!cancelled && loaded < 2 && manifest.pages > 1) {
+          await loadPage(manifest.pages - 1, isCancelled);
+        }
+      } catch (error) {
+        // No site data yet: the blog section shows its empty state
+      }
+    })();
+    return () => {
+      cancelled = true;
+    };
+  }, [loadPage]);
+
+  const openPost = async (post) => {
+    setSelectedPost(postBodies.current[post.id] || post);
+    if (postBodies.current[post.id]) {
+      return;
+    }
+    try {
+      const body = await fetchJson(`posts/${post.id}.json`);
+      postBodies.current[post.id] = { ...post, ...body };
+      setSelectedPost(current => (current && current.id === post.id ? postBodies.current[post.id] : current));
+    } catch (error) {
+      setSelectedPost(current => (current && current.id === post.id ? { ...current, content: '', loadError: true } : current));
+    }
+  };
+
   const handleContactSubmit = async (e) => {
     e.preventDefault();
     setFormStatus({ submitting: true, succeeded: false, error: null });
@@ -607,7 +679,7 @@ const Portfolio = () => {
                     {post.summary}
                   </p>
                   <button
-                    onClick={() => setSelectedPost(post)}
+                    onClick={() => openPost(post)}
                     className="text-white text-sm font-medium flex items-center gap-2 hover:gap-3 transition-all"
                   >
                     Read Article <ChevronRight size={14} className="text-primary-500" />
@@ -640,7 +712,7 @@ const Portfolio = () => {
             <div className="overflow-y-auto p-6 grid md:grid-cols-2 gap-4">
               {blogPosts.map((post) => (
                 <div key={post.id}
-                  onClick={() => { setShowAllPosts(false); setSelectedPost(post); }}
+                  onClick={() => { setShowAllPosts(false); openPost(post); }}
                   className="p-5 rounded-xl border border-white/5 bg-white/5 hover:border-primary-500/50 hover:bg-white/10 transition-all cursor-pointer group"
                 >
                   <span className="text-xs font-mono text-zinc-500 mb-2 block">{post.date}</span>
@@ -648,6 +720,15 @@ const Portfolio = () => {
                   <p className="text-sm text-zinc-500 line-clamp-2">{post.summary}</p>
                 </div>
               ))}
+              {nextPage > 0 && (
+                <button
+                  onClick={() => loadPage(nextPage)}
+                  disabled={loadingPosts}
+                  className="md:col-span-2 p-4 rounded-xl border border-white/5 text-sm font-mono text-primary-400 hover:bg-white/5 transition-colors disabled:opacity-50"
+                >
+                  {loadingPosts ? 'Loading...' : 'Load older posts'}
+                </button>
+              )}
             </div>
           </div>
         </div>
@@ -847,7 +928,7 @@ const Portfolio = () => {
                   })()}
                 </div>
               ) : (
-                <p className="text-zinc-500">Loading...</p>
+                <p className="text-zinc-500">{selectedPost.loadError ? 'Could not load this article. Please try again later.' : 'Loading...'}</p>
               )}
 
               {/* All Sources Reference Section */}